@@ -0,0 +1,170 @@
+"""
+Admission control for Ozon Logistics Bot.
+Every update gets a priority (payments and subscription first, navigation
+next, heavy report generation last). Under load, measured as updates in
+flight, event loop lag and DB pool saturation, lower priorities are shed
+with a "try later" reply so critical flows stay fast.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from .config import settings
+from .db import pool_saturation
+from .metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+# Update priorities (lower value is more important)
+CRITICAL = 0
+INTERACTIVE = 1
+HEAVY = 2
+
+PRIORITY_NAMES = {CRITICAL: "critical", INTERACTIVE: "interactive", HEAVY: "heavy"}
+
+SHED_TEXT = "⏳ Бот сейчас перегружен. Пожалуйста, попробуйте через минуту."
+
+updates_shed = counter("updates_shed_total", "Updates rejected by admission control", ("priority",))
+updates_in_flight = gauge("updates_in_flight", "Updates being processed")
+loop_lag_gauge = gauge("event_loop_lag_seconds", "Smoothed event loop scheduling lag")
+
+
+class AdmissionController:
+    """Tracks system load and decides which priorities are admitted."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_loop_lag: float,
+        heavy_load: float,
+        interactive_load: float,
+        lag_check_interval: float = 0.25
+    ):
+        """
+        Initialize controller.
+
+        Args:
+            max_in_flight: Updates in flight counted as full load
+            max_loop_lag: Event loop lag in seconds counted as full load
+            heavy_load: Load from which heavy work is shed
+            interactive_load: Load from which interactive work is shed
+            lag_check_interval: Event loop lag probe interval in seconds
+        """
+        self.max_in_flight = max_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.heavy_load = heavy_load
+        self.interactive_load = interactive_load
+        self.lag_check_interval = lag_check_interval
+
+        self.in_flight = 0
+        self.loop_lag = 0.0
+        self._monitor: Optional[asyncio.Task] = None
+
+    def load(self) -> float:
+        """
+        Current load; 1.0 means one of the signals is at its limit.
+
+        Returns:
+            float: Maximum of in-flight, loop lag and DB pool ratios
+        """
+        return max(
+            self.in_flight / self.max_in_flight,
+            self.loop_lag / self.max_loop_lag,
+            pool_saturation(),
+        )
+
+    def admits(self, priority: int) -> bool:
+        """Check whether work of given priority is admitted at current load."""
+        if priority == CRITICAL:
+            return True
+        threshold = self.heavy_load if priority >= HEAVY else self.interactive_load
+        return self.load() < threshold
+
+    def start(self) -> None:
+        """Start event loop lag probe."""
+        if self._monitor is None:
+            self._monitor = asyncio.get_running_loop().create_task(self._probe_loop_lag())
+
+    def stop(self) -> None:
+        """Stop event loop lag probe."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+
+    async def _probe_loop_lag(self) -> None:
+        """Measure how late sleeps wake up; smoothed to ignore single spikes."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_check_interval)
+            lag = max(loop.time() - started - self.lag_check_interval, 0.0)
+            self.loop_lag = 0.7 * self.loop_lag + 0.3 * lag
+            loop_lag_gauge.set(self.loop_lag)
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """Outer update middleware shedding low-priority updates under load."""
+
+    def __init__(self, controller: AdmissionController, classify: Callable[[Update], int]):
+        """
+        Initialize middleware.
+
+        Args:
+            controller: Admission controller
+            classify: Function returning priority of an update
+        """
+        self.controller = controller
+        self.classify = classify
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+
+        priority = self.classify(event)
+        if not self.controller.admits(priority):
+            updates_shed.inc(PRIORITY_NAMES[priority])
+            await _reply_shed(event)
+            return None
+
+        self.controller.in_flight += 1
+        updates_in_flight.set(self.controller.in_flight)
+        try:
+            return await handler(event, data)
+        finally:
+            self.controller.in_flight -= 1
+            updates_in_flight.set(self.controller.in_flight)
+
+
+async def _reply_shed(update: Update) -> None:
+    """Tell the user to retry later."""
+    try:
+        if update.callback_query is not None:
+            await update.callback_query.answer(SHED_TEXT, show_alert=True)
+        elif update.message is not None:
+            await update.message.answer(SHED_TEXT)
+    except Exception as e:
+        logger.debug(f"Failed to reply to shed update: {e}")
+
+
+def create_admission_controller() -> AdmissionController:
+    """
+    Create admission controller configured from settings.
+
+    Returns:
+        AdmissionController instance
+    """
+    return AdmissionController(
+        max_in_flight=settings.admission_max_in_flight,
+        max_loop_lag=settings.admission_max_loop_lag,
+        heavy_load=settings.admission_heavy_load,
+        interactive_load=settings.admission_interactive_load,
+    )
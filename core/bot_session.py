@@ -0,0 +1,221 @@
+"""
+Outgoing Bot API call executor for Ozon Logistics Bot.
+aiogram session with a tuned keep-alive connection pool, global and per-chat
+rate budgets, priority lanes (interactive replies before bulk sends) and
+automatic retry_after handling on 429 responses.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, TelegramMethod
+
+from .config import settings
+from .metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes of outgoing calls (lower value goes first); not to be
+# confused with the admission priorities of incoming updates in core.admission
+LANE_INTERACTIVE = 0
+LANE_BULK = 1
+
+_lane: ContextVar[int] = ContextVar("bot_call_lane", default=LANE_INTERACTIVE)
+
+# Per-chat buckets kept in memory
+MAX_TRACKED_CHATS = 10000
+
+api_latency = histogram(
+    "telegram_api_latency_seconds", "Telegram Bot API call latency", ("method",)
+)
+api_throttled = counter(
+    "telegram_api_429_total", "Telegram Bot API calls rejected with 429", ("method",)
+)
+api_errors = counter(
+    "telegram_api_errors_total", "Telegram Bot API calls failed after retries", ("method",)
+)
+
+
+@contextmanager
+def bulk_lane():
+    """Send Bot API calls made inside this block through the low-priority lane."""
+    token = _lane.set(LANE_BULK)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    """Token bucket where callers reserve tokens ahead and sleep for their turn."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Seconds until a token is available."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """
+        Take a token, possibly going into debt.
+
+        Returns:
+            float: Seconds the caller must wait before using the token
+        """
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class PriorityRateGate:
+    """Global rate budget handing out tokens to waiters in lane order."""
+
+    def __init__(self, rate: float, capacity: float):
+        self._bucket = TokenBucket(rate, capacity)
+        self._waiters: List = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+
+    async def acquire(self, lane: int) -> None:
+        """Wait for a global token in the given lane."""
+        if not self._waiters and self._bucket.delay() == 0.0:
+            self._bucket.reserve()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._seq), future))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run_pump())
+        await future
+
+    async def _run_pump(self) -> None:
+        """Release waiters one token at a time, interactive lane first."""
+        while self._waiters:
+            delay = self._bucket.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._bucket.reserve()
+            future.set_result(None)
+
+
+class RateLimitedSession(AiohttpSession):
+    """aiogram session applying rate budgets, priority lanes and 429 retries."""
+
+    def __init__(
+        self,
+        global_rate: float,
+        per_chat_rate: float,
+        per_chat_burst: float,
+        max_retries: int,
+        pool_size: int,
+        keepalive_timeout: float,
+        **kwargs: Any
+    ):
+        """
+        Initialize session.
+
+        Args:
+            global_rate: Calls per second for the whole bot
+            per_chat_rate: Calls per second for a single chat
+            per_chat_burst: Burst size per chat
+            max_retries: Retries after 429 before giving up
+            pool_size: Maximum open connections
+            keepalive_timeout: Seconds to keep idle connections open
+            **kwargs: Extra AiohttpSession arguments
+        """
+        super().__init__(limit=pool_size, **kwargs)
+        self._connector_init["keepalive_timeout"] = keepalive_timeout
+
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self._gate = PriorityRateGate(global_rate, global_rate)
+        self._chats: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        """Get rate bucket for chat."""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+            if len(self._chats) > MAX_TRACKED_CHATS:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        """Make Bot API call within rate budgets, retrying on 429."""
+        method_name = getattr(method, "__api_method__", type(method).__name__)
+        lane = LANE_INTERACTIVE if isinstance(method, AnswerCallbackQuery) else _lane.get()
+        chat_id = getattr(method, "chat_id", None)
+
+        attempt = 0
+        while True:
+            await self._gate.acquire(lane)
+            if chat_id is not None:
+                delay = self._chat_bucket(chat_id).reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            started = time.perf_counter()
+            try:
+                return await super().make_request(bot, method, timeout)
+            except TelegramRetryAfter as e:
+                throttled = e
+            finally:
+                # Observed before the retry_after wait, which is not call latency
+                api_latency.observe(time.perf_counter() - started, method_name)
+
+            api_throttled.inc(method_name)
+            if attempt >= self.max_retries:
+                api_errors.inc(method_name)
+                raise throttled
+            attempt += 1
+            logger.warning(f"Telegram 429 on {method_name}, retry in {throttled.retry_after}s")
+            await asyncio.sleep(throttled.retry_after)
+
+
+def create_bot_session() -> RateLimitedSession:
+    """
+    Create Bot session configured from settings.
+
+    Returns:
+        RateLimitedSession instance
+    """
+    return RateLimitedSession(
+        global_rate=settings.telegram_global_rate,
+        per_chat_rate=settings.telegram_per_chat_rate,
+        per_chat_burst=settings.telegram_per_chat_burst,
+        max_retries=settings.telegram_max_retries,
+        pool_size=settings.telegram_pool_size,
+        keepalive_timeout=settings.telegram_keepalive_timeout,
+    )
@@ -15,13 +15,90 @@ class Settings(BaseSettings):
     telegram_bot_token: str
     telegram_webhook_url: Optional[str] = None
 
+    # Telegram Bot API outgoing calls
+    telegram_global_rate: float = 30.0  # calls per second
+    telegram_per_chat_rate: float = 1.0
+    telegram_per_chat_burst: float = 3.0
+    telegram_max_retries: int = 3
+    telegram_pool_size: int = 100
+    telegram_keepalive_timeout: float = 60.0
+
     # Database Configuration
     database_url: str
+    db_pool_size: int = 5
+    db_pool_warm_size: int = 2
+
+    # Postings partitions (monthly, each split by hash of client_id)
+    postings_hash_partitions: int = 8
+    postings_partition_months_ahead: int = 2
+    postings_retention_months: int = 0  # detach older monthly partitions on startup (0 = keep all)
+
+    # Read replicas (comma-separated URLs); read-only queries go there when lag allows
+    database_replica_urls: str = ""
+    db_replica_max_lag_seconds: float = 5.0
+    db_replica_check_interval: float = 2.0
 
     # Application Settings
     debug: bool = False
     log_level: str = "INFO"
 
+    # Startup Settings
+    # Fast startup: schema version check instead of create_all,
+    # webhook is only re-registered when its URL has changed
+    fast_startup: bool = True
+
+    # Admission control (load shedding of low-priority updates)
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 200  # updates in flight counted as full load
+    admission_max_loop_lag: float = 0.5  # seconds
+    admission_heavy_load: float = 0.7  # report generation is shed from this load
+    admission_interactive_load: float = 1.0  # navigation is shed from this load
+
+    # Tracing Settings
+    tracing_enabled: bool = False
+    tracing_sample_rate: float = 0.05
+    tracing_exporter: str = "file"  # "file" or "otlp"
+    tracing_file_path: str = "logs/traces.jsonl"
+    tracing_file_max_bytes: int = 10 * 1024 * 1024
+    tracing_file_backup_count: int = 5
+    tracing_otlp_endpoint: Optional[str] = None  # e.g. http://localhost:4318
+    tracing_service_name: str = "ozon-logistics-bot"
+
+    # Report Artifact Store
+    report_store_dir: str = "data/reports"
+    report_store_max_bytes: int = 512 * 1024 * 1024
+    report_store_compress_level: int = 6
+
+    # Progress message edits
+    progress_edit_interval: float = 1.5
+
+    # Report Scheduling
+    report_max_concurrent_jobs: int = 4
+    report_max_jobs_per_user: int = 1
+    report_default_rows_per_day: int = 100  # cost estimate for users without history
+
+    # Report Memory Budget (jobs wait for budget, data over a job's share spills to disk)
+    report_memory_budget_bytes: int = 384 * 1024 * 1024
+    report_job_memory_bytes: int = 96 * 1024 * 1024
+    report_spill_dir: str = "data/spill"
+
+    # Job Queue (Postgres jobs table shared by all replicas)
+    job_worker_enabled: bool = True
+    job_worker_concurrency: int = 4
+    job_poll_interval: float = 2.0
+    job_visibility_timeout: float = 300.0  # lease of a claimed job, extended while it runs
+    job_max_attempts: int = 5
+    job_retry_backoff_base: float = 5.0
+    job_retry_backoff_max: float = 600.0
+
+    # CSV Export (used instead of Excel for very large reports)
+    csv_export_row_threshold: int = 200_000
+    csv_export_compress_level: int = 6
+
+    # Daily Rollups
+    rollup_backfill_days: int = 90
+    rollup_restatement_days: int = 30  # max delivery/return lag; rebuilt daily
+
     # Trial Period Settings (days)
     trial_period_days: int = 7
 
@@ -36,6 +113,24 @@ class Settings(BaseSettings):
 
     # Ozon API Configuration (for future use)
     ozon_api_base_url: str = "https://api-seller.ozon.ru"
+    ozon_max_concurrent_requests: int = 2  # per shop
+    consolidated_max_parallel_shops: int = 10
+    ozon_connect_timeout: float = 5.0
+    ozon_tariffs_path: Optional[str] = None  # JSON tariff tables, built-in defaults if empty
+    ozon_ingest_page_size: int = 1000
+    ozon_ingest_max_retries: int = 8  # per page, on 429 / upstream failures
+    ozon_ingest_backoff_max: float = 60.0
+    ozon_ingest_backfill_days: int = 90  # history ingested when a shop is connected
+    fetch_cache_ttl_seconds: float = 300.0  # reuse of postings fetched for a shop
+    catalog_sync_interval_seconds: float = 900.0  # incremental catalog sync, off the report path
+
+    # Ozon circuit breaker and stale data fallback
+    ozon_breaker_failure_rate: float = 0.5
+    ozon_breaker_min_calls: int = 5
+    ozon_breaker_window_seconds: float = 60.0
+    ozon_breaker_open_seconds: float = 30.0
+    ozon_stale_max_age_hours: int = 24
+    ozon_stale_cache_bytes: int = 128 * 1024 * 1024
 
     class Config:
         env_file = ".env"
@@ -2,27 +2,220 @@
 Database models and session management for Ozon Logistics Bot.
 """
 
-from datetime import datetime
-from typing import Optional
+import asyncio
+import itertools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import (
+    JSON, Column, Integer, String, Boolean, Date, DateTime, BigInteger, Float, ForeignKey, Index,
+    LargeBinary, Text, UniqueConstraint, select, text,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, relationship, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
 
 from .config import settings
+from .tracing import current_span, span
+
+# Bump whenever models change so that ensure_schema() re-runs create_all
+SCHEMA_VERSION = 11
+
+# Advisory lock key used to serialize schema upgrades between replicas
+SCHEMA_LOCK_KEY = 727001
+
+# Advisory lock key used to serialize postings partition DDL
+PARTITION_LOCK_KEY = 727002
+
+# Advisory lock key (with the seller's hashed client_id) serializing rollup refreshes
+ROLLUP_LOCK_KEY = 727003
+
+# Minimum age of report_files.last_used_at before a lookup refreshes it
+REPORT_FILE_TOUCH_INTERVAL = timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+# Async engine is created lazily on first use (see get_engine)
+_engine: Optional[AsyncEngine] = None
+
+# Read replica engines and their health as seen by the lag monitor
+_replica_engines: Optional[List[AsyncEngine]] = None
+_replica_healthy: Dict[int, bool] = {}
+_replica_cycle = itertools.count()
+
+# Set inside use_primary() blocks
+_force_primary: ContextVar[bool] = ContextVar("db_force_primary", default=False)
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Get async engine, creating it on first call.
+
+    Building the engine imports the asyncpg dialect, so it is deferred
+    until the database is actually needed.
+
+    Returns:
+        AsyncEngine instance
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_async_engine(
+            settings.database_url,
+            echo=settings.debug,
+            future=True,
+            pool_size=settings.db_pool_size,
+        )
+        async_session.configure(bind=_engine)
+    return _engine
+
+
+def get_replica_engines() -> List[AsyncEngine]:
+    """
+    Get read replica engines from DATABASE_REPLICA_URLS, creating them on first call.
+
+    Returns:
+        List of AsyncEngine instances (empty without replicas)
+    """
+    global _replica_engines
+    if _replica_engines is None:
+        _replica_engines = [
+            create_async_engine(
+                url.strip(),
+                echo=settings.debug,
+                future=True,
+                pool_size=settings.db_pool_size,
+            )
+            for url in settings.database_replica_urls.split(",")
+            if url.strip()
+        ]
+    return _replica_engines
+
+
+@contextmanager
+def use_primary():
+    """Run all session queries inside this block on the primary (read-your-writes paths)."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def _pick_replica() -> Optional[AsyncEngine]:
+    """Round-robin over replicas whose lag is within the threshold."""
+    engines = _replica_engines or []
+    healthy = [engine for index, engine in enumerate(engines) if _replica_healthy.get(index)]
+    if not healthy:
+        return None
+    return healthy[next(_replica_cycle) % len(healthy)]
+
+
+class RoutingSession(Session):
+    """
+    Session sending read-only queries to a replica and everything else to the primary.
+
+    Writes, flushes, FOR UPDATE and raw SQL use the primary; once a session
+    has written, it stays on the primary so it reads its own changes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = get_engine().sync_engine
+        if self.info.get("wrote") or _force_primary.get():
+            return primary
+        if (
+            self._flushing
+            or isinstance(clause, (UpdateBase, TextClause))
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self.info["wrote"] = True
+            return primary
+
+        replica = _pick_replica()
+        return replica.sync_engine if replica is not None else primary
+
+
+async def check_replica_lag(engine: AsyncEngine) -> Optional[float]:
+    """
+    Measure replication lag of a replica.
+
+    Returns:
+        Lag in seconds (0 when fully replayed) or None if the replica is unreachable
+    """
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(
+                "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+            ))
+            return float(result.scalar_one())
+    except Exception as e:
+        logger.warning(f"Replica lag check failed: {e}")
+        return None
+
+
+async def monitor_replicas(interval: float) -> None:
+    """Periodically mark replicas healthy or lagging."""
+    engines = get_replica_engines()
+    while True:
+        lags = await asyncio.gather(*(check_replica_lag(engine) for engine in engines))
+        for index, lag in enumerate(lags):
+            healthy = lag is not None and lag <= settings.db_replica_max_lag_seconds
+            if _replica_healthy.get(index, True) != healthy:
+                logger.info(f"Replica {index} {'healthy' if healthy else f'excluded (lag {lag})'}")
+            _replica_healthy[index] = healthy
+        await asyncio.sleep(interval)
+
+
+def start_replica_monitor() -> Optional[asyncio.Task]:
+    """
+    Start background replica lag monitor if replicas are configured.
+
+    Until the first check completes all reads go to the primary.
+
+    Returns:
+        Monitor task or None without replicas
+    """
+    if not get_replica_engines():
+        return None
+    return asyncio.get_running_loop().create_task(monitor_replicas(settings.db_replica_check_interval))
+
+
+class TracedAsyncSession(AsyncSession):
+    """AsyncSession recording tracing spans for queries and commits."""
+
+    async def execute(self, statement, *args, **kwargs):
+        if current_span() is None:
+            return await super().execute(statement, *args, **kwargs)
+        with span("db.execute", statement=str(statement)[:200]):
+            return await super().execute(statement, *args, **kwargs)
+
+    async def commit(self):
+        if current_span() is None:
+            return await super().commit()
+        with span("db.commit"):
+            return await super().commit()
+
+
+class _LazySessionFactory(sessionmaker):
+    """Session factory that binds to the engine on first session creation."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
 
-# Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True,
-)
 
 # Create async session factory
-async_session = sessionmaker(
-    engine,
-    class_=AsyncSession,
+async_session = _LazySessionFactory(
+    class_=TracedAsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False,
 )
 
@@ -37,8 +230,8 @@ class User(Base):
     Fields:
     - id: Primary key
     - telegram_id: Unique Telegram user ID
-    - client_id: Ozon Client ID (nullable)
-    - api_key: Encrypted Ozon API Key (nullable)
+    - client_id: Ozon Client ID (nullable, legacy single-shop credentials)
+    - api_key: Encrypted Ozon API Key (nullable, legacy single-shop credentials)
     - is_active: Active subscription/trial status
     - trial_start_date: Trial period start date
     - subscription_expires_at: Subscription expiration date
@@ -58,10 +251,287 @@ class User(Base):
     trial_start_date = Column(DateTime, default=datetime.utcnow, nullable=True)
     subscription_expires_at = Column(DateTime, nullable=True)
 
+    # Connected Ozon shops
+    shops = relationship("Shop", back_populates="user", cascade="all, delete-orphan", lazy="selectin")
+
     def __repr__(self):
         return f"<User(id={self.id}, telegram_id={self.telegram_id}, is_active={self.is_active})>"
 
 
+class Shop(Base):
+    """
+    Ozon shop connected by a user (one user may manage many shops).
+
+    Fields:
+    - id: Primary key
+    - user_id: Owner user
+    - name: Display name
+    - client_id: Ozon Client ID
+    - api_key: Encrypted Ozon API Key
+    - created_at: Connection date
+    """
+
+    __tablename__ = "shops"
+    __table_args__ = (UniqueConstraint("user_id", "client_id", name="uq_shops_user_client"),)
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    client_id = Column(String, nullable=False)
+    api_key = Column(String, nullable=False)  # Should be encrypted in production
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    user = relationship("User", back_populates="shops")
+
+    def __repr__(self):
+        return f"<Shop(id={self.id}, user_id={self.user_id}, client_id={self.client_id})>"
+
+
+class SchemaVersion(Base):
+    """
+    Single-row table holding the schema version applied to the database.
+
+    Fields:
+    - id: Always 1
+    - version: Applied SCHEMA_VERSION
+    - applied_at: When the version was applied
+    """
+
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ReportFile(Base):
+    """
+    Telegram file_id of an already uploaded report document.
+
+    Fields:
+    - content_hash: SHA-256 of the document content or of the report inputs
+    - file_id: Telegram file_id returned on first upload
+    - filename: Filename used on first upload
+    - file_size: Document size in bytes
+    - created_at: First upload time
+    - last_used_at: Last time the file_id was reused
+    """
+
+    __tablename__ = "report_files"
+
+    content_hash = Column(String(64), primary_key=True)
+    file_id = Column(String, nullable=False)
+    filename = Column(String, nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SellerDailyRollup(Base):
+    """
+    Per-seller daily aggregates of postings, one row per warehouse and delivery type.
+
+    Fields:
+    - client_id: Ozon Client ID
+    - day: Posting creation date (UTC)
+    - warehouse: Warehouse name ('' if unknown)
+    - delivery_type: FBO / FBS ('' if unknown)
+    - orders: Number of postings
+    - revenue: Sum of posting revenue
+    - logistics_cost: Sum of logistics cost
+    - delivered_orders: Number of delivered postings
+    - delivery_time_sum: Sum of delivery times in days for delivered postings
+    - returns: Number of returned postings
+    - updated_at: Last rebuild time
+    """
+
+    __tablename__ = "seller_daily_rollups"
+
+    client_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    warehouse = Column(String, primary_key=True, default="")
+    delivery_type = Column(String, primary_key=True, default="")
+
+    orders = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0.0, nullable=False)
+    logistics_cost = Column(Float, default=0.0, nullable=False)
+    delivered_orders = Column(Integer, default=0, nullable=False)
+    delivery_time_sum = Column(Float, default=0.0, nullable=False)
+    returns = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SellerRollupState(Base):
+    """
+    Rollup watermark per seller.
+
+    Fields:
+    - client_id: Ozon Client ID
+    - rolled_up_to: Last closed day included in seller_daily_rollups
+    """
+
+    __tablename__ = "seller_rollup_state"
+
+    client_id = Column(String, primary_key=True)
+    rolled_up_to = Column(Date, nullable=False)
+
+
+class SellerDailySketch(Base):
+    """
+    Per-seller daily quantile sketches of posting metrics.
+
+    Fields:
+    - client_id: Ozon Client ID
+    - day: Posting creation date (UTC)
+    - metric: 'delivery_time' (days) or 'cost' (RUB)
+    - dimension: 'warehouse' or 'sku'
+    - key: Warehouse name or SKU ('' if unknown)
+    - count: Number of values in the sketch
+    - sketch: Serialized KLLSketch (see services.sketches)
+    - updated_at: Last rebuild time
+    """
+
+    __tablename__ = "seller_daily_sketches"
+
+    client_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    metric = Column(String, primary_key=True)
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True, default="")
+
+    count = Column(Integer, default=0, nullable=False)
+    sketch = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IngestionCheckpoint(Base):
+    """
+    Progress of a paged Ozon download, committed together with each page.
+
+    Fields:
+    - client_id: Ozon Client ID
+    - endpoint: Ingested endpoint (e.g. 'postings')
+    - date_from: Range start
+    - date_to: Range end
+    - cursor: Cursor of the next page to fetch (None before the first page)
+    - pages_done: Pages stored so far
+    - rows_done: Rows stored so far
+    - completed: Whether the last page has been stored
+    - updated_at: Last checkpoint time
+    """
+
+    __tablename__ = "ingestion_checkpoints"
+
+    client_id = Column(String, primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    date_from = Column(DateTime, primary_key=True)
+    date_to = Column(DateTime, primary_key=True)
+
+    cursor = Column(String, nullable=True)
+    pages_done = Column(Integer, default=0, nullable=False)
+    rows_done = Column(Integer, default=0, nullable=False)
+    completed = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class StoredPosting(Base):
+    """
+    Ozon posting downloaded by ingestion, upserted by (client_id, order_id, created_at).
+
+    Partitioned by month of created_at, each month by hash of client_id
+    (see ensure_posting_partitions), so a seller's period query touches only
+    the matching month/seller partitions however long the history is.
+
+    Fields mirror services.records.PostingBatch columns.
+    """
+
+    __tablename__ = "postings"
+    __table_args__ = (
+        Index("ix_postings_client_created", "client_id", "created_at"),
+        Index("ix_postings_created_brin", "created_at", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    client_id = Column(String, primary_key=True)
+    order_id = Column(String, primary_key=True)
+    # Partition key, so part of the primary key
+    created_at = Column(DateTime, primary_key=True)
+
+    delivery_type = Column(String, nullable=True)
+    status = Column(String, nullable=True)
+    cost = Column(Float, default=0.0, nullable=False)
+    delivery_date = Column(DateTime, nullable=True)
+    warehouse = Column(String, nullable=True)
+    revenue = Column(Float, default=0.0, nullable=False)
+    volume_weight = Column(Float, nullable=True)  # liters, NULL if unknown
+    sku = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Job statuses; queued and running jobs are claimable once run_at has passed
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class Job(Base):
+    """
+    Durable background job shared by all bot replicas.
+
+    Workers claim due jobs with FOR UPDATE SKIP LOCKED (see claim_jobs), so
+    replicas never take the same job and need no separate broker. A claimed
+    job's run_at is its visibility deadline: if the worker dies without
+    finishing it, the job becomes claimable again once the deadline passes.
+
+    Fields:
+    - id: Primary key
+    - kind: Handler name (see services.job_queue)
+    - payload: JSON arguments for the handler
+    - priority: Lower values are claimed first
+    - status: 'queued', 'running', 'done' or 'failed'
+    - attempts: Claims so far (also fences stale workers out of updates)
+    - max_attempts: Claims before the job fails permanently
+    - run_at: Earliest claim time (retry backoff) or lease deadline while running
+    - dedupe_key: Optional key preventing the same work from being queued or running twice
+    - locked_by: Worker holding the job
+    - last_error: Error of the last failed attempt
+    - created_at: Enqueue time
+    - updated_at: Last status change
+    """
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Only claimable rows are indexed, finished jobs do not slow claiming down
+        Index(
+            "ix_jobs_claim", "priority", "run_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        # Keys are unique among pending jobs only, so finished work can be enqueued again
+        Index(
+            "ux_jobs_dedupe_key", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    priority = Column(Integer, default=0, nullable=False)
+    status = Column(String, default=JOB_QUEUED, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    dedupe_key = Column(String, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status}, attempts={self.attempts})>"
+
+
 async def get_db() -> AsyncSession:
     """Dependency for getting async database session."""
     async with async_session() as session:
@@ -73,16 +543,297 @@ async def get_db() -> AsyncSession:
 
 async def create_tables():
     """Create all database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    async with get_engine().begin() as conn:
+        await _create_all(conn)
+        await _record_schema_version(conn)
+    await maintain_posting_partitions()
 
 
-async def get_user_by_telegram_id(session: AsyncSession, telegram_id: int) -> Optional[User]:
-    """Get user by Telegram ID."""
-    result = await session.execute(
-        session.query(User).filter(User.telegram_id == telegram_id)
+async def _stored_schema_version(conn) -> Optional[int]:
+    """
+    Get schema version of the database before create_all.
+
+    Returns:
+        Stored version, 0 for tables created before schema_version existed,
+        None for an empty database
+    """
+    result = await conn.execute(text(
+        "SELECT to_regclass('schema_version') IS NOT NULL, to_regclass('postings') IS NOT NULL"
+    ))
+    has_version_table, has_postings = result.one()
+    if has_version_table:
+        result = await conn.execute(text("SELECT version FROM schema_version WHERE id = 1"))
+        version = result.scalar_one_or_none()
+        if version is not None:
+            return version
+    return 0 if has_postings else None
+
+
+async def _record_schema_version(conn) -> None:
+    """Store SCHEMA_VERSION as applied."""
+    await conn.execute(
+        text(
+            "INSERT INTO schema_version (id, version, applied_at) VALUES (1, :version, now()) "
+            "ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, applied_at = EXCLUDED.applied_at"
+        ),
+        {"version": SCHEMA_VERSION},
     )
-    return result.scalar_one_or_none()
+
+
+async def _create_all(conn) -> None:
+    """
+    Run create_all, converting a plain postings table (schema version 6) to the partitioned one.
+
+    create_all skips existing tables, so the old table is renamed first and
+    its rows are copied into the new partitions afterwards. Data migrations
+    run only when the stored schema version predates them.
+    """
+    stored_version = await _stored_schema_version(conn)
+
+    result = await conn.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('postings')"
+    ))
+    legacy = result.scalar_one_or_none() == "r"
+    if legacy:
+        await conn.execute(text("ALTER TABLE postings RENAME TO postings_unpartitioned"))
+        await conn.execute(text(
+            "ALTER TABLE postings_unpartitioned RENAME CONSTRAINT postings_pkey TO postings_unpartitioned_pkey"
+        ))
+
+    await conn.run_sync(Base.metadata.create_all)
+
+    if legacy:
+        # Postings stored without created_at are kept under their last update time
+        result = await conn.execute(text(
+            "SELECT min(COALESCE(created_at, updated_at)), max(COALESCE(created_at, updated_at)) "
+            "FROM postings_unpartitioned"
+        ))
+        oldest, newest = result.one()
+        if oldest is not None:
+            months = []
+            month = _month_start(oldest)
+            while month <= _month_start(newest):
+                months.append(month)
+                month = _next_month(month)
+            await _create_posting_partitions(conn, months)
+        names = [column.name for column in StoredPosting.__table__.columns]
+        values = ", ".join(
+            "COALESCE(created_at, updated_at)" if name == "created_at" else name for name in names
+        )
+        await conn.execute(text(
+            f"INSERT INTO postings ({', '.join(names)}) SELECT {values} FROM postings_unpartitioned"
+        ))
+        await conn.execute(text("DROP TABLE postings_unpartitioned"))
+
+    if stored_version is None:
+        return  # New database: create_all built the current schema
+
+    if stored_version < 9:
+        # Schema version 8 stored unknown volume weights as 0
+        await conn.execute(text("ALTER TABLE postings ALTER COLUMN volume_weight DROP NOT NULL"))
+        await conn.execute(text("UPDATE postings SET volume_weight = NULL WHERE volume_weight = 0"))
+
+    if stored_version < 10:
+        # Schema version 9 kept dedupe keys unique forever, even for finished jobs
+        await conn.execute(text("ALTER TABLE jobs DROP CONSTRAINT IF EXISTS jobs_dedupe_key_key"))
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_dedupe_key ON jobs (dedupe_key) "
+            "WHERE status IN ('queued', 'running')"
+        ))
+
+
+# Postings partitions known to exist, by month start
+_posting_partitions: Set[date] = set()
+
+
+def _month_start(value: datetime) -> date:
+    """First day of the month of value."""
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month: date) -> date:
+    """First day of the following month."""
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def posting_partition_name(month: date) -> str:
+    """Name of the postings partition for a month."""
+    return f"postings_y{month.year:04d}m{month.month:02d}"
+
+
+async def _create_posting_partitions(conn, months: List[date]) -> None:
+    """Create monthly postings partitions with their hash subpartitions."""
+    modulus = settings.postings_hash_partitions
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    for month in months:
+        name = posting_partition_name(month)
+        await conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF postings "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}') "
+            f"PARTITION BY HASH (client_id)"
+        ))
+        for remainder in range(modulus):
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name}_h{remainder} PARTITION OF {name} "
+                f"FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder})"
+            ))
+
+
+async def ensure_posting_partitions(date_from: datetime, date_to: datetime) -> None:
+    """
+    Make sure postings partitions exist for every month in [date_from, date_to].
+
+    Partitions created by this process are remembered, so the common case costs nothing.
+
+    Args:
+        date_from: Earliest created_at to be stored
+        date_to: Latest created_at to be stored
+    """
+    months = []
+    month = _month_start(date_from)
+    while month <= _month_start(date_to):
+        if month not in _posting_partitions:
+            months.append(month)
+        month = _next_month(month)
+    if not months:
+        return
+
+    async with get_engine().begin() as conn:
+        await _create_posting_partitions(conn, months)
+    _posting_partitions.update(months)
+
+
+async def detach_old_posting_partitions(retention_months: int, drop: bool = False) -> List[str]:
+    """
+    Detach monthly postings partitions older than the retention period.
+
+    Detaching is a catalog-only change (done CONCURRENTLY, so queries on
+    recent months are not blocked); the detached table can be archived or
+    dropped separately.
+
+    Args:
+        retention_months: Months to keep, including the current one
+        drop: Drop detached partitions right away
+
+    Returns:
+        Names of detached partitions
+    """
+    cutoff = _month_start(datetime.utcnow())
+    for _ in range(retention_months - 1):
+        cutoff = date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+
+    async with get_engine().connect() as conn:
+        result = await conn.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'postings'"
+        ))
+        names = [name for (name,) in result.all() if name < posting_partition_name(cutoff)]
+
+    detached = []
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block
+    async with get_engine().connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name in sorted(names):
+            await conn.execute(text(f"ALTER TABLE postings DETACH PARTITION {name} CONCURRENTLY"))
+            if drop:
+                await conn.execute(text(f"DROP TABLE {name}"))
+            detached.append(name)
+            logger.info(f"Postings partition {name} {'dropped' if drop else 'detached'}")
+    return detached
+
+
+async def maintain_posting_partitions() -> None:
+    """Create partitions for the current and upcoming months and detach expired ones."""
+    now = datetime.utcnow()
+    upcoming = _month_start(now)
+    for _ in range(settings.postings_partition_months_ahead):
+        upcoming = _next_month(upcoming)
+    await ensure_posting_partitions(now, datetime.combine(upcoming, datetime.min.time()))
+    if settings.postings_retention_months:
+        await detach_old_posting_partitions(settings.postings_retention_months)
+
+
+async def get_schema_version() -> Optional[int]:
+    """
+    Read applied schema version with a single cheap query.
+
+    Returns:
+        Applied version or None if the schema was never initialized
+    """
+    try:
+        async with get_engine().connect() as conn:
+            result = await conn.execute(text("SELECT version FROM schema_version WHERE id = 1"))
+            return result.scalar_one_or_none()
+    except DBAPIError:
+        # Table does not exist yet
+        return None
+
+
+async def ensure_schema() -> bool:
+    """
+    Create or upgrade tables only when the stored schema version is outdated.
+
+    Replaces unconditional create_tables() on startup: in the common case
+    it costs one SELECT instead of a full metadata reflection.
+
+    Returns:
+        bool: True if create_all was executed
+    """
+    if await get_schema_version() == SCHEMA_VERSION:
+        return False
+
+    async with get_engine().begin() as conn:
+        # Serialize concurrent upgrades from several replicas
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        await _create_all(conn)
+        await _record_schema_version(conn)
+    return True
+
+
+def pool_saturation() -> float:
+    """
+    Share of the primary pool's base connections checked out.
+
+    Returns:
+        float: 0.0 when idle (or engine not created yet), above 1.0 when using overflow
+    """
+    if _engine is None:
+        return 0.0
+    pool = _engine.sync_engine.pool
+    return pool.checkedout() / max(pool.size(), 1)
+
+
+async def warm_pool(size: int) -> None:
+    """
+    Open several pool connections concurrently so first requests skip connect.
+
+    Args:
+        size: Number of connections to open
+    """
+    engine = get_engine()
+
+    async def _ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(_ping() for _ in range(size)))
+
+
+async def get_user_by_telegram_id(session: AsyncSession, telegram_id: int) -> Optional[User]:
+    """
+    Get user by Telegram ID.
+
+    A miss is re-checked on the primary, so a user created moments ago is
+    found even if the replica has not replayed the insert yet.
+    """
+    query = select(User).where(User.telegram_id == telegram_id)
+    user = (await session.execute(query)).scalar_one_or_none()
+    if user is None and _replica_engines and not _force_primary.get():
+        with use_primary():
+            user = (await session.execute(query)).scalar_one_or_none()
+    return user
 
 
 async def create_user(session: AsyncSession, telegram_id: int) -> User:
@@ -95,4 +846,232 @@ async def create_user(session: AsyncSession, telegram_id: int) -> User:
     session.add(user)
     await session.commit()
     await session.refresh(user)
-    return user
\ No newline at end of file
+    return user
+
+
+async def get_user_shops(session: AsyncSession, user_id: int) -> List[Shop]:
+    """Get all shops connected by user."""
+    result = await session.execute(
+        select(Shop).where(Shop.user_id == user_id).order_by(Shop.id)
+    )
+    return list(result.scalars().all())
+
+
+async def add_shop(
+    session: AsyncSession,
+    user: User,
+    client_id: str,
+    api_key: str,
+    name: Optional[str] = None
+) -> Shop:
+    """Connect shop to user, updating API key if the shop is already connected."""
+    result = await session.execute(
+        select(Shop).where(Shop.user_id == user.id, Shop.client_id == client_id)
+    )
+    shop = result.scalar_one_or_none()
+    if shop is None:
+        shop = Shop(user_id=user.id, client_id=client_id, api_key=api_key, name=name or client_id)
+        session.add(shop)
+    else:
+        shop.api_key = api_key
+        if name:
+            shop.name = name
+    await session.commit()
+    await session.refresh(shop)
+    return shop
+
+
+async def get_report_file_id(session: AsyncSession, content_hash: str) -> Optional[str]:
+    """
+    Get Telegram file_id for previously uploaded report content.
+
+    Read-only except when last_used_at is older than REPORT_FILE_TOUCH_INTERVAL,
+    so repeated deliveries do not each cost a write.
+    """
+    report_file = await session.get(ReportFile, content_hash)
+    if report_file is None:
+        return None
+    now = datetime.utcnow()
+    if now - report_file.last_used_at >= REPORT_FILE_TOUCH_INTERVAL:
+        report_file.last_used_at = now
+        await session.commit()
+    return report_file.file_id
+
+
+async def save_report_file_id(
+    session: AsyncSession,
+    content_hash: str,
+    file_id: str,
+    filename: str,
+    file_size: Optional[int]
+) -> None:
+    """Store (or replace) Telegram file_id for report content."""
+    await session.merge(ReportFile(
+        content_hash=content_hash,
+        file_id=file_id,
+        filename=filename,
+        file_size=file_size,
+    ))
+    await session.commit()
+
+
+async def delete_report_file_id(session: AsyncSession, content_hash: str) -> None:
+    """Forget file_id that Telegram no longer accepts."""
+    report_file = await session.get(ReportFile, content_hash)
+    if report_file is not None:
+        await session.delete(report_file)
+        await session.commit()
+
+
+async def enqueue_job(
+    session: AsyncSession,
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    run_at: Optional[datetime] = None,
+    max_attempts: Optional[int] = None,
+    dedupe_key: Optional[str] = None
+) -> Optional[int]:
+    """
+    Add job to the queue and commit.
+
+    Args:
+        session: Database session
+        kind: Handler name
+        payload: JSON arguments for the handler
+        priority: Lower values are claimed first
+        run_at: Earliest run time (now if None)
+        max_attempts: Claims before the job fails (job_max_attempts if None)
+        dedupe_key: Skip enqueueing if a queued or running job has this key
+
+    Returns:
+        Job ID, or None if a queued or running job has dedupe_key
+    """
+    now = datetime.utcnow()
+    statement = pg_insert(Job).values(
+        kind=kind,
+        payload=payload or {},
+        priority=priority,
+        status=JOB_QUEUED,
+        attempts=0,
+        max_attempts=max_attempts or settings.job_max_attempts,
+        run_at=run_at or now,
+        dedupe_key=dedupe_key,
+        created_at=now,
+        updated_at=now,
+    ).on_conflict_do_nothing(
+        index_elements=[Job.dedupe_key],
+        index_where=text("status IN ('queued', 'running')"),
+    ).returning(Job.id)
+    job_id = (await session.execute(statement)).scalar_one_or_none()
+    await session.commit()
+    return job_id
+
+
+async def claim_jobs(worker_id: str, limit: int, visibility_timeout: float) -> List[Job]:
+    """
+    Claim up to limit due jobs for a worker.
+
+    Rows locked by other replicas' claims are skipped rather than waited for,
+    so concurrent workers each get different jobs in one round trip. Jobs
+    whose previous worker let the lease expire are claimed again.
+
+    Args:
+        worker_id: Claiming worker
+        limit: Maximum number of jobs
+        visibility_timeout: Seconds the jobs stay invisible to other workers
+
+    Returns:
+        Claimed jobs (detached, attempts already incremented)
+    """
+    async with get_engine().begin() as conn:
+        result = await conn.execute(
+            text(
+                "UPDATE jobs SET status = :running, attempts = attempts + 1, locked_by = :worker, "
+                "run_at = now() AT TIME ZONE 'utc' + make_interval(secs => :timeout), "
+                "updated_at = now() AT TIME ZONE 'utc' "
+                "WHERE id IN ("
+                "  SELECT id FROM jobs "
+                "  WHERE status IN (:queued, :running) AND run_at <= now() AT TIME ZONE 'utc' "
+                "  ORDER BY priority, run_at "
+                "  LIMIT :limit FOR UPDATE SKIP LOCKED"
+                ") RETURNING id, kind, payload, priority, attempts, max_attempts"
+            ).columns(
+                id=BigInteger, kind=String, payload=JSON, priority=Integer, attempts=Integer,
+                max_attempts=Integer,
+            ),
+            {
+                "running": JOB_RUNNING,
+                "queued": JOB_QUEUED,
+                "worker": worker_id,
+                "timeout": visibility_timeout,
+                "limit": limit,
+            },
+        )
+        return [
+            Job(
+                id=row.id, kind=row.kind, payload=row.payload, priority=row.priority,
+                status=JOB_RUNNING, attempts=row.attempts, max_attempts=row.max_attempts,
+                locked_by=worker_id,
+            )
+            for row in result
+        ]
+
+
+async def _update_claimed_job(job: Job, values: str, params: Dict[str, Any]) -> bool:
+    """Update job only while still held by the claim (same worker and attempt)."""
+    async with get_engine().begin() as conn:
+        result = await conn.execute(
+            text(
+                f"UPDATE jobs SET {values}, updated_at = now() AT TIME ZONE 'utc' "
+                f"WHERE id = :id AND locked_by = :worker AND attempts = :attempts AND status = :running"
+            ),
+            {**params, "id": job.id, "worker": job.locked_by, "attempts": job.attempts, "running": JOB_RUNNING},
+        )
+        return result.rowcount == 1
+
+
+async def extend_job_lease(job: Job, visibility_timeout: float) -> bool:
+    """
+    Push claimed job's visibility deadline forward (heartbeat of long jobs).
+
+    Returns:
+        bool: False if the lease was lost to another worker
+    """
+    return await _update_claimed_job(
+        job,
+        "run_at = now() AT TIME ZONE 'utc' + make_interval(secs => :timeout)",
+        {"timeout": visibility_timeout},
+    )
+
+
+async def complete_job(job: Job) -> bool:
+    """
+    Mark claimed job done.
+
+    Returns:
+        bool: False if the lease was lost to another worker
+    """
+    return await _update_claimed_job(
+        job, "status = :done, locked_by = NULL, last_error = NULL", {"done": JOB_DONE}
+    )
+
+
+async def fail_job(job: Job, error: str, retry_in: Optional[float]) -> bool:
+    """
+    Record failed attempt: requeue after retry_in seconds, or fail permanently if None.
+
+    Returns:
+        bool: False if the lease was lost to another worker
+    """
+    if retry_in is None:
+        return await _update_claimed_job(
+            job, "status = :failed, locked_by = NULL, last_error = :error",
+            {"failed": JOB_FAILED, "error": error},
+        )
+    return await _update_claimed_job(
+        job,
+        "status = :queued, locked_by = NULL, last_error = :error, "
+        "run_at = now() AT TIME ZONE 'utc' + make_interval(secs => :delay)",
+        {"queued": JOB_QUEUED, "error": error, "delay": retry_in},
+    )
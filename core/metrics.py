@@ -0,0 +1,143 @@
+"""
+In-process metrics for Ozon Logistics Bot.
+Minimal counters and histograms rendered in Prometheus text format
+on the /metrics endpoint.
+"""
+
+import bisect
+from typing import Dict, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        """Increase counter for label values."""
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        """Render in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Gauge:
+    """Value that can go up and down, with labels."""
+
+    def __init__(self, name: str, description: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *label_values: str) -> None:
+        """Set gauge value for label values."""
+        self._values[label_values] = value
+
+    def render(self) -> List[str]:
+        """Render in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} gauge"]
+        for label_values, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative bucket histogram with labels."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (bucket counts, sum, count)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Record observation for label values."""
+        state = self._values.get(label_values)
+        if state is None:
+            state = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def render(self) -> List[str]:
+        """Render in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _labels(self.label_names + ("le",), label_values + (str(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+
+def _labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    """Format label set."""
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+_registry: Dict[str, object] = {}
+
+
+def counter(name: str, description: str, label_names: Sequence[str] = ()) -> Counter:
+    """Get or create registered counter."""
+    if name not in _registry:
+        _registry[name] = Counter(name, description, label_names)
+    return _registry[name]
+
+
+def gauge(name: str, description: str, label_names: Sequence[str] = ()) -> Gauge:
+    """Get or create registered gauge."""
+    if name not in _registry:
+        _registry[name] = Gauge(name, description, label_names)
+    return _registry[name]
+
+
+def histogram(
+    name: str,
+    description: str,
+    label_names: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+) -> Histogram:
+    """Get or create registered histogram."""
+    if name not in _registry:
+        _registry[name] = Histogram(name, description, label_names, buckets)
+    return _registry[name]
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in Prometheus text format."""
+    lines: List[str] = []
+    for metric in _registry.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,302 @@
+"""
+Per-update tracing for Ozon Logistics Bot.
+Records nested timing spans for sampled updates and exports them to a
+rotating JSON-lines file or an OTLP/HTTP compatible collector.
+
+When an update is not sampled no span context is active, and span()/traced()
+reduce to a single context variable lookup.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import random
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Trace:
+    """Collection of spans recorded for a single sampled update."""
+
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+
+
+class Span:
+    """Single timed operation inside a trace."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        """Span duration in milliseconds."""
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize span for the file exporter."""
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("tracing_current_span", default=None)
+
+# Shared no-op context returned when the current update is not sampled
+_NOOP = nullcontext()
+
+
+class _SpanContext:
+    """Context manager activating a span and exporting the trace on root exit."""
+
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, span_: Span):
+        self._span = span_
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._span.start_ns = time.time_ns()
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        span_ = self._span
+        span_.end_ns = time.time_ns()
+        if exc_type is not None:
+            span_.error = f"{exc_type.__name__}: {exc_val}"
+        _current_span.reset(self._token)
+        span_.trace.spans.append(span_)
+
+        if span_.parent_id is None:
+            exporter = get_exporter()
+            if exporter is not None:
+                exporter.export(span_.trace)
+
+
+def current_span() -> Optional[Span]:
+    """Get active span or None if the current update is not traced."""
+    return _current_span.get()
+
+
+def start_trace(name: str, **attributes: Any) -> _SpanContext:
+    """
+    Start a new trace with a root span.
+
+    Args:
+        name: Root span name
+        **attributes: Span attributes
+
+    Returns:
+        Context manager for the root span
+    """
+    return _SpanContext(Span(Trace(), name, None, attributes))
+
+
+def span(name: str, **attributes: Any):
+    """
+    Open a child span of the active span.
+
+    Args:
+        name: Span name
+        **attributes: Span attributes
+
+    Returns:
+        Context manager (no-op if no trace is active)
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return _SpanContext(Span(parent.trace, name, parent.span_id, attributes))
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator wrapping a sync or async function call in a span.
+
+    Args:
+        name: Span name
+
+    Returns:
+        Decorator
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return sync_wrapper
+
+    return decorator
+
+
+class FileSpanExporter:
+    """Writes finished traces as JSON lines to a size-rotated local file."""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._logger = logging.getLogger("ozon_bot.traces")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(handler)
+
+    def export(self, trace: Trace) -> None:
+        """Write trace to file."""
+        record = {
+            "trace_id": trace.trace_id,
+            "spans": [s.to_dict() for s in trace.spans],
+        }
+        self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class OTLPSpanExporter:
+    """Sends finished traces to an OTLP/HTTP collector using the JSON encoding."""
+
+    def __init__(self, endpoint: str, service_name: str):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._client = None
+        self._pending: set = set()
+
+    def export(self, trace: Trace) -> None:
+        """Schedule trace upload without blocking the update."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._send(self._build_payload(trace)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _build_payload(self, trace: Trace) -> Dict[str, Any]:
+        """Build OTLP ExportTraceServiceRequest in JSON form."""
+        spans = []
+        for s in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [
+                    {"key": key, "value": {"stringValue": str(value)}}
+                    for key, value in s.attributes.items()
+                ],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            })
+
+        return {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]
+                },
+                "scopeSpans": [{"scope": {"name": "ozon_bot"}, "spans": spans}],
+            }]
+        }
+
+    async def _send(self, payload: Dict[str, Any]) -> None:
+        """Post payload to collector, dropping it on failure."""
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(timeout=5.0)
+        try:
+            await self._client.post(self.url, json=payload)
+        except Exception as e:
+            logger.debug(f"Failed to export trace: {e}")
+
+
+_exporter = None
+
+
+def get_exporter():
+    """
+    Get configured span exporter, creating it on first call.
+
+    Returns:
+        Exporter instance or None if tracing is disabled
+    """
+    global _exporter
+    if _exporter is None and settings.tracing_enabled:
+        if settings.tracing_exporter == "otlp" and settings.tracing_otlp_endpoint:
+            _exporter = OTLPSpanExporter(settings.tracing_otlp_endpoint, settings.tracing_service_name)
+        else:
+            _exporter = FileSpanExporter(
+                settings.tracing_file_path,
+                settings.tracing_file_max_bytes,
+                settings.tracing_file_backup_count,
+            )
+    return _exporter
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Outer update middleware starting a trace for a sampled share of updates."""
+
+    def __init__(self, sample_rate: float):
+        self.sample_rate = sample_rate
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if random.random() >= self.sample_rate:
+            return await handler(event, data)
+
+        attributes = {}
+        if isinstance(event, Update):
+            attributes = {"update_id": event.update_id, "update_type": event.event_type}
+
+        with start_trace("telegram.update", **attributes):
+            return await handler(event, data)
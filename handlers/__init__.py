@@ -4,8 +4,11 @@ Registers all routers with the main dispatcher.
 """
 
 from aiogram import Dispatcher
+from aiogram.types import Update
 
+from core.admission import CRITICAL, INTERACTIVE
 from . import start, connect, subscription, report
+from .callbacks import callbacks
 
 
 def register_handlers(dp: Dispatcher) -> None:
@@ -18,4 +21,29 @@ def register_handlers(dp: Dispatcher) -> None:
     dp.include_router(start.router)
     dp.include_router(connect.router)
     dp.include_router(subscription.router)
-    dp.include_router(report.router)
\ No newline at end of file
+    dp.include_router(report.router)
+
+    # All callback queries are dispatched through one indexed handler
+    dp.include_router(callbacks.router)
+
+
+def classify_update(update: Update) -> int:
+    """
+    Get admission priority of an update.
+
+    Payments are critical; callback priorities come from their registration
+    in the callback index; everything else is interactive.
+
+    Args:
+        update: Incoming update
+
+    Returns:
+        Priority from core.admission
+    """
+    if update.pre_checkout_query is not None:
+        return CRITICAL
+    if update.message is not None and update.message.successful_payment is not None:
+        return CRITICAL
+    if update.callback_query is not None:
+        return callbacks.priority(update.callback_query.data or "")
+    return INTERACTIVE
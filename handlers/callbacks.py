@@ -0,0 +1,176 @@
+"""
+Callback query routing for Ozon Logistics Bot.
+All callback_data routes are compiled into one index: plain values are looked
+up in a dict, typed payloads by their short prefix, so dispatch cost stays
+flat as menus grow instead of checking filters one by one.
+"""
+
+import inspect
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from aiogram import Router
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+from core.admission import INTERACTIVE
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class PeriodCallback(CallbackData, prefix="rp"):
+    """Report period selection, packed as 'rp:<days>'."""
+
+    days: int
+
+
+class CompareCallback(CallbackData, prefix="rx"):
+    """Report period selection with comparison to the preceding period, packed as 'rx:<days>'."""
+
+    days: int
+
+
+class ConsolidatedCallback(CallbackData, prefix="rc"):
+    """Consolidated multi-shop report period selection, packed as 'rc:<days>'."""
+
+    days: int
+
+
+class PayCallback(CallbackData, prefix="pay"):
+    """Subscription plan selection, packed as 'pay:<months>'."""
+
+    months: int
+
+
+class _Route:
+    """Registered callback handler with precomputed accepted kwargs."""
+
+    __slots__ = ("handler", "params", "accepts_any", "priority")
+
+    def __init__(self, handler: Handler, priority: int):
+        self.handler = handler
+        self.priority = priority
+        parameters = inspect.signature(handler).parameters
+        self.params = frozenset(parameters)
+        self.accepts_any = any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters.values())
+
+    async def __call__(self, callback: CallbackQuery, data: Dict[str, Any]) -> Any:
+        if self.accepts_any:
+            return await self.handler(callback, **data)
+        return await self.handler(callback, **{k: v for k, v in data.items() if k in self.params})
+
+
+class CallbackIndex:
+    """Hash index of callback_data routes."""
+
+    def __init__(self):
+        self._exact: Dict[str, _Route] = {}
+        self._typed: Dict[str, Tuple[Type[CallbackData], _Route]] = {}
+        self.router = Router(name="callbacks")
+        self.router.callback_query.register(self._dispatch)
+
+    def exact(self, value: str, priority: int = INTERACTIVE) -> Callable[[Handler], Handler]:
+        """
+        Register handler for a plain callback_data value.
+
+        Args:
+            value: callback_data value
+            priority: Admission priority (see core.admission)
+
+        Returns:
+            Decorator
+        """
+
+        def decorator(handler: Handler) -> Handler:
+            if value in self._exact:
+                raise ValueError(f"Callback '{value}' is already handled by {self._exact[value].handler.__name__}")
+            self._exact[value] = _Route(handler, priority)
+            return handler
+
+        return decorator
+
+    def typed(
+        self,
+        callback_data: Type[CallbackData],
+        priority: int = INTERACTIVE
+    ) -> Callable[[Handler], Handler]:
+        """
+        Register handler for a typed payload; it receives the unpacked object as callback_data.
+
+        Args:
+            callback_data: CallbackData subclass
+            priority: Admission priority (see core.admission)
+
+        Returns:
+            Decorator
+        """
+        prefix = callback_data.__prefix__
+
+        def decorator(handler: Handler) -> Handler:
+            if prefix in self._typed:
+                raise ValueError(f"Callback prefix '{prefix}' is already registered")
+            self._typed[prefix] = (callback_data, _Route(handler, priority))
+            return handler
+
+        return decorator
+
+    def resolve(self, data: str) -> Optional[Tuple[_Route, Optional[CallbackData]]]:
+        """
+        Find route for callback_data.
+
+        Args:
+            data: Raw callback_data
+
+        Returns:
+            (route, unpacked payload or None) or None if unknown
+        """
+        route = self._exact.get(data)
+        if route is not None:
+            return route, None
+
+        prefix, separator, _ = data.partition(":")
+        if separator:
+            typed = self._typed.get(prefix)
+            if typed is not None:
+                callback_data, route = typed
+                try:
+                    return route, callback_data.unpack(data)
+                except (TypeError, ValueError):
+                    return None
+        return None
+
+    def priority(self, data: str) -> int:
+        """
+        Get admission priority of callback_data without unpacking it.
+
+        Args:
+            data: Raw callback_data
+
+        Returns:
+            Route priority (INTERACTIVE for unknown data)
+        """
+        route = self._exact.get(data)
+        if route is None:
+            typed = self._typed.get(data.partition(":")[0])
+            if typed is None:
+                return INTERACTIVE
+            route = typed[1]
+        return route.priority
+
+    async def _dispatch(self, callback: CallbackQuery, **data: Any) -> Any:
+        """Single aiogram callback handler dispatching through the index."""
+        resolved = self.resolve(callback.data or "")
+        if resolved is None:
+            logger.debug(f"Unknown callback_data: {callback.data!r}")
+            await callback.answer()
+            return None
+
+        route, payload = resolved
+        if payload is not None:
+            data["callback_data"] = payload
+        return await route(callback, data)
+
+
+# Shared index used by all handler modules
+callbacks = CallbackIndex()
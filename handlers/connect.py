@@ -3,11 +3,16 @@ Ozon connection handler for Ozon Logistics Bot.
 Handles connecting Ozon Seller API credentials (stub implementation).
 """
 
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
+from core.db import async_session, add_shop, create_user, get_user_by_telegram_id, get_user_shops
+from services.catalog import schedule_catalog_sync
+from services.job_queue import schedule_ingestion, schedule_rollup_backfill
+from .callbacks import callbacks
+
 router = Router()
 
 
@@ -17,7 +22,7 @@ class ConnectStates(StatesGroup):
     waiting_for_api_key = State()
 
 
-@router.callback_query(F.data == "menu_connect")
+@callbacks.exact("menu_connect")
 async def start_connect(callback: CallbackQuery, state: FSMContext) -> None:
     """
     Start Ozon connection process.
@@ -84,12 +89,29 @@ async def process_api_key(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     client_id = data.get("client_id")
 
+    # Save shop (a user may connect several shops)
+    async with async_session() as session:
+        user = await get_user_by_telegram_id(session, message.from_user.id)
+        if not user:
+            user = await create_user(session, message.from_user.id)
+        shop = await add_shop(session, user, client_id, api_key)
+        shops_count = len(await get_user_shops(session, user.id))
+
+    # Download the catalog now so the first report does not wait for it
+    schedule_catalog_sync(client_id, api_key)
+    # Postings history is ingested by the job worker (resumable, survives restarts)
+    await schedule_ingestion(shop.id)
+    # Daily rollups of the history as well, reports only roll up their own period
+    await schedule_rollup_backfill(shop.id)
+
     # Here would be actual API validation (stub for now)
     success_text = (
         "✅ <b>Данные получены!</b>\n\n"
         f"Client ID: <code>{client_id}</code>\n"
-        f"API Key: <code>{'*' * len(api_key)}</code>\n\n"
+        f"API Key: <code>{'*' * len(api_key)}</code>\n"
+        f"Подключено магазинов: {shops_count}\n\n"
         "🔄 <i>Проверка подключения... (логика будет добавлена позже)</i>\n\n"
+        "Чтобы добавить еще один магазин, снова выберите 'Подключить Ozon'.\n"
         "Используйте /start для возврата в главное меню."
     )
 
@@ -98,5 +120,4 @@ async def process_api_key(message: Message, state: FSMContext) -> None:
     # Clear state
     await state.clear()
 
-    # TODO: Save to database when implemented
     # TODO: Validate credentials with Ozon API
\ No newline at end of file
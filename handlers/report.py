@@ -1,24 +1,105 @@
 """
 Report generation handler for Ozon Logistics Bot.
-Handles report requests and period selection (stub implementation).
+Handles report requests and period selection; reports run as fairly
+scheduled, memory-budgeted jobs (see services.scheduler.run_report_job).
 """
 
-from aiogram import Router, F
-from aiogram.types import CallbackQuery
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot, Router
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from core.admission import HEAVY
+from core.config import settings
+from core.db import Shop, User, async_session, get_user_by_telegram_id, get_user_shops
+from services.excel_gen import FORMAT_CSV_GZ, deliver_consolidated_report, deliver_report
+from services.progress import ProgressReporter
+from services.resilience import CircuitOpenError
+from services.scheduler import run_report_job
+from .callbacks import CompareCallback, ConsolidatedCallback, PeriodCallback, callbacks
+
+logger = logging.getLogger(__name__)
+
 router = Router()
 
+# Report pipeline stages shown in the progress message
+REPORT_STAGES = (
+    "📊 Сбор данных о продажах",
+    "🚚 Расчет логистики",
+    "📈 Формирование Excel-файла",
+)
+
+
+def build_progress_text(period_days: int, current_stage: int) -> str:
+    """
+    Build progress message text.
+
+    Args:
+        period_days: Report period in days
+        current_stage: Index of the running stage in REPORT_STAGES
+
+    Returns:
+        str: Message text (HTML)
+    """
+    lines = []
+    for index, stage in enumerate(REPORT_STAGES):
+        if index < current_stage:
+            lines.append(f"✅ {stage}")
+        elif index == current_stage:
+            lines.append(f"🔄 {stage}...")
+        else:
+            lines.append(f"▫️ {stage}")
+
+    return (
+        f"🔄 <b>Генерация отчета</b>\n\n"
+        f"Период: последние {period_days} дней\n\n"
+        + "\n".join(lines)
+        + "\n\n<i>Отчет будет готов через несколько минут</i>"
+    )
+
+
+def has_active_subscription(user: User) -> bool:
+    """Check whether the user's trial or paid subscription is running."""
+    if not user.is_active:
+        return False
+    now = datetime.utcnow()
+    if user.subscription_expires_at is not None and user.subscription_expires_at > now:
+        return True
+    return (
+        user.trial_start_date is not None
+        and user.trial_start_date + timedelta(days=settings.trial_period_days) > now
+    )
+
 
-@router.callback_query(F.data == "menu_report")
+async def load_report_user(telegram_id: int) -> Tuple[Optional[User], List[Shop]]:
+    """
+    Load user and connected shops.
+
+    Args:
+        telegram_id: Telegram user ID
+
+    Returns:
+        (User or None if not registered, shops of the user)
+    """
+    async with async_session() as session:
+        user = await get_user_by_telegram_id(session, telegram_id)
+        if user is None:
+            return None, []
+        return user, await get_user_shops(session, user.id)
+
+
+@callbacks.exact("menu_report")
 async def start_report_generation(callback: CallbackQuery) -> None:
     """
     Start report generation process.
     Check prerequisites and show period selection.
     """
-    # Mock prerequisite checks (will be replaced with database queries)
-    ozon_connected = False  # Mock: not connected
-    subscription_active = True  # Mock: trial active
+    user, shops = await load_report_user(callback.from_user.id)
+    ozon_connected = bool(shops)
+    subscription_active = user is not None and has_active_subscription(user)
 
     if not ozon_connected:
         error_text = (
@@ -65,11 +146,21 @@ async def start_report_generation(callback: CallbackQuery) -> None:
         "✅ Магазин подключен\n"
         "✅ Подписка активна\n\n"
         "Отчет будет содержать данные о логистике и продажах."
+        + (
+            f"\n\nПодключено магазинов: {len(shops)}. Обычный отчет строится по магазину "
+            f"«{shops[0].name}», сводный — по всем."
+            if len(shops) > 1 else ""
+        )
     )
 
     keyboard = InlineKeyboardBuilder()
-    keyboard.button(text="📅 За последние 7 дней", callback_data="set_period_7")
-    keyboard.button(text="📅 За последние 28 дней", callback_data="set_period_28")
+    keyboard.button(text="📅 За последние 7 дней", callback_data=PeriodCallback(days=7))
+    keyboard.button(text="📅 За последние 28 дней", callback_data=PeriodCallback(days=28))
+    keyboard.button(text="📈 7 дней со сравнением", callback_data=CompareCallback(days=7))
+    keyboard.button(text="📈 28 дней со сравнением", callback_data=CompareCallback(days=28))
+    if len(shops) > 1:
+        keyboard.button(text="🏬 Все магазины за 7 дней", callback_data=ConsolidatedCallback(days=7))
+        keyboard.button(text="🏬 Все магазины за 28 дней", callback_data=ConsolidatedCallback(days=28))
     keyboard.button(text="⬅️ Назад", callback_data="back_to_main")
 
     keyboard.adjust(1)
@@ -82,57 +173,137 @@ async def start_report_generation(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("set_period_"))
-async def process_period_selection(callback: CallbackQuery) -> None:
-    """Process period selection and start report generation (stub)."""
-    period_days = int(callback.data.split("_")[-1])
+@callbacks.typed(PeriodCallback, priority=HEAVY)
+async def process_period_selection(callback: CallbackQuery, callback_data: PeriodCallback, bot: Bot) -> None:
+    """Process period selection, build the report of the first shop and send it as a document."""
+    await generate_report(callback, bot, callback_data.days, consolidated=False)
 
-    processing_text = (
-        f"🔄 <b>Генерация отчета</b>\n\n"
-        f"Период: последние {period_days} дней\n\n"
-        "📊 Сбор данных о продажах...\n"
-        "🚚 Расчет логистики...\n"
-        "📈 Формирование Excel-файла...\n\n"
-        "<i>Отчет будет готов через несколько секунд (логика будет добавлена позже)</i>"
-    )
 
-    # Remove keyboard during processing
-    await callback.message.edit_text(
-        processing_text,
-        reply_markup=None,
-        parse_mode="HTML"
-    )
-    await callback.answer()
+@callbacks.typed(CompareCallback, priority=HEAVY)
+async def process_compare_selection(callback: CallbackQuery, callback_data: CompareCallback, bot: Bot) -> None:
+    """Process period selection of the report compared with the preceding period of the same length."""
+    await generate_report(callback, bot, callback_data.days, consolidated=False, compare_previous=True)
 
-    # Mock processing delay
-    # In real implementation, this would call the report service
-    # await asyncio.sleep(2)
 
-    # Mock completion
-    completion_text = (
-        f"✅ <b>Отчет готов!</b>\n\n"
-        f"📊 Период: последние {period_days} дней\n"
-        "📎 Excel-файл сгенерирован\n\n"
-        "<i>Загрузка файла будет реализована позже</i>\n\n"
-        "Используйте /start для новых действий."
-    )
+@callbacks.typed(ConsolidatedCallback, priority=HEAVY)
+async def process_consolidated_selection(
+    callback: CallbackQuery,
+    callback_data: ConsolidatedCallback,
+    bot: Bot
+) -> None:
+    """Process period selection of the consolidated report over all shops."""
+    await generate_report(callback, bot, callback_data.days, consolidated=True)
+
 
+def build_done_keyboard() -> InlineKeyboardMarkup:
+    """Keyboard shown under a finished or failed report."""
     keyboard = InlineKeyboardBuilder()
     keyboard.button(text="📊 Новый отчет", callback_data="menu_report")
     keyboard.button(text="⬅️ Главное меню", callback_data="back_to_main")
+    return keyboard.as_markup()
 
-    await callback.message.edit_text(
-        completion_text,
-        reply_markup=keyboard.as_markup(),
-        parse_mode="HTML"
-    )
 
+async def generate_report(
+    callback: CallbackQuery,
+    bot: Bot,
+    period_days: int,
+    consolidated: bool,
+    compare_previous: bool = False
+) -> None:
+    """
+    Build report as a fairly scheduled job and send it, reporting progress in the menu message.
 
-@router.callback_query(F.data == "back_to_main")
-async def back_to_main_from_report(callback: CallbackQuery) -> None:
-    """Go back to main menu from report section."""
-    await callback.message.edit_text(
-        "Возвращаемся в главное меню...",
-        reply_markup=None
+    Interactive reports stay on the in-process scheduler: its weighted fair
+    queue and per-user cap see every waiting report, which the durable job
+    queue (claimed in order by a few worker slots) would hide.
+
+    Args:
+        callback: Period selection callback
+        bot: Bot instance
+        period_days: Report period in days
+        consolidated: Report over all shops of the user instead of the first one
+        compare_previous: Add comparison with the preceding period (single-shop report only)
+    """
+    telegram_id = callback.from_user.id
+    chat_id = callback.message.chat.id
+
+    # Progress edits are coalesced and rate-limited, the pipeline never waits on them
+    progress = ProgressReporter(bot, chat_id, callback.message.message_id)
+
+    # Remove keyboard during processing
+    progress.update(build_progress_text(period_days, 0))
+    await callback.answer()
+
+    user, shops = await load_report_user(telegram_id)
+    if not shops or not has_active_subscription(user):
+        await progress.finish(
+            "❌ <b>Отчет недоступен</b>\n\nПроверьте подключение магазина и подписку.",
+            reply_markup=build_done_keyboard(),
+        )
+        return
+    if not consolidated:
+        shops = shops[:1]
+
+    async def _calculate() -> Dict[str, Any]:
+        # Imported here: the Ozon client is loaded with the first report, not on startup
+        from services.ozon_api import OzonAPIService, calculate_consolidated_report
+
+        progress.update(build_progress_text(period_days, 1))
+        # Summaries come from daily rollups instead of being recomputed per report
+        if consolidated:
+            return await calculate_consolidated_report(shops, period_days, use_rollups=True)
+        async with OzonAPIService(shops[0].client_id, shops[0].api_key) as service:
+            return await service.calculate_logistics_report(
+                period_days, compare_previous=compare_previous, use_rollups=True
+            )
+
+    async def _deliver(report_data: Dict[str, Any]) -> List[str]:
+        progress.update(build_progress_text(period_days, 2))
+        if consolidated:
+            await deliver_consolidated_report(bot, chat_id, report_data)
+            notes = [f"📎 Сводный Excel-файл по {len(report_data['shops'])} магазинам отправлен"]
+            if report_data["failed_shops"]:
+                notes.append(f"⚠️ Нет данных по магазинам: {len(report_data['failed_shops'])}")
+            reports = [item["report"] for item in report_data["shops"]]
+        else:
+            report_format = await deliver_report(bot, chat_id, report_data)
+            notes = [
+                "📎 Отчет большой: логистика, продажи и остатки отправлены файлами CSV (gzip)"
+                if report_format == FORMAT_CSV_GZ else "📎 Excel-файл с логистикой, продажами и остатками отправлен"
+            ]
+            if report_data.get("comparison"):
+                notes.append(
+                    "📈 Сравнение с предыдущим периодом добавлено в сводку"
+                    if report_format != FORMAT_CSV_GZ else "📈 Сравнение с предыдущим периодом отправлено файлом CSV"
+                )
+            reports = [report_data]
+        if any(report["is_stale"] for report in reports):
+            notes.append("⚠️ Ozon API недоступен, использованы последние сохраненные данные")
+        return notes
+
+    try:
+        # Cost grows with the number of shops fetched
+        notes = await run_report_job(telegram_id, period_days * len(shops), _calculate, _deliver)
+    except CircuitOpenError as e:
+        await progress.finish(
+            "⏳ <b>Ozon API временно недоступен</b>\n\n"
+            f"Попробуйте через {max(int(e.retry_in), 1)} сек.",
+            reply_markup=build_done_keyboard(),
+        )
+        return
+    except Exception:
+        logger.exception(f"Report for user {telegram_id} failed")
+        await progress.finish(
+            "❌ <b>Не удалось сформировать отчет</b>\n\nПопробуйте позже.",
+            reply_markup=build_done_keyboard(),
+        )
+        return
+
+    completion_text = (
+        f"✅ <b>Отчет готов!</b>\n\n"
+        f"📊 Период: последние {period_days} дней\n"
+        + "".join(f"{note}\n" for note in notes)
+        + "\nИспользуйте /start для новых действий."
     )
-    await callback.answer()
\ No newline at end of file
+
+    await progress.finish(completion_text, reply_markup=build_done_keyboard())
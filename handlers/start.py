@@ -3,13 +3,14 @@ Start command handler for Ozon Logistics Bot.
 Handles /start command and main menu navigation.
 """
 
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from core.db import get_user_by_telegram_id, create_user
 from core.config import settings
+from .callbacks import callbacks
 
 router = Router()
 
@@ -52,36 +53,18 @@ async def cmd_start(message: Message) -> None:
     )
 
 
-@router.callback_query(F.data == "menu_connect")
-async def menu_connect(callback: CallbackQuery) -> None:
-    """Handle main menu -> Connect Ozon button."""
-    await callback.message.edit_text(
-        "Переходим к подключению Ozon...",
-        reply_markup=None
-    )
-    # This will be handled by connect.py handler
-    await callback.answer()
-
-
-@router.callback_query(F.data == "menu_subscribe")
-async def menu_subscribe(callback: CallbackQuery) -> None:
-    """Handle main menu -> Subscription button."""
-    await callback.message.edit_text(
-        "Переходим к управлению подпиской...",
-        reply_markup=None
-    )
-    # This will be handled by subscription.py handler
-    await callback.answer()
+# Main menu buttons (menu_connect, menu_subscribe, menu_report) are handled
+# directly by connect.py, subscription.py and report.py via the callback index.
 
 
-@router.callback_query(F.data == "menu_report")
-async def menu_report(callback: CallbackQuery) -> None:
-    """Handle main menu -> Get Report button."""
+@callbacks.exact("back_to_main")
+async def back_to_main(callback: CallbackQuery) -> None:
+    """Go back to main menu."""
+    # This will trigger the start command handler
     await callback.message.edit_text(
-        "Переходим к генерации отчета...",
+        "Возвращаемся в главное меню...",
         reply_markup=None
     )
-    # This will be handled by report.py handler
     await callback.answer()
 
 
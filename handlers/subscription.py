@@ -5,16 +5,27 @@ Handles subscription status display and payment options (stub implementation).
 
 from datetime import datetime, timedelta
 
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from core.admission import CRITICAL
 from core.config import settings
+from .callbacks import PayCallback, callbacks
 
 router = Router()
 
 
-@router.callback_query(F.data == "menu_subscribe")
+def get_plans() -> dict:
+    """Get subscription plans: months -> (period label, price)."""
+    return {
+        1: ("1 месяц", settings.subscription_price_1m),
+        6: ("6 месяцев", settings.subscription_price_6m),
+        12: ("1 год", settings.subscription_price_1y),
+    }
+
+
+@callbacks.exact("menu_subscribe", priority=CRITICAL)
 async def show_subscription_status(callback: CallbackQuery) -> None:
     """
     Show current subscription status.
@@ -55,7 +66,7 @@ async def show_subscription_status(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "pay_menu")
+@callbacks.exact("pay_menu", priority=CRITICAL)
 async def show_payment_options(callback: CallbackQuery) -> None:
     """Show payment options menu."""
     payment_text = (
@@ -67,9 +78,9 @@ async def show_payment_options(callback: CallbackQuery) -> None:
     )
 
     keyboard = InlineKeyboardBuilder()
-    keyboard.button(text=f"1 месяц ({settings.subscription_price_1m} ₽)", callback_data="pay_1m")
-    keyboard.button(text=f"6 месяцев ({settings.subscription_price_6m} ₽)", callback_data="pay_6m")
-    keyboard.button(text=f"1 год ({settings.subscription_price_1y} ₽)", callback_data="pay_1y")
+    keyboard.button(text=f"1 месяц ({settings.subscription_price_1m} ₽)", callback_data=PayCallback(months=1))
+    keyboard.button(text=f"6 месяцев ({settings.subscription_price_6m} ₽)", callback_data=PayCallback(months=6))
+    keyboard.button(text=f"1 год ({settings.subscription_price_1y} ₽)", callback_data=PayCallback(months=12))
     keyboard.button(text="⬅️ Назад", callback_data="menu_subscribe")
 
     keyboard.adjust(1)
@@ -82,24 +93,15 @@ async def show_payment_options(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("pay_"))
-async def process_payment(callback: CallbackQuery) -> None:
+@callbacks.typed(PayCallback, priority=CRITICAL)
+async def process_payment(callback: CallbackQuery, callback_data: PayCallback) -> None:
     """Process payment selection (stub implementation)."""
-    payment_type = callback.data
-
     # Mock payment processing
-    if payment_type == "pay_1m":
-        amount = settings.subscription_price_1m
-        period = "1 месяц"
-    elif payment_type == "pay_6m":
-        amount = settings.subscription_price_6m
-        period = "6 месяцев"
-    elif payment_type == "pay_1y":
-        amount = settings.subscription_price_1y
-        period = "1 год"
-    else:
+    plan = get_plans().get(callback_data.months)
+    if plan is None:
         await callback.answer("Ошибка выбора периода")
         return
+    period, amount = plan
 
     success_text = (
         f"✅ <b>Оплата инициирована!</b>\n\n"
@@ -120,7 +122,7 @@ async def process_payment(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.callback_query(F.data == "cancel_auto_renew")
+@callbacks.exact("cancel_auto_renew", priority=CRITICAL)
 async def cancel_auto_renew(callback: CallbackQuery) -> None:
     """Cancel auto-renewal (stub)."""
     text = (
@@ -137,15 +139,4 @@ async def cancel_auto_renew(callback: CallbackQuery) -> None:
         reply_markup=keyboard.as_markup(),
         parse_mode="HTML"
     )
-    await callback.answer()
-
-
-@router.callback_query(F.data == "back_to_main")
-async def back_to_main(callback: CallbackQuery) -> None:
-    """Go back to main menu."""
-    # This will trigger the start command handler
-    await callback.message.edit_text(
-        "Возвращаемся в главное меню...",
-        reply_markup=None
-    )
     await callback.answer()
\ No newline at end of file
@@ -11,10 +11,18 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from core.admission import AdmissionMiddleware, create_admission_controller
+from core.bot_session import create_bot_session
 from core.config import settings
-from core.db import create_tables
-from handlers import register_handlers
+from core.db import (
+    create_tables, ensure_schema, maintain_posting_partitions, start_replica_monitor, warm_pool,
+)
+from core.metrics import render_metrics
+from core.tracing import TracingMiddleware
+from handlers import classify_update, register_handlers
+from services.job_queue import create_job_worker, schedule_partition_maintenance
 
 # Configure logging
 logging.basicConfig(
@@ -28,6 +36,58 @@ bot: Bot
 dp: Dispatcher
 
 
+async def ensure_webhook(bot: Bot, webhook_url: str) -> bool:
+    """
+    Register webhook only if Telegram does not already have this URL.
+
+    Args:
+        bot: Bot instance
+        webhook_url: Full webhook URL
+
+    Returns:
+        bool: True if set_webhook was called
+    """
+    info = await bot.get_webhook_info()
+    if info.url == webhook_url:
+        return False
+    await bot.set_webhook(webhook_url)
+    return True
+
+
+async def prepare_database() -> bool:
+    """
+    Check schema, then queue maintenance of postings partitions.
+
+    The maintenance job is deduplicated, so replicas starting together run it
+    once; it schedules itself for the next day. Without a job worker in this
+    process it runs inline instead, so partitions exist before ingestion.
+
+    Returns:
+        bool: True if the schema was upgraded
+    """
+    upgraded = await ensure_schema()
+    if settings.job_worker_enabled:
+        await schedule_partition_maintenance()
+    else:
+        await maintain_posting_partitions()
+    return upgraded
+
+
+async def startup_fast(bot: Bot) -> None:
+    """Run schema check, pool warm-up and webhook check concurrently."""
+    tasks = [prepare_database(), warm_pool(settings.db_pool_warm_size)]
+    if settings.telegram_webhook_url:
+        tasks.append(ensure_webhook(bot, f"{settings.telegram_webhook_url}/webhook"))
+
+    results = await asyncio.gather(*tasks)
+
+    logger.info("Database schema %s", "upgraded" if results[0] else "up to date")
+    if settings.telegram_webhook_url:
+        logger.info("Webhook %s", "updated" if results[2] else "unchanged")
+    else:
+        logger.info("Running in polling mode (development)")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan context manager."""
@@ -39,6 +99,7 @@ async def lifespan(app: FastAPI):
     # Initialize bot and dispatcher
     bot = Bot(
         token=settings.telegram_bot_token,
+        session=create_bot_session(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     dp = Dispatcher()
@@ -46,23 +107,54 @@ async def lifespan(app: FastAPI):
     # Register all handlers
     register_handlers(dp)
 
-    # Create database tables
-    await create_tables()
-    logger.info("Database tables created/verified")
+    admission = None
+    if settings.admission_enabled:
+        # Registered first so shed updates skip all other middlewares
+        admission = create_admission_controller()
+        admission.start()
+        dp.update.outer_middleware(AdmissionMiddleware(admission, classify_update))
 
-    # Set webhook if URL is provided (production mode)
-    if settings.telegram_webhook_url:
-        webhook_url = f"{settings.telegram_webhook_url}/webhook"
-        await bot.set_webhook(webhook_url)
-        logger.info(f"Webhook set to: {webhook_url}")
+    if settings.tracing_enabled:
+        dp.update.outer_middleware(TracingMiddleware(settings.tracing_sample_rate))
+        logger.info(f"Tracing enabled (sample rate {settings.tracing_sample_rate})")
+
+    if settings.fast_startup:
+        await startup_fast(bot)
     else:
-        logger.info("Running in polling mode (development)")
+        # Create database tables
+        await create_tables()
+        logger.info("Database tables created/verified")
+
+        # Set webhook if URL is provided (production mode)
+        if settings.telegram_webhook_url:
+            webhook_url = f"{settings.telegram_webhook_url}/webhook"
+            await bot.set_webhook(webhook_url)
+            logger.info(f"Webhook set to: {webhook_url}")
+        else:
+            logger.info("Running in polling mode (development)")
+
+    replica_monitor = start_replica_monitor()
+    if replica_monitor is not None:
+        logger.info("Read replica routing enabled")
+
+    job_worker = None
+    if settings.job_worker_enabled:
+        job_worker = create_job_worker()
+        job_worker.start()
+        logger.info(f"Job worker {job_worker.worker_id} started")
 
     yield
 
     # Shutdown
     logger.info("Shutting down Ozon Logistics Bot...")
-    if settings.telegram_webhook_url:
+    if job_worker is not None:
+        await job_worker.stop()
+    if replica_monitor is not None:
+        replica_monitor.cancel()
+    if admission is not None:
+        admission.stop()
+    # In fast startup mode the webhook is kept so a restart does not re-register it
+    if settings.telegram_webhook_url and not settings.fast_startup:
         await bot.delete_webhook()
     await bot.session.close()
 
@@ -82,6 +174,12 @@ async def root():
     return {"status": "ok", "service": "Ozon Logistics Bot"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Metrics endpoint in Prometheus text format."""
+    return render_metrics()
+
+
 @app.post("/webhook")
 async def webhook_handler(update: dict):
     """Telegram webhook endpoint."""
@@ -1,2 +1,25 @@
 # Services package for external API integrations
-# Contains Ozon API, YooKassa, and Excel generation services
\ No newline at end of file
+# Contains Ozon API, YooKassa, and Excel generation services
+#
+# Service modules are imported lazily on first attribute access so that
+# heavy dependencies (httpx clients, openpyxl) stay off the startup path.
+
+import importlib
+
+_LAZY_ATTRS = {
+    "OzonAPIService": "services.ozon_api",
+    "create_ozon_service": "services.ozon_api",
+    "YooKassaService": "services.yookassa",
+    "create_yookassa_service": "services.yookassa",
+    "ExcelReportGenerator": "services.excel_gen",
+    "create_excel_generator": "services.excel_gen",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'services' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,227 @@
+"""
+Product catalog cache for Ozon Logistics Bot.
+Keeps each seller's catalog in memory with a SKU -> row index. After the
+first full download only changes since the last sync are fetched, in the
+background, so reports read the catalog without waiting on Ozon.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from core.config import settings
+from services.records import PostingBatch, ProductBatch
+
+logger = logging.getLogger(__name__)
+
+# Sellers whose catalogs are kept in memory
+MAX_CACHED_CATALOGS = 256
+
+# Row index used in joins for SKUs missing from the catalog
+MISSING = -1
+
+
+class ProductCatalog:
+    """Snapshot of a seller's catalog with SKU index; products are never modified in place."""
+
+    __slots__ = ("products", "index", "synced_at", "checked_at")
+
+    def __init__(self, products: ProductBatch, synced_at: datetime, index: Optional[Dict[str, int]] = None):
+        """
+        Initialize catalog.
+
+        Args:
+            products: Catalog products (owned by the catalog)
+            synced_at: Ozon time the catalog is current as of
+            index: SKU -> row index of products (built if None)
+        """
+        self.products = products
+        self.index = index if index is not None else {sku: row for row, sku in enumerate(products.skus)}
+        self.synced_at = synced_at
+        self.checked_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.products)
+
+    def with_changes(
+        self,
+        changed: ProductBatch,
+        removed: Iterable[str],
+        synced_at: datetime
+    ) -> "ProductCatalog":
+        """
+        Build new snapshot with changes applied (readers of this one are unaffected).
+
+        Args:
+            changed: New and updated products
+            removed: SKUs removed or archived
+            synced_at: Ozon time the changes are current as of
+
+        Returns:
+            New ProductCatalog
+        """
+        products = self.products.copy()
+        index = dict(self.index)
+
+        for sku, name, price, stocks, category, volume_weight in changed.rows():
+            row = index.get(sku)
+            if row is None:
+                index[sku] = len(products)
+                products.append(sku, name, price, stocks, category, volume_weight)
+            else:
+                products.replace(row, sku, name, price, stocks, category, volume_weight)
+
+        for sku in removed:
+            row = index.pop(sku, None)
+            if row is not None:
+                moved = products.swap_remove(row)
+                if moved is not None:
+                    index[moved] = row
+
+        return ProductCatalog(products, synced_at, index)
+
+    def row(self, sku: Optional[str]) -> int:
+        """Get product row for SKU (MISSING if unknown)."""
+        return self.index.get(sku, MISSING)
+
+    def join(self, postings: PostingBatch) -> array:
+        """
+        Map postings to catalog rows.
+
+        Each distinct SKU code is looked up once.
+
+        Args:
+            postings: Posting batch
+
+        Returns:
+            array of product row per posting (MISSING if not in the catalog)
+        """
+        rows_by_code = [self.index.get(sku, MISSING) for sku in postings.skus.values]
+        return array("l", (rows_by_code[code] for code in postings.sku_codes))
+
+    def fill_volume_weights(self, postings: PostingBatch) -> int:
+        """
+        Set unknown volume weights of postings from their products.
+
+        Posting lists carry no volume weight, so a posting gets the volume
+        weight of its (first) product. Each distinct SKU code is looked up once.
+
+        Args:
+            postings: Posting batch, updated in place
+
+        Returns:
+            int: Number of postings that got a volume weight
+        """
+        volumes = self.products.volume_weights
+        volume_by_code = [
+            volumes[row] if row != MISSING else math.nan
+            for row in (self.index.get(sku, MISSING) for sku in postings.skus.values)
+        ]
+        target = postings.volume_weights
+        filled = 0
+        for index, (volume, code) in enumerate(zip(target, postings.sku_codes)):
+            if math.isnan(volume) and not math.isnan(volume_by_code[code]):
+                target[index] = volume_by_code[code]
+                filled += 1
+        return filled
+
+
+# client_id -> latest catalog snapshot
+_catalogs: "OrderedDict[str, ProductCatalog]" = OrderedDict()
+
+# Background syncs in flight, keyed by client_id
+_syncs: Dict[str, asyncio.Task] = {}
+
+
+def _store(client_id: str, catalog: ProductCatalog) -> None:
+    """Publish catalog snapshot."""
+    _catalogs[client_id] = catalog
+    _catalogs.move_to_end(client_id)
+    while len(_catalogs) > MAX_CACHED_CATALOGS:
+        _catalogs.popitem(last=False)
+
+
+async def sync_catalog(service) -> ProductCatalog:
+    """
+    Bring the seller's catalog up to date: full download first, changes afterwards.
+
+    Args:
+        service: OzonAPIService for the seller
+
+    Returns:
+        Current ProductCatalog
+    """
+    started_at = datetime.utcnow()
+    catalog = _catalogs.get(service.client_id)
+
+    if catalog is None:
+        catalog = ProductCatalog(await service.get_product_data(), started_at)
+        logger.info(f"Catalog of {service.client_id} loaded: {len(catalog)} products")
+    else:
+        changed, removed = await service.get_product_changes(catalog.synced_at)
+        if len(changed) or removed:
+            catalog = catalog.with_changes(changed, removed, started_at)
+            logger.info(
+                f"Catalog of {service.client_id} synced: {len(changed)} changed, {len(removed)} removed"
+            )
+        else:
+            catalog.synced_at = started_at
+            catalog.checked_at = time.monotonic()
+
+    _store(service.client_id, catalog)
+    return catalog
+
+
+def schedule_catalog_sync(client_id: str, api_key: str) -> None:
+    """Sync catalog in background with its own Ozon client (no-op if already running)."""
+    if client_id in _syncs:
+        return
+
+    async def _sync() -> None:
+        # Imported here: ozon_api uses this module for reports
+        from services.ozon_api import OzonAPIService
+
+        try:
+            async with OzonAPIService(client_id, api_key) as service:
+                await sync_catalog(service)
+        except Exception as e:
+            logger.warning(f"Catalog sync for {client_id} failed: {e}")
+        finally:
+            _syncs.pop(client_id, None)
+
+    _syncs[client_id] = asyncio.get_running_loop().create_task(_sync())
+
+
+async def get_catalog(service) -> ProductCatalog:
+    """
+    Get seller's catalog for a report.
+
+    A cached catalog is returned immediately; if it is older than
+    catalog_sync_interval_seconds an incremental sync starts in background.
+    Only a seller without a cached catalog waits for the first download.
+
+    Args:
+        service: OzonAPIService for the seller
+
+    Returns:
+        ProductCatalog snapshot
+    """
+    catalog = _catalogs.get(service.client_id)
+    if catalog is None:
+        task = _syncs.get(service.client_id)
+        if task is not None:
+            await asyncio.shield(task)
+            catalog = _catalogs.get(service.client_id)
+        if catalog is None:
+            return await sync_catalog(service)
+        return catalog
+
+    _catalogs.move_to_end(service.client_id)
+    if time.monotonic() - catalog.checked_at >= settings.catalog_sync_interval_seconds:
+        schedule_catalog_sync(service.client_id, service.api_key)
+    return catalog
@@ -3,11 +3,41 @@ Excel report generation service for Ozon Logistics Bot.
 Creates formatted Excel reports with logistics and sales data (stub implementation for MVP).
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple, Union
+import asyncio
+import csv
+import hashlib
 import io
+import itertools
+import logging
+import math
+import operator
+import zlib
+from array import array
+from collections import OrderedDict
 from datetime import datetime
 
-# STUB: openpyxl import will be available after requirements installation
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, InputFile
+
+from core.bot_session import bulk_lane
+from core.config import settings
+from core.db import async_session, delete_report_file_id, get_report_file_id, save_report_file_id
+from core.tracing import traced
+from services.memory_budget import restore_fields, sort_rows
+from services.report_pack import build_report_pack
+from services.report_store import ArtifactInputFile, ReportArtifact, get_report_store
+
+logger = logging.getLogger(__name__)
+
+# In-process cache of content hash -> Telegram file_id in front of report_files table
+_FILE_ID_CACHE_SIZE = 1024
+_file_id_cache: "OrderedDict[str, str]" = OrderedDict()
+
+# STUB: openpyxl import will be available after requirements installation.
+# Import it inside the generate_* methods, not at module level: openpyxl
+# is slow to import and must not be loaded on bot startup.
 # from openpyxl import Workbook
 # from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
@@ -21,6 +51,7 @@ class ExcelReportGenerator:
         # self.workbook = Workbook()
         pass
 
+    @traced("excel.generate_logistics_report")
     def generate_logistics_report(self, report_data: Dict[str, Any]) -> bytes:
         """
         Generate comprehensive logistics Excel report.
@@ -34,12 +65,22 @@ class ExcelReportGenerator:
         # STUB: Return mock Excel data
         # TODO: Implement actual Excel generation with openpyxl
 
-        # Create mock Excel-like structure for now
-        mock_excel_content = self._create_mock_excel_structure(report_data)
-
         # In real implementation, this would return actual Excel file bytes
         # For now, return UTF-8 encoded string as bytes
-        return mock_excel_content.encode('utf-8')
+        return b"".join(self.iter_logistics_report(report_data))
+
+    def iter_logistics_report(self, report_data: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Generate logistics report as a stream of byte chunks.
+
+        Args:
+            report_data: Complete report data from OzonAPIService
+
+        Yields:
+            bytes: Chunks of Excel file content
+        """
+        # Create mock Excel-like structure for now
+        return _encode_lines(self._iter_mock_excel_lines(report_data))
 
     def _create_mock_excel_structure(self, report_data: Dict[str, Any]) -> str:
         """
@@ -51,59 +92,155 @@ class ExcelReportGenerator:
         Returns:
             str: Formatted text representation of Excel structure
         """
+        return "\n".join(self._iter_mock_excel_lines(report_data))
+
+    def _iter_mock_excel_lines(self, report_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        Yield mock Excel structure line by line.
+
+        Args:
+            report_data: Report data
+
+        Yields:
+            str: Lines of text representation of Excel structure
+        """
         period = report_data["period"]
         summary = report_data["summary"]
-        logistics_data = report_data["logistics_data"]
         products = report_data["products"]
 
         # Create tab-separated format to simulate Excel
-        lines = []
-
         # Title
-        lines.append("Ozon Logistics Report")
-        lines.append(f"Generated: {report_data['generated_at']}")
-        lines.append("")
+        yield "Ozon Logistics Report"
+        yield f"Generated: {report_data['generated_at']}"
+        if report_data.get("is_stale"):
+            yield f"⚠️ Ozon API недоступен, данные по состоянию на {report_data['data_as_of'][:16]}"
+        yield ""
 
         # Period info
-        lines.append("Период отчета")
-        lines.append(f"С: {period['from'][:10]}")
-        lines.append(f"По: {period['to'][:10]}")
-        lines.append(f"Дней: {period['days']}")
-        lines.append("")
+        yield "Период отчета"
+        yield f"С: {period['from'][:10]}"
+        yield f"По: {period['to'][:10]}"
+        yield f"Дней: {period['days']}"
+        yield ""
 
         # Summary section
-        lines.append("Сводка")
-        lines.append("Показатель\tЗначение")
-        lines.append(f"Всего заказов\t{summary['total_orders']}")
-        lines.append(f"Общая выручка\t{summary['total_revenue']} ₽")
-        lines.append(f"Стоимость логистики\t{summary['total_logistics_cost']} ₽")
-        lines.append(f"Маржа прибыли\t{summary['profit_margin']}%")
-        lines.append(f"Среднее время доставки\t{summary['average_delivery_time']} дней")
-        lines.append(f"Процент возвратов\t{summary['return_rate'] * 100}%")
-        lines.append("")
+        yield "Сводка"
+        yield "Показатель\tЗначение"
+        yield f"Всего заказов\t{summary['total_orders']}"
+        yield f"Общая выручка\t{summary['total_revenue']} ₽"
+        yield f"Стоимость логистики\t{summary['total_logistics_cost']} ₽"
+        yield f"Маржа прибыли\t{summary['profit_margin']}%"
+        yield f"Среднее время доставки\t{summary['average_delivery_time']} дней"
+        yield f"Процент возвратов\t{summary['return_rate'] * 100}%"
+        yield ""
+
+        yield from _iter_percentile_lines(summary.get("percentiles"))
+        yield from _iter_comparison_lines(report_data.get("comparison"))
+
+        tariff_summary = report_data.get("tariff_summary")
+        if tariff_summary:
+            yield "Проверка тарифов"
+            yield "Показатель\tЗначение"
+            yield f"Ожидаемая стоимость логистики\t{tariff_summary['expected_logistics_cost']} ₽"
+            yield f"Переплата\t{tariff_summary['logistics_cost_delta']} ₽"
+            yield f"Отправлений с переплатой\t{tariff_summary['overcharged_postings']}"
+            yield f"Без тарифа\t{tariff_summary['unpriced_postings']}"
+            yield ""
 
         # Logistics data
-        lines.append("Данные логистики")
-        lines.append("ID заказа\tТип доставки\tСтатус\tСтоимость\tДата доставки\tСклад")
-        for item in logistics_data:
-            delivery_date = item['delivery_date'][:10] if item['delivery_date'] else "В пути"
-            lines.append(
-                f"{item['order_id']}\t{item['delivery_type']}\t{item['status']}\t"
-                f"{item['cost']} ₽\t{delivery_date}\t{item['warehouse']}"
+        yield "Данные логистики"
+        yield (
+            "ID заказа\tТип доставки\tСтатус\tСтоимость\tДата доставки\tСклад"
+            "\tSKU\tТовар\tОжидаемая стоимость\tРазница"
+        )
+        # Most expensive postings first; spills to disk when the job is over its memory budget
+        rows = sort_rows(_iter_logistics_rows(report_data), key=operator.itemgetter(3), reverse=True)
+        for order_id, delivery_type, status, cost, delivered_at, warehouse, sku, name, expected, delta in rows:
+            delivery_date = delivered_at.strftime("%Y-%m-%d") if delivered_at else "В пути"
+            yield (
+                f"{order_id}\t{delivery_type}\t{status}\t"
+                f"{cost} ₽\t{delivery_date}\t{warehouse}\t{sku or '—'}\t{name or '—'}\t"
+                f"{_format_tariff_value(expected)}\t{_format_tariff_value(delta)}"
             )
-        lines.append("")
+        yield ""
 
         # Products data
-        lines.append("Товары")
-        lines.append("SKU\tНазвание\tЦена\tОстатки\tКатегория")
-        for product in products:
-            lines.append(
-                f"{product['sku']}\t{product['name']}\t{product['price']} ₽\t"
-                f"{product['stocks']}\t{product['category']}"
+        yield "Товары"
+        yield "SKU\tНазвание\tЦена\tОстатки\tКатегория"
+        for sku, name, price, stocks, category, _ in products.rows():
+            yield (
+                f"{sku}\t{name}\t{price} ₽\t"
+                f"{stocks}\t{category}"
             )
 
-        return "\n".join(lines)
+    @traced("excel.generate_consolidated_report")
+    def generate_consolidated_report(self, consolidated: Dict[str, Any]) -> bytes:
+        """
+        Generate multi-shop Excel report: combined summary sheet plus one sheet per shop.
+
+        Args:
+            consolidated: Data from calculate_consolidated_report
+
+        Returns:
+            bytes: Excel file content
+        """
+        return b"".join(self.iter_consolidated_report(consolidated))
+
+    def iter_consolidated_report(self, consolidated: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Generate multi-shop report as a stream of byte chunks.
+
+        Args:
+            consolidated: Data from calculate_consolidated_report
+
+        Yields:
+            bytes: Chunks of Excel file content
+        """
+        return _encode_lines(self._iter_consolidated_lines(consolidated))
+
+    def _iter_consolidated_lines(self, consolidated: Dict[str, Any]) -> Iterator[str]:
+        """
+        Yield mock multi-sheet structure line by line.
+
+        Args:
+            consolidated: Consolidated report data
 
+        Yields:
+            str: Lines of text representation of the workbook
+        """
+        period = consolidated["period"]
+        summary = consolidated["summary"]
+
+        yield _sheet_header("Сводка")
+        yield "Ozon Consolidated Logistics Report"
+        yield f"Generated: {consolidated['generated_at']}"
+        yield f"Период: {period['from'][:10]} — {period['to'][:10]} ({period['days']} дней)"
+        yield ""
+        yield "Магазин\tЗаказов\tВыручка\tЛогистика\tМаржа"
+        for item in consolidated["shops"]:
+            shop_summary = item["report"]["summary"]
+            yield (
+                f"{item['name']}\t{shop_summary['total_orders']}\t{shop_summary['total_revenue']} ₽\t"
+                f"{shop_summary['total_logistics_cost']} ₽\t{shop_summary['profit_margin']}%"
+            )
+        yield (
+            f"Итого\t{summary['total_orders']}\t{summary['total_revenue']} ₽\t"
+            f"{summary['total_logistics_cost']} ₽\t{summary['profit_margin']}%"
+        )
+
+        if consolidated["failed_shops"]:
+            yield ""
+            yield "Не удалось получить данные"
+            for item in consolidated["failed_shops"]:
+                yield f"{item['name']}\t{item['error']}"
+
+        for item in consolidated["shops"]:
+            yield ""
+            yield _sheet_header(item["name"])
+            # Shops spilled to disk are loaded back one sheet at a time
+            yield from self._iter_mock_excel_lines(restore_fields(item["report"]))
+
+    @traced("excel.generate_sales_report")
     def generate_sales_report(self, sales_data: List[Dict[str, Any]]) -> bytes:
         """
         Generate sales-focused Excel report.
@@ -115,17 +252,21 @@ class ExcelReportGenerator:
             bytes: Excel file content
         """
         # STUB: Simplified sales report
-        lines = ["Ozon Sales Report", ""]
+        return "\n".join(self._iter_sales_lines(sales_data)).encode('utf-8')
+
+    def _iter_sales_lines(self, sales_data: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield sales report structure line by line."""
+        yield "Ozon Sales Report"
+        yield ""
 
         if sales_data:
-            lines.append("Дата\tПродажи\tВыручка")
+            yield "Дата\tПродажи\tВыручка"
             for item in sales_data:
-                lines.append(f"{item.get('date', 'N/A')}\t{item.get('sales', 0)}\t{item.get('revenue', 0)}")
+                yield f"{item.get('date', 'N/A')}\t{item.get('sales', 0)}\t{item.get('revenue', 0)}"
         else:
-            lines.append("Нет данных о продажах")
-
-        return "\n".join(lines).encode('utf-8')
+            yield "Нет данных о продажах"
 
+    @traced("excel.generate_inventory_report")
     def generate_inventory_report(self, inventory_data: List[Dict[str, Any]]) -> bytes:
         """
         Generate inventory status Excel report.
@@ -137,23 +278,365 @@ class ExcelReportGenerator:
             bytes: Excel file content
         """
         # STUB: Inventory report
-        lines = ["Ozon Inventory Report", ""]
-
-        if inventory_data:
-            lines.append("SKU\tНазвание\tОстатки\tСтатус")
-            for item in inventory_data:
-                status = "В наличии" if item.get('stocks', 0) > 0 else "Нет в наличии"
-                lines.append(
-                    f"{item.get('sku', 'N/A')}\t{item.get('name', 'N/A')}\t"
-                    f"{item.get('stocks', 0)}\t{status}"
-                )
-        else:
-            lines.append("Нет данных об остатках")
+        return "\n".join(self._iter_inventory_lines(inventory_data)).encode('utf-8')
+
+    def _iter_inventory_lines(self, inventory_data: List[Dict[str, Any]]) -> Iterator[str]:
+        """Yield inventory report structure line by line (with sales columns when present)."""
+        yield "Ozon Inventory Report"
+        yield ""
+
+        if not inventory_data:
+            yield "Нет данных об остатках"
+            return
+
+        with_sales = "sold" in inventory_data[0]
+        yield "SKU\tНазвание\tОстатки\tСтатус" + ("\tПродано\tХватит на дней" if with_sales else "")
+        for item in inventory_data:
+            status = "В наличии" if item.get('stocks', 0) > 0 else "Нет в наличии"
+            line = f"{item.get('sku', 'N/A')}\t{item.get('name', 'N/A')}\t{item.get('stocks', 0)}\t{status}"
+            if with_sales:
+                days_of_cover = item.get('days_of_cover')
+                line += f"\t{item.get('sold', 0)}\t{'—' if days_of_cover is None else days_of_cover}"
+            yield line
+
+    @traced("excel.generate_report_pack")
+    def generate_report_pack(self, report_data: Dict[str, Any]) -> bytes:
+        """
+        Generate logistics, sales and inventory reports as sheets of one workbook.
+
+        Args:
+            report_data: Complete report data from OzonAPIService
 
-        return "\n".join(lines).encode('utf-8')
+        Returns:
+            bytes: Excel file content
+        """
+        return b"".join(self.iter_report_pack(report_data))
+
+    def iter_report_pack(self, report_data: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Generate report pack workbook as a stream of byte chunks.
+
+        Sales and inventory are derived from the same postings and products
+        as the logistics sheet in one scan, without fetching them separately.
+
+        Args:
+            report_data: Complete report data from OzonAPIService
+
+        Yields:
+            bytes: Chunks of Excel file content
+        """
+        return _encode_lines(self._iter_report_pack_lines(report_data))
+
+    def _iter_report_pack_lines(self, report_data: Dict[str, Any]) -> Iterator[str]:
+        """Yield report pack workbook line by line."""
+        pack = build_report_pack(report_data)
+
+        yield _sheet_header("Логистика")
+        yield from self._iter_mock_excel_lines(report_data)
+        yield ""
+        yield "Логистика по складам"
+        yield "Склад\tТип доставки\tЗаказов\tСтоимость\tСредняя"
+        for item in pack["logistics_data"]:
+            yield (
+                f"{item['warehouse']}\t{item['delivery_type']}\t{item['orders']}\t"
+                f"{item['logistics_cost']} ₽\t{item['average_cost']} ₽"
+            )
+        yield ""
+        yield _sheet_header("Продажи")
+        yield from self._iter_sales_lines(pack["sales_data"])
+        yield ""
+        yield _sheet_header("Остатки")
+        yield from self._iter_inventory_lines(pack["inventory_data"])
+
+    def iter_report_pack_csv_gz(self, report_data: Dict[str, Any]) -> Dict[str, Iterator[bytes]]:
+        """
+        Export report pack as parallel gzip-compressed CSV files.
+
+        Args:
+            report_data: Complete report data from OzonAPIService
+
+        Returns:
+            Dict of file name suffix -> stream of .csv.gz chunks
+        """
+        pack = build_report_pack(report_data)
+        streams = {
+            "logistics": self.iter_logistics_csv_gz(report_data),
+            "sales": self.iter_sales_csv_gz(pack["sales_data"]),
+            "inventory": self.iter_inventory_csv_gz(pack["inventory_data"]),
+        }
+        if report_data.get("comparison"):
+            streams["comparison"] = self.iter_comparison_csv_gz(report_data["comparison"])
+        return streams
+
+    def iter_logistics_csv_gz(self, report_data: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Export logistics rows as streamed gzip-compressed CSV (fast path for large sellers).
+
+        Args:
+            report_data: Complete report data from OzonAPIService
+
+        Yields:
+            bytes: Chunks of .csv.gz file content
+        """
+        # Same columns as the Excel logistics sheet, in posting order
+        rows = (
+            (
+                order_id, delivery_type, status, cost,
+                delivered_at.strftime("%Y-%m-%d") if delivered_at else "", warehouse,
+                sku or "", name or "",
+                "" if math.isnan(expected) else round(expected, 2),
+                "" if math.isnan(delta) else round(delta, 2),
+            )
+            for order_id, delivery_type, status, cost, delivered_at, warehouse, sku, name, expected, delta
+            in _iter_logistics_rows(report_data)
+        )
+        return _iter_csv_gz(
+            (
+                "ID заказа", "Тип доставки", "Статус", "Стоимость", "Дата доставки", "Склад",
+                "SKU", "Товар", "Ожидаемая стоимость", "Разница",
+            ),
+            rows,
+        )
+
+    def iter_comparison_csv_gz(self, comparison: Dict[str, Any]) -> Iterator[bytes]:
+        """
+        Export previous period comparison as streamed gzip-compressed CSV.
+
+        Args:
+            comparison: Comparison from services.ozon_api.compare_periods
+
+        Yields:
+            bytes: Chunks of .csv.gz file content
+        """
+        previous_period = comparison["previous_period"]
+        previous_label = f"Предыдущий ({previous_period['from'][:10]} — {previous_period['to'][:10]})"
+        rows = (
+            (
+                label, comparison["current"][key], comparison["previous"][key],
+                "" if comparison["changes"][key] is None else round(comparison["changes"][key], 2),
+            )
+            for key, label in COMPARISON_LABELS
+        )
+        return _iter_csv_gz(("Показатель", "Текущий", previous_label, "Изменение, %"), rows)
+
+    def iter_sales_csv_gz(self, sales_data: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+        """
+        Export sales data as streamed gzip-compressed CSV.
+
+        Args:
+            sales_data: Sales data
+
+        Yields:
+            bytes: Chunks of .csv.gz file content
+        """
+        rows = (
+            (item.get('date', ''), item.get('sales', 0), item.get('revenue', 0))
+            for item in sales_data
+        )
+        return _iter_csv_gz(("Дата", "Продажи", "Выручка"), rows)
+
+    def iter_inventory_csv_gz(self, inventory_data: List[Dict[str, Any]]) -> Iterator[bytes]:
+        """
+        Export inventory data as streamed gzip-compressed CSV (same columns as the Excel sheet).
+
+        Args:
+            inventory_data: Inventory data
+
+        Yields:
+            bytes: Chunks of .csv.gz file content
+        """
+        with_sales = bool(inventory_data) and "sold" in inventory_data[0]
+        header = ("SKU", "Название", "Остатки", "Статус") + (("Продано", "Хватит на дней") if with_sales else ())
+        rows = (
+            (
+                item.get('sku', ''), item.get('name', ''), item.get('stocks', 0),
+                "В наличии" if item.get('stocks', 0) > 0 else "Нет в наличии",
+            ) + (
+                (item.get('sold', 0), "" if item.get('days_of_cover') is None else item['days_of_cover'])
+                if with_sales else ()
+            )
+            for item in inventory_data
+        )
+        return _iter_csv_gz(header, rows)
+
+
+# Report output formats
+FORMAT_XLSX = "xlsx"
+FORMAT_CSV_GZ = "csv.gz"
+
+
+def choose_report_format(row_count: int) -> str:
+    """
+    Choose output format by row count.
+
+    Args:
+        row_count: Number of detail rows in the report
+
+    Returns:
+        str: FORMAT_CSV_GZ above the configured threshold, FORMAT_XLSX otherwise
+    """
+    if row_count > settings.csv_export_row_threshold:
+        return FORMAT_CSV_GZ
+    return FORMAT_XLSX
+
+
+def _iter_csv_gz(
+    header: Iterable[Any],
+    rows: Iterable[Iterable[Any]],
+    chunk_size: int = 256 * 1024
+) -> Iterator[bytes]:
+    """
+    Write rows as CSV and gzip them in a single pass with bounded memory.
+
+    Args:
+        header: Header row
+        rows: Data rows
+        chunk_size: Approximate size of uncompressed text buffered before compression
+
+    Yields:
+        bytes: gzip stream chunks
+    """
+    compressor = zlib.compressobj(settings.csv_export_compress_level, zlib.DEFLATED, 31)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM lets Excel detect UTF-8 when the file is opened directly
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            compressed = compressor.compress(buffer.getvalue().encode('utf-8'))
+            buffer.seek(0)
+            buffer.truncate()
+            if compressed:
+                yield compressed
+
+    tail = compressor.compress(buffer.getvalue().encode('utf-8')) + compressor.flush()
+    if tail:
+        yield tail
 
 
 # Utility functions
+def _sheet_header(title: str) -> str:
+    """Mark start of a new sheet in the text workbook representation."""
+    return f"=== Лист: {title} ==="
+
+
+def _encode_lines(lines: Iterable[str], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Join lines with newlines and encode them into UTF-8 chunks.
+
+    Args:
+        lines: Text lines
+        chunk_size: Approximate chunk size in characters
+
+    Yields:
+        bytes: Encoded chunks
+    """
+    buffer: List[str] = []
+    buffered = 0
+    separator = ""
+    for line in lines:
+        buffer.append(separator)
+        buffer.append(line)
+        separator = "\n"
+        buffered += len(line) + 1
+        if buffered >= chunk_size:
+            yield "".join(buffer).encode('utf-8')
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+
+PERCENTILE_SECTIONS = (
+    ("delivery_time", "warehouse", "Время доставки по складам (дней)"),
+    ("delivery_time", "sku", "Время доставки по SKU (дней)"),
+    ("cost", "warehouse", "Стоимость логистики по складам (₽)"),
+    ("cost", "sku", "Стоимость логистики по SKU (₽)"),
+)
+
+
+def _iter_percentile_lines(table: Optional[Dict[str, Any]]) -> Iterator[str]:
+    """Yield percentile sections of a summary (see services.sketches.percentiles)."""
+    if not table:
+        return
+    for metric, dimension, title in PERCENTILE_SECTIONS:
+        rows = table.get(metric, {}).get(dimension)
+        if not rows:
+            continue
+        yield title
+        yield f"{'Склад' if dimension == 'warehouse' else 'SKU'}\tКол-во\tp50\tp90\tp99"
+        for key, row in rows.items():
+            yield f"{key or '—'}\t{row['count']}\t{row['p50']}\t{row['p90']}\t{row['p99']}"
+        yield ""
+
+
+COMPARISON_LABELS = (
+    ("total_orders", "Заказов"),
+    ("total_revenue", "Выручка, ₽"),
+    ("total_logistics_cost", "Логистика, ₽"),
+    ("average_delivery_time", "Время доставки, дней"),
+    ("return_rate", "Доля возвратов"),
+)
+
+
+def _iter_comparison_lines(comparison: Optional[Dict[str, Any]]) -> Iterator[str]:
+    """Yield previous period comparison section (see services.ozon_api.compare_periods)."""
+    if not comparison:
+        return
+    previous_period = comparison["previous_period"]
+    yield "Сравнение с предыдущим периодом"
+    yield f"Предыдущий период\t{previous_period['from'][:10]} — {previous_period['to'][:10]}"
+    yield "Показатель\tТекущий\tПредыдущий\tИзменение"
+    for key, label in COMPARISON_LABELS:
+        change = comparison["changes"][key]
+        yield (
+            f"{label}\t{comparison['current'][key]}\t{comparison['previous'][key]}\t"
+            f"{'—' if change is None else f'{change:+.2f}%'}"
+        )
+    yield ""
+
+
+def _iter_logistics_rows(report_data: Dict[str, Any]) -> Iterator[Tuple]:
+    """Yield logistics rows joined with product and tariff columns (10-tuples)."""
+    columns = zip(
+        report_data["logistics_data"].rows(),
+        _iter_product_columns(report_data),
+        _iter_tariff_columns(report_data),
+    )
+    for row, product, tariff in columns:
+        yield row + product + tariff
+
+
+def _iter_product_columns(report_data: Dict[str, Any]) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+    """Yield (SKU, product name) per logistics row using the catalog join of the report."""
+    postings = report_data["logistics_data"]
+    skus = postings.skus.values
+    product_rows = report_data.get("posting_products")
+    if product_rows is None:
+        return ((skus[code], None) for code in postings.sku_codes)
+    names = report_data["products"].names
+    return (
+        (skus[code], names[row] if row >= 0 else None)
+        for code, row in zip(postings.sku_codes, product_rows)
+    )
+
+
+def _iter_tariff_columns(report_data: Dict[str, Any]) -> Iterator[Tuple[float, float]]:
+    """Yield (expected cost, delta) per logistics row, NaN when the report has no tariff check."""
+    tariff_check = report_data.get("tariff_check")
+    if tariff_check is None:
+        return itertools.repeat((math.nan, math.nan))
+    return zip(tariff_check.expected, tariff_check.deltas)
+
+
+def _format_tariff_value(value: float) -> str:
+    """Format expected cost or delta cell."""
+    return "—" if math.isnan(value) else f"{value:.2f} ₽"
+
+
 def format_currency(amount: float) -> str:
     """Format amount as currency string."""
     return "₽"
@@ -181,39 +664,342 @@ def create_excel_generator() -> ExcelReportGenerator:
 
 
 # File handling utilities
-async def save_report_to_file(report_bytes: bytes, filename: str) -> str:
+async def save_report_to_file(report: Union[bytes, Iterable[bytes]], filename: str) -> str:
     """
-    Save report bytes to file.
+    Save report to the on-disk artifact store.
 
     Args:
-        report_bytes: Excel file content
-        filename: Output filename
+        report: Excel file content or stream of content chunks
+        filename: Output filename (artifacts are addressed by content)
 
     Returns:
-        str: Path to saved file
+        str: Path to saved artifact
     """
-    # STUB: In real implementation, save to disk or cloud storage
-    # For now, just return the filename
-    return filename
+    chunks = [report] if isinstance(report, bytes) else report
+    artifact = await get_report_store().write_stream(chunks)
+    logger.debug(f"Saved {filename} as artifact {artifact.digest}")
+    return artifact.path
 
 
+async def generate_report_artifacts(
+    generator: ExcelReportGenerator,
+    report_data: Dict[str, Any],
+    report_format: Optional[str] = None
+) -> Tuple[Dict[str, ReportArtifact], str]:
+    """
+    Stream report pack (logistics, sales, inventory) straight into the artifact store.
+
+    Excel puts the reports on sheets of one workbook; CSV needs a file per report.
+
+    Args:
+        generator: Excel generator
+        report_data: Complete report data from OzonAPIService
+        report_format: FORMAT_XLSX or FORMAT_CSV_GZ (chosen by row count if None)
+
+    Returns:
+        Tuple of stored artifacts by report kind ("pack" for Excel) and format used
+    """
+    if report_format is None:
+        report_format = choose_report_format(len(report_data["logistics_data"]))
+
+    store = get_report_store()
+    if report_format == FORMAT_CSV_GZ:
+        artifacts = {}
+        # Builds sales and inventory data in one scan, kept off the event loop
+        streams = await asyncio.to_thread(generator.iter_report_pack_csv_gz, report_data)
+        for kind, stream in streams.items():
+            # Already compressed, store as is
+            artifacts[kind] = await store.write_stream(stream, compress=False)
+    else:
+        artifacts = {"pack": await store.write_stream(generator.iter_report_pack(report_data))}
+    return artifacts, report_format
+
+
+def hash_report(report_bytes: bytes) -> str:
+    """Get SHA-256 content hash of report bytes."""
+    return hashlib.sha256(report_bytes).hexdigest()
+
+
+# Report data keys not shown in the report
+_UNHASHED_KEYS = frozenset({"generated_at"})
+
+# Timestamps shown truncated (characters kept), so sub-day differences do not change the report
+_HASHED_PREFIXES = {"from": 10, "to": 10, "data_as_of": 16}
+
+
+def report_fingerprint(report_data: Dict[str, Any], variant: str) -> str:
+    """
+    Hash the inputs of a report instead of its bytes.
+
+    Generated reports embed the generation time, so their bytes differ on
+    every run; identical inputs give the same fingerprint, letting the
+    file_id of an earlier upload be reused.
+
+    Args:
+        report_data: Report data (single-shop or consolidated)
+        variant: Report kind and format, e.g. "pack:xlsx"
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    digest = hashlib.sha256(variant.encode('utf-8'))
+    _update_digest(digest, report_data)
+    return digest.hexdigest()
+
+
+def _update_digest(digest: "hashlib._Hash", value: Any) -> None:
+    """Feed value into digest in a canonical form."""
+    if isinstance(value, dict):
+        for key in sorted(value):
+            if key in _UNHASHED_KEYS:
+                continue
+            item = restore_fields(value[key]) if isinstance(value[key], dict) else value[key]
+            if key in _HASHED_PREFIXES and isinstance(item, str):
+                item = item[:_HASHED_PREFIXES[key]]
+            digest.update(f"\x1e{key}=".encode('utf-8'))
+            _update_digest(digest, item)
+    elif isinstance(value, array):
+        digest.update(value.typecode.encode('utf-8'))
+        digest.update(value.tobytes())
+    elif isinstance(value, (list, tuple)):
+        if all(item is None or isinstance(item, str) for item in value):
+            digest.update("\x1f".join("" if item is None else item for item in value).encode('utf-8'))
+        else:
+            for item in value:
+                digest.update(b"\x1d")
+                _update_digest(digest, item)
+    elif hasattr(value, "__slots__"):
+        # Column batches and dictionaries; private slots are derived indexes
+        digest.update(type(value).__name__.encode('utf-8'))
+        for name in type(value).__slots__:
+            if not name.startswith("_"):
+                digest.update(f"\x1e{name}=".encode('utf-8'))
+                _update_digest(digest, getattr(value, name))
+    else:
+        digest.update(repr(value).encode('utf-8'))
+
+
+def _remember_file_id(content_hash: str, file_id: str) -> None:
+    """Put file_id into in-process LRU cache."""
+    _file_id_cache[content_hash] = file_id
+    _file_id_cache.move_to_end(content_hash)
+    if len(_file_id_cache) > _FILE_ID_CACHE_SIZE:
+        _file_id_cache.popitem(last=False)
+
+
+async def _lookup_file_id(content_hash: str) -> Optional[str]:
+    """Find file_id for content hash in memory, then in database."""
+    file_id = _file_id_cache.get(content_hash)
+    if file_id is not None:
+        _file_id_cache.move_to_end(content_hash)
+        return file_id
+
+    async with async_session() as session:
+        file_id = await get_report_file_id(session, content_hash)
+    if file_id is not None:
+        _remember_file_id(content_hash, file_id)
+    return file_id
+
+
+async def _forget_file_id(content_hash: str) -> None:
+    """Drop file_id from both caches."""
+    _file_id_cache.pop(content_hash, None)
+    async with async_session() as session:
+        await delete_report_file_id(session, content_hash)
+
+
+async def _send_document(
+    bot: Bot,
+    chat_id: int,
+    content_hash: str,
+    input_file: Callable[[], InputFile],
+    filename: str,
+    file_size: Optional[int]
+) -> bool:
+    """
+    Send document by cached file_id or upload it and cache the file_id.
+
+    Sent through the bulk lane, so uploads of large reports never delay
+    interactive replies of other users.
+
+    Args:
+        bot: Bot instance
+        chat_id: Telegram chat ID
+        content_hash: SHA-256 of document content or of its inputs
+        input_file: Factory creating upload input file
+        filename: Document filename
+        file_size: Document size in bytes if known
+
+    Returns:
+        bool: True if sent successfully
+    """
+    with bulk_lane():
+        file_id = await _lookup_file_id(content_hash)
+        if file_id is not None:
+            try:
+                await bot.send_document(chat_id, file_id)
+                return True
+            except TelegramBadRequest as e:
+                # file_id expired or belongs to another bot, upload again
+                logger.warning(f"Cached file_id for {content_hash} rejected: {e}")
+                await _forget_file_id(content_hash)
+
+        message = await bot.send_document(chat_id, input_file())
+    if message.document is None:
+        return False
+
+    _remember_file_id(content_hash, message.document.file_id)
+    async with async_session() as session:
+        await save_report_file_id(
+            session,
+            content_hash,
+            message.document.file_id,
+            filename,
+            file_size if file_size is not None else message.document.file_size,
+        )
+    return True
+
+
+@traced("telegram.send_report")
 async def send_report_via_telegram(
+    bot: Bot,
     report_bytes: bytes,
     filename: str,
-    chat_id: int
+    chat_id: int,
+    content_hash: Optional[str] = None
 ) -> bool:
     """
     Send Excel report via Telegram.
 
+    Identical content is uploaded only once: the file_id Telegram returns is
+    stored per content hash and reused for later deliveries to any chat.
+
     Args:
+        bot: Bot instance
         report_bytes: Excel file content
         filename: Report filename
         chat_id: Telegram chat ID
+        content_hash: Key for file_id reuse, e.g. report_fingerprint (hash of bytes if None)
+
+    Returns:
+        bool: True if sent successfully
+    """
+    return await _send_document(
+        bot,
+        chat_id,
+        content_hash or hash_report(report_bytes),
+        lambda: BufferedInputFile(report_bytes, filename=filename),
+        filename,
+        len(report_bytes),
+    )
+
+
+@traced("telegram.send_report")
+async def send_artifact_via_telegram(
+    bot: Bot,
+    artifact: ReportArtifact,
+    filename: str,
+    chat_id: int,
+    content_hash: Optional[str] = None
+) -> bool:
+    """
+    Send stored report artifact via Telegram, streaming it from disk.
+
+    Args:
+        bot: Bot instance
+        artifact: Artifact from the report store
+        filename: Report filename
+        chat_id: Telegram chat ID
+        content_hash: Key for file_id reuse, e.g. report_fingerprint (artifact digest if None)
 
     Returns:
         bool: True if sent successfully
     """
-    # STUB: Telegram file sending will be implemented later
-    # TODO: Use aiogram Bot.send_document()
-    print(f"Would send {filename} to chat {chat_id}")
-    return True
\ No newline at end of file
+    store = get_report_store()
+    return await _send_document(
+        bot,
+        chat_id,
+        content_hash or artifact.digest,
+        lambda: ArtifactInputFile(store, artifact, filename),
+        filename,
+        None,
+    )
+
+
+def report_filename(report_data: Dict[str, Any], report_format: str, kind: str = "logistics") -> str:
+    """
+    Build report filename from its period.
+
+    Args:
+        report_data: Report data (single-shop or consolidated)
+        report_format: FORMAT_XLSX or FORMAT_CSV_GZ
+        kind: Report kind used as filename prefix
+
+    Returns:
+        str: Filename, e.g. ozon_logistics_2024-05-01_2024-05-08.xlsx
+    """
+    period = report_data["period"]
+    return f"ozon_{kind}_{period['from'][:10]}_{period['to'][:10]}.{report_format}"
+
+
+async def deliver_report(bot: Bot, chat_id: int, report_data: Dict[str, Any]) -> str:
+    """
+    Generate report pack in the format fitting its size and send it.
+
+    Large reports are sent as streamed gzip CSV files instead of Excel (see
+    choose_report_format); files go from the artifact store to Telegram
+    without being held in memory.
+
+    Args:
+        bot: Bot instance
+        chat_id: Telegram chat ID
+        report_data: Complete report data from OzonAPIService
+
+    Returns:
+        str: Format the report was sent in
+
+    Raises:
+        RuntimeError: If Telegram did not accept a document
+    """
+    artifacts, report_format = await generate_report_artifacts(create_excel_generator(), report_data)
+    for kind, artifact in artifacts.items():
+        sent = await send_artifact_via_telegram(
+            bot,
+            artifact,
+            report_filename(report_data, report_format, "report" if kind == "pack" else kind),
+            chat_id,
+            report_fingerprint(report_data, f"{kind}:{report_format}"),
+        )
+        if not sent:
+            raise RuntimeError(f"Telegram did not accept the {kind} document")
+    return report_format
+
+
+async def deliver_consolidated_report(bot: Bot, chat_id: int, consolidated: Dict[str, Any]) -> str:
+    """
+    Generate multi-shop report and send it.
+
+    Args:
+        bot: Bot instance
+        chat_id: Telegram chat ID
+        consolidated: Data from calculate_consolidated_report
+
+    Returns:
+        str: Format the report was sent in
+
+    Raises:
+        RuntimeError: If Telegram did not accept the document
+    """
+    artifact = await get_report_store().write_stream(
+        create_excel_generator().iter_consolidated_report(consolidated)
+    )
+    sent = await send_artifact_via_telegram(
+        bot,
+        artifact,
+        report_filename(consolidated, FORMAT_XLSX, "consolidated"),
+        chat_id,
+        report_fingerprint(consolidated, f"consolidated:{FORMAT_XLSX}"),
+    )
+    if not sent:
+        raise RuntimeError("Telegram did not accept the consolidated report document")
+    return FORMAT_XLSX
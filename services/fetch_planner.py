@@ -0,0 +1,297 @@
+"""
+Postings fetch planner for Ozon Logistics Bot.
+Collects the date windows a report needs (e.g. a period and its previous
+period), merges them into the minimal set of non-overlapping ranges not
+already fetched (or being fetched) for the shop, downloads each range once
+and serves every window as a view over the shared data. Planners may also
+read ranges with final postings from the ingested postings table.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from services.records import PostingBatch
+
+Window = Tuple[datetime, datetime]
+
+# Shops whose recently fetched postings are kept
+MAX_CACHED_SHOPS = 256
+
+
+class _Segment:
+    """Fetched (or downloading) range of postings."""
+
+    __slots__ = ("date_from", "date_to", "postings", "fetched_at", "expires_at", "done")
+
+    def __init__(self, date_from: datetime, date_to: datetime, postings: Optional[PostingBatch] = None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.postings = postings
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at
+        # Resolved with the postings once downloaded, or None if they cannot be shared
+        self.done: Optional[asyncio.Future] = None
+
+
+# client_id -> recently fetched segments (non-overlapping)
+_coverage: "OrderedDict[str, List[_Segment]]" = OrderedDict()
+
+# client_id -> segments being downloaded by running planners
+_in_flight: Dict[str, List[_Segment]] = {}
+
+# Timer of the next global prune of expired segments
+_prune_handle: Optional[asyncio.TimerHandle] = None
+
+
+def merge_windows(windows: Iterable[Window]) -> List[Window]:
+    """
+    Merge overlapping or adjacent windows.
+
+    Args:
+        windows: (date_from, date_to) pairs
+
+    Returns:
+        Sorted non-overlapping windows
+    """
+    merged: List[Window] = []
+    for date_from, date_to in sorted(windows):
+        if merged and date_from <= merged[-1][1]:
+            if date_to > merged[-1][1]:
+                merged[-1] = (merged[-1][0], date_to)
+        else:
+            merged.append((date_from, date_to))
+    return merged
+
+
+def subtract_windows(windows: Iterable[Window], covered: Iterable[Window]) -> List[Window]:
+    """
+    Remove covered ranges from windows.
+
+    Args:
+        windows: Requested windows
+        covered: Already available windows
+
+    Returns:
+        Sorted non-overlapping gaps that still have to be fetched
+    """
+    covered = merge_windows(covered)
+    gaps: List[Window] = []
+    for date_from, date_to in merge_windows(windows):
+        start = date_from
+        for covered_from, covered_to in covered:
+            if covered_to <= start or covered_from >= date_to:
+                continue
+            if covered_from > start:
+                gaps.append((start, covered_from))
+            start = max(start, covered_to)
+            if start >= date_to:
+                break
+        if start < date_to:
+            gaps.append((start, date_to))
+    return gaps
+
+
+def _fresh_segments(client_id: str, ttl: float) -> List[_Segment]:
+    """Get segments of a shop fetched within ttl seconds."""
+    segments = _coverage.get(client_id)
+    if segments is None:
+        return []
+    _coverage.move_to_end(client_id)
+    deadline = time.monotonic() - ttl
+    return [segment for segment in segments if segment.fetched_at >= deadline]
+
+
+def _prune_expired() -> None:
+    """Drop expired segments of all shops and schedule the next prune."""
+    global _prune_handle
+    _prune_handle = None
+    now = time.monotonic()
+    next_expiry = None
+    for client_id in list(_coverage):
+        segments = [segment for segment in _coverage[client_id] if segment.expires_at > now]
+        if not segments:
+            del _coverage[client_id]
+            continue
+        _coverage[client_id] = segments
+        expiry = min(segment.expires_at for segment in segments)
+        next_expiry = expiry if next_expiry is None else min(next_expiry, expiry)
+    if next_expiry is not None:
+        _schedule_prune(next_expiry)
+
+
+def _schedule_prune(at: float) -> None:
+    """Make sure a prune runs no later than at (time.monotonic(), which is also the loop clock)."""
+    global _prune_handle
+    if _prune_handle is not None:
+        if _prune_handle.when() <= at:
+            return
+        _prune_handle.cancel()
+    _prune_handle = asyncio.get_running_loop().call_at(at, _prune_expired)
+
+
+def _remember_segments(client_id: str, segments: List[_Segment], ttl: float) -> None:
+    """Add freshly fetched segments to the shop's coverage for ttl seconds."""
+    if not segments:
+        return
+    for segment in segments:
+        segment.expires_at = segment.fetched_at + ttl
+    _coverage.setdefault(client_id, []).extend(segments)
+    _coverage.move_to_end(client_id)
+    while len(_coverage) > MAX_CACHED_SHOPS:
+        _coverage.popitem(last=False)
+    _schedule_prune(min(segment.expires_at for segment in segments))
+
+
+def _start_downloads(client_id: str, windows: List[Window]) -> List[_Segment]:
+    """Register downloads of a planner so concurrent planners wait for them instead."""
+    loop = asyncio.get_running_loop()
+    segments = [_Segment(date_from, date_to) for date_from, date_to in windows]
+    for segment in segments:
+        segment.done = loop.create_future()
+    if segments:
+        _in_flight.setdefault(client_id, []).extend(segments)
+    return segments
+
+
+def _finish_downloads(client_id: str, segments: List[_Segment], shared: bool) -> None:
+    """Unregister downloads and hand their postings to waiting planners (None if not shared)."""
+    pending = _in_flight.get(client_id)
+    if pending is not None:
+        pending[:] = [segment for segment in pending if segment not in segments]
+        if not pending:
+            del _in_flight[client_id]
+    for segment in segments:
+        segment.done.set_result(segment.postings if shared else None)
+
+
+class FetchPlanner:
+    """Plans and runs postings downloads for a set of windows of one shop."""
+
+    def __init__(self, service, ttl: Optional[float] = None, use_store: bool = False):
+        """
+        Initialize planner.
+
+        Args:
+            service: OzonAPIService for the shop
+            ttl: Seconds fetched postings may be reused (settings value if None)
+            use_store: Read ranges with final ingested postings from the database
+                (see services.ingestion.final_windows) instead of downloading them
+        """
+        self.service = service
+        self.ttl = settings.fetch_cache_ttl_seconds if ttl is None else ttl
+        self.use_store = use_store
+        self.windows: List[Window] = []
+        self._segments: List[_Segment] = []
+        self._waiting: List[_Segment] = []
+
+    def add(self, date_from: datetime, date_to: datetime) -> None:
+        """Request postings created in [date_from, date_to)."""
+        self.windows.append((date_from, date_to))
+
+    def plan(self) -> List[Window]:
+        """
+        Compute ranges to download: requested windows minus fresh cached ones
+        and minus ranges other planners of the shop are downloading right now.
+
+        Returns:
+            Sorted non-overlapping ranges
+        """
+        client_id = self.service.client_id
+        self._segments = _fresh_segments(client_id, self.ttl)
+        windows = merge_windows(self.windows)
+        self._waiting = [
+            segment for segment in _in_flight.get(client_id, ())
+            if any(segment.date_from < date_to and date_from < segment.date_to for date_from, date_to in windows)
+        ]
+        return subtract_windows(
+            windows,
+            ((segment.date_from, segment.date_to) for segment in self._segments + self._waiting),
+        )
+
+    async def run(self, allow_stale: bool = True) -> int:
+        """
+        Download planned ranges concurrently (bounded by the shop's request limiter).
+
+        Ranges another planner is downloading are awaited instead of fetched
+        again. Stale fallback results are served to this planner but not
+        shared with others.
+
+        Args:
+            allow_stale: Passed to OzonAPIService.get_fbo_fbs_data
+
+        Returns:
+            int: Number of ranges downloaded
+        """
+        client_id = self.service.client_id
+        planned = self.plan()
+        if self.use_store and planned:
+            # Imported here: ingestion pulls in the database layer
+            from services.ingestion import load_final_postings
+
+            stored = [
+                _Segment(date_from, date_to, postings)
+                for date_from, date_to, postings in await load_final_postings(client_id, planned)
+            ]
+            self._segments.extend(stored)
+            planned = subtract_windows(planned, ((segment.date_from, segment.date_to) for segment in stored))
+
+        downloads = _start_downloads(client_id, planned)
+        waiting = self._waiting
+        stale_before = self.service.stale_as_of
+        shared = False
+        try:
+            batches = await asyncio.gather(
+                *(
+                    self.service.get_fbo_fbs_data(segment.date_from, segment.date_to, allow_stale=allow_stale)
+                    for segment in downloads
+                ),
+                *(self._wait_for(segment, allow_stale) for segment in waiting),
+            )
+            for segment, postings in zip(downloads, batches):
+                segment.postings = postings
+                segment.fetched_at = time.monotonic()
+            shared = self.service.stale_as_of == stale_before
+        finally:
+            _finish_downloads(client_id, downloads, shared)
+
+        self._segments.extend(downloads)
+        self._segments.extend(batches[len(downloads):])
+        if shared:
+            _remember_segments(client_id, downloads, self.ttl)
+        return len(downloads)
+
+    async def _wait_for(self, segment: _Segment, allow_stale: bool) -> _Segment:
+        """Get postings of a range downloaded by another planner, fetching it if they are not shared."""
+        # Shielded: cancelling this planner must not cancel the result for others
+        postings = await asyncio.shield(segment.done)
+        if postings is None:
+            postings = await self.service.get_fbo_fbs_data(
+                segment.date_from, segment.date_to, allow_stale=allow_stale
+            )
+        return _Segment(segment.date_from, segment.date_to, postings)
+
+    def view(self, date_from: datetime, date_to: datetime) -> PostingBatch:
+        """
+        Get postings of a window from the fetched data.
+
+        Args:
+            date_from: Window start
+            date_to: Window end
+
+        Returns:
+            PostingBatch of postings created in [date_from, date_to)
+        """
+        result = PostingBatch()
+        covered_to = date_from
+        for segment in sorted(self._segments, key=lambda segment: segment.date_from):
+            # Ranges already taken from an earlier segment are skipped
+            start = max(covered_to, segment.date_from)
+            end = min(date_to, segment.date_to)
+            if start < end:
+                result.extend(segment.postings.created_between(start, end))
+                covered_to = end
+        return result
@@ -0,0 +1,322 @@
+"""
+Checkpointed Ozon data ingestion for Ozon Logistics Bot.
+Postings are downloaded page by page; each page is upserted together with
+its cursor checkpoint in one transaction, so a download interrupted by a
+restart or a 429 storm resumes from the last stored page, and replayed
+pages overwrite rows instead of duplicating them. Stored ranges whose
+postings can no longer change are read back by the fetch planner instead of
+being downloaded again.
+"""
+
+import asyncio
+import logging
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import httpx
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.db import (
+    IngestionCheckpoint, StoredPosting, async_session, ensure_posting_partitions, use_primary,
+)
+from core.tracing import traced
+from services.fetch_planner import Window, merge_windows, subtract_windows
+from services.records import PostingBatch
+from services.resilience import CircuitOpenError, is_upstream_failure
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_POSTINGS = "postings"
+
+# Rows per INSERT statement (asyncpg allows at most 32767 bind parameters)
+UPSERT_CHUNK_SIZE = 1000
+
+_UPDATED_COLUMNS = (
+    "delivery_type", "status", "cost", "delivery_date",
+    "warehouse", "revenue", "volume_weight", "sku",
+)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before retrying a failed page.
+
+    Honors Retry-After on 429 and the breaker's reopen time, otherwise
+    exponential backoff with full jitter.
+    """
+    if isinstance(error, CircuitOpenError):
+        return max(error.retry_in, 1.0)
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), settings.ozon_ingest_backoff_max)
+    return random.uniform(0, min(settings.ozon_ingest_backoff_max, 2.0 ** attempt))
+
+
+async def upsert_postings(
+    session: AsyncSession,
+    client_id: str,
+    postings: PostingBatch,
+    default_created_at: datetime
+) -> int:
+    """
+    Insert or update postings by (client_id, order_id, created_at). Does not commit.
+
+    created_at is part of the key (partition key), so it must not change
+    between downloads of the same posting: a posting without one keeps the
+    created_at it was first stored with, and a row stored under another
+    created_at is moved once the real value is known.
+
+    Postings repeated in the batch (offset pages shift while Ozon data
+    changes) are written once, the last occurrence wins: a single INSERT
+    ... ON CONFLICT cannot update the same row twice.
+
+    Missing monthly partitions are created first.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        postings: Posting batch
+        default_created_at: created_at for postings first seen without one
+
+    Returns:
+        int: Number of rows written
+    """
+    if not len(postings):
+        return 0
+    items = {item["order_id"]: item for item in postings.iter_dicts()}
+
+    created = [value for value in postings.created_dates if not math.isnan(value)]
+    await ensure_posting_partitions(
+        datetime.utcfromtimestamp(min(created)) if created else default_created_at,
+        datetime.utcfromtimestamp(max(created)) if created else default_created_at,
+    )
+    if len(created) < len(postings):
+        await ensure_posting_partitions(default_created_at, default_created_at)
+
+    now = datetime.utcnow()
+    rows: List[Dict[str, Any]] = []
+    written = 0
+
+    async def _flush() -> None:
+        # Lookup by the primary key prefix (client_id, order_id) in every partition
+        result = await session.execute(
+            select(StoredPosting.order_id, StoredPosting.created_at).where(
+                StoredPosting.client_id == client_id,
+                StoredPosting.order_id.in_([row["order_id"] for row in rows]),
+            )
+        )
+        stored = dict(result.all())
+
+        moved = []
+        for row in rows:
+            stored_created_at = stored.get(row["order_id"])
+            if row["created_at"] is None:
+                row["created_at"] = stored_created_at or default_created_at
+            elif stored_created_at is not None and stored_created_at != row["created_at"]:
+                moved.append(row["order_id"])
+        if moved:
+            await session.execute(
+                delete(StoredPosting).where(
+                    StoredPosting.client_id == client_id,
+                    StoredPosting.order_id.in_(moved),
+                )
+            )
+
+        statement = insert(StoredPosting).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[StoredPosting.client_id, StoredPosting.order_id, StoredPosting.created_at],
+            set_={
+                **{column: statement.excluded[column] for column in _UPDATED_COLUMNS},
+                "updated_at": now,
+            },
+        )
+        await session.execute(statement)
+
+    for item in items.values():
+        item["client_id"] = client_id
+        item["updated_at"] = now
+        rows.append(item)
+        if len(rows) >= UPSERT_CHUNK_SIZE:
+            await _flush()
+            written += len(rows)
+            rows = []
+    if rows:
+        await _flush()
+        written += len(rows)
+    return written
+
+
+@traced("ingestion.ingest_postings")
+async def ingest_postings(service, date_from: datetime, date_to: datetime) -> int:
+    """
+    Download postings of a range into the postings table, resuming from the last checkpoint.
+
+    Args:
+        service: OzonAPIService for the seller
+        date_from: Range start
+        date_to: Range end
+
+    Returns:
+        int: Total rows stored for the range (including earlier runs)
+
+    Raises:
+        Exception: Last upstream error once a page has failed ozon_ingest_max_retries
+            times; the checkpoint is kept and the next call resumes from it
+    """
+    client_id = service.client_id
+
+    async with async_session() as session:
+        with use_primary():
+            checkpoint = await session.get(
+                IngestionCheckpoint, (client_id, ENDPOINT_POSTINGS, date_from, date_to)
+            )
+        if checkpoint is None:
+            checkpoint = IngestionCheckpoint(
+                client_id=client_id,
+                endpoint=ENDPOINT_POSTINGS,
+                date_from=date_from,
+                date_to=date_to,
+                cursor=None,
+                pages_done=0,
+                rows_done=0,
+                completed=False,
+            )
+            session.add(checkpoint)
+        elif checkpoint.completed:
+            return checkpoint.rows_done
+        else:
+            logger.info(
+                f"Resuming postings ingestion for {client_id} after {checkpoint.pages_done} pages"
+            )
+
+        while True:
+            attempt = 0
+            while True:
+                try:
+                    page, next_cursor = await service.get_postings_page(
+                        date_from, date_to, checkpoint.cursor
+                    )
+                    break
+                except Exception as e:
+                    if not (isinstance(e, CircuitOpenError) or is_upstream_failure(e)):
+                        raise
+                    attempt += 1
+                    if attempt > settings.ozon_ingest_max_retries:
+                        raise
+                    delay = _retry_delay(e, attempt)
+                    logger.warning(f"Postings page for {client_id} failed ({e}), retry in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+            # Page rows and the advanced cursor are committed atomically
+            written = await upsert_postings(session, client_id, page, date_from)
+            checkpoint.cursor = next_cursor
+            checkpoint.pages_done += 1
+            checkpoint.rows_done += written
+            checkpoint.completed = next_cursor is None
+            checkpoint.updated_at = datetime.utcnow()
+            await session.commit()
+
+            if checkpoint.completed:
+                return checkpoint.rows_done
+
+
+async def load_postings(
+    session: AsyncSession,
+    client_id: str,
+    date_from: datetime,
+    date_to: datetime
+) -> PostingBatch:
+    """
+    Read ingested postings created within a range.
+
+    Filters on client_id and created_at, so only the matching monthly and
+    seller hash partitions are scanned.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        date_from: Range start (inclusive)
+        date_to: Range end (exclusive)
+
+    Returns:
+        PostingBatch instance
+    """
+    result = await session.execute(
+        select(StoredPosting).where(
+            StoredPosting.client_id == client_id,
+            StoredPosting.created_at >= date_from,
+            StoredPosting.created_at < date_to,
+        )
+    )
+    batch = PostingBatch()
+    for posting in result.scalars():
+        batch.append(
+            posting.order_id, posting.delivery_type, posting.status, posting.cost,
+            posting.delivery_date, posting.warehouse, posting.created_at,
+            posting.revenue, posting.volume_weight, posting.sku,
+        )
+    return batch
+
+
+async def final_windows(session: AsyncSession, client_id: str, windows: List[Window]) -> List[Window]:
+    """
+    Get the parts of windows whose postings are stored and final.
+
+    A range counts once its ingestion completed at least
+    rollup_restatement_days after its postings were created: deliveries and
+    returns no longer change them.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        windows: Requested windows
+
+    Returns:
+        Sorted non-overlapping windows that can be read with load_postings
+    """
+    result = await session.execute(
+        select(
+            IngestionCheckpoint.date_from, IngestionCheckpoint.date_to, IngestionCheckpoint.updated_at
+        ).where(
+            IngestionCheckpoint.client_id == client_id,
+            IngestionCheckpoint.endpoint == ENDPOINT_POSTINGS,
+            IngestionCheckpoint.completed.is_(True),
+        )
+    )
+    lag = timedelta(days=settings.rollup_restatement_days)
+    final = [
+        (date_from, min(date_to, updated_at - lag))
+        for date_from, date_to, updated_at in result.all()
+        if date_from < min(date_to, updated_at - lag)
+    ]
+    if not final:
+        return []
+    return subtract_windows(windows, subtract_windows(windows, final))
+
+
+async def load_final_postings(
+    client_id: str,
+    windows: List[Window]
+) -> List[Tuple[datetime, datetime, PostingBatch]]:
+    """
+    Read stored postings of the final parts of windows (see final_windows).
+
+    Args:
+        client_id: Ozon Client ID
+        windows: Requested windows
+
+    Returns:
+        (date_from, date_to, PostingBatch) per covered range
+    """
+    async with async_session() as session:
+        covered = await final_windows(session, client_id, merge_windows(windows))
+        return [
+            (date_from, date_to, await load_postings(session, client_id, date_from, date_to))
+            for date_from, date_to in covered
+        ]
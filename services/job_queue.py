@@ -0,0 +1,340 @@
+"""
+Durable job worker for Ozon Logistics Bot.
+Every replica runs a worker pulling jobs from the Postgres jobs table (see
+core.db.claim_jobs), so background work survives restarts, is not duplicated
+across replicas, and throughput grows with the number of replicas.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, time, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from core.config import settings
+from core.db import (
+    Job, Shop, async_session, claim_jobs, complete_job, enqueue_job, extend_job_lease, fail_job,
+    maintain_posting_partitions,
+)
+from core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Job priorities (lower value is claimed first)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+jobs_processed = counter("jobs_processed_total", "Jobs finished by this worker", ("kind", "result"))
+jobs_running = gauge("jobs_running", "Jobs running in this worker")
+
+# kind -> handler
+_handlers: Dict[str, JobHandler] = {}
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """
+    Register coroutine function as handler of a job kind.
+
+    Args:
+        kind: Job kind
+
+    Returns:
+        Decorator
+    """
+    def _register(handler: JobHandler) -> JobHandler:
+        _handlers[kind] = handler
+        return handler
+    return _register
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt: exponential backoff with full jitter."""
+    return random.uniform(
+        settings.job_retry_backoff_base,
+        min(settings.job_retry_backoff_max, settings.job_retry_backoff_base * 2.0 ** attempts),
+    )
+
+
+class JobWorker:
+    """Claims and runs jobs of registered kinds with bounded concurrency."""
+
+    def __init__(self, worker_id: str, concurrency: int, poll_interval: float, visibility_timeout: float):
+        """
+        Initialize worker.
+
+        Args:
+            worker_id: Identifier stored in claimed jobs
+            concurrency: Jobs run at once
+            poll_interval: Seconds between claims while the queue is empty
+            visibility_timeout: Seconds a claimed job stays invisible without a heartbeat
+        """
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+
+        self._running: Set[asyncio.Task] = set()
+        self._slot_freed = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start claim loop."""
+        if self._loop_task is None:
+            self._loop_task = asyncio.get_running_loop().create_task(self._claim_loop())
+
+    async def stop(self) -> None:
+        """Stop claiming; running jobs are cancelled and reclaimed by others after their lease expires."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def _claim_loop(self) -> None:
+        """Claim jobs while there are free slots."""
+        while True:
+            free = self.concurrency - len(self._running)
+            if free <= 0:
+                self._slot_freed.clear()
+                await self._slot_freed.wait()
+                continue
+
+            try:
+                jobs = await claim_jobs(self.worker_id, free, self.visibility_timeout)
+            except Exception as e:
+                logger.warning(f"Claiming jobs failed: {e}")
+                jobs = []
+
+            for job in jobs:
+                task = asyncio.get_running_loop().create_task(self._run(job))
+                self._running.add(task)
+                task.add_done_callback(self._job_finished)
+            jobs_running.set(len(self._running))
+
+            if not jobs:
+                # Jitter keeps idle replicas from polling in lockstep
+                await asyncio.sleep(self.poll_interval * random.uniform(0.5, 1.5))
+
+    def _job_finished(self, task: asyncio.Task) -> None:
+        """Free slot of a finished job."""
+        self._running.discard(task)
+        jobs_running.set(len(self._running))
+        self._slot_freed.set()
+
+    async def _run(self, job: Job) -> None:
+        """Run claimed job, keeping its lease alive, and record the outcome."""
+        if job.attempts > job.max_attempts:
+            # Lease of the last attempt expired (worker died mid-job)
+            await fail_job(job, "Lease of the last attempt expired", None)
+            jobs_processed.inc(job.kind, "failed")
+            return
+
+        handler = _handlers.get(job.kind)
+        if handler is None:
+            await fail_job(job, f"No handler for job kind {job.kind!r}", None)
+            jobs_processed.inc(job.kind, "failed")
+            return
+
+        task = asyncio.get_running_loop().create_task(handler(job.payload))
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job, task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise  # Worker is stopping
+            # Lease lost: the job belongs to another worker now, nothing to record
+            jobs_processed.inc(job.kind, "lost")
+        except Exception as e:
+            final = job.attempts >= job.max_attempts
+            logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e}")
+            await fail_job(job, str(e), None if final else retry_delay(job.attempts))
+            jobs_processed.inc(job.kind, "failed" if final else "retried")
+        else:
+            if await complete_job(job):
+                jobs_processed.inc(job.kind, "done")
+            else:
+                logger.warning(f"Job {job.id} ({job.kind}) finished after its lease was lost")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: Job, task: asyncio.Task) -> None:
+        """
+        Extend the lease of a running job every third of the visibility timeout.
+
+        If the lease was lost (e.g. heartbeats were late and another worker
+        claimed the job), the handler task is cancelled so the job never runs twice.
+        """
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            try:
+                if not await extend_job_lease(job, self.visibility_timeout):
+                    logger.warning(f"Lease of job {job.id} ({job.kind}) lost, cancelling it")
+                    task.cancel()
+                    return
+            except Exception as e:
+                logger.warning(f"Extending lease of job {job.id} failed: {e}")
+
+
+def create_job_worker() -> JobWorker:
+    """
+    Create job worker configured from settings.
+
+    Returns:
+        JobWorker instance
+    """
+    return JobWorker(
+        worker_id=f"{socket.gethostname()}:{os.getpid()}",
+        concurrency=settings.job_worker_concurrency,
+        poll_interval=settings.job_poll_interval,
+        visibility_timeout=settings.job_visibility_timeout,
+    )
+
+
+async def submit_job(
+    kind: str,
+    payload: Optional[Dict[str, Any]] = None,
+    priority: int = PRIORITY_NORMAL,
+    run_at: Optional[datetime] = None,
+    dedupe_key: Optional[str] = None
+) -> Optional[int]:
+    """
+    Enqueue job in its own session.
+
+    Args:
+        kind: Job kind with a registered handler
+        payload: JSON arguments for the handler
+        priority: Lower values are claimed first
+        run_at: Earliest run time (now if None)
+        dedupe_key: Skip if a queued or running job has this key
+
+    Returns:
+        Job ID, or None if deduplicated
+    """
+    async with async_session() as session:
+        return await enqueue_job(
+            session, kind, payload, priority=priority, run_at=run_at, dedupe_key=dedupe_key
+        )
+
+
+async def schedule_partition_maintenance(run_at: Optional[datetime] = None) -> Optional[int]:
+    """
+    Enqueue postings partition maintenance, at most one pending job per day.
+
+    Args:
+        run_at: Earliest run time (now if None)
+
+    Returns:
+        Job ID, or None if that day's job is already pending
+    """
+    run_at = run_at or datetime.utcnow()
+    return await submit_job(
+        "maintain_posting_partitions",
+        priority=PRIORITY_HIGH,
+        run_at=run_at,
+        dedupe_key=f"maintain_posting_partitions:{run_at.date().isoformat()}",
+    )
+
+
+async def schedule_ingestion(shop_id: int, days: Optional[int] = None) -> Optional[int]:
+    """
+    Enqueue ingestion of a shop's recent postings.
+
+    Args:
+        shop_id: Shop to ingest
+        days: Days back from now (ozon_ingest_backfill_days if None)
+
+    Returns:
+        Job ID, or None if the shop's ingestion is already pending
+    """
+    date_to = datetime.utcnow()
+    date_from = date_to - timedelta(days=days or settings.ozon_ingest_backfill_days)
+    return await submit_job(
+        "ingest_postings",
+        {"shop_id": shop_id, "date_from": date_from.isoformat(), "date_to": date_to.isoformat()},
+        priority=PRIORITY_LOW,
+        dedupe_key=f"ingest_postings:{shop_id}",
+    )
+
+
+async def schedule_rollup_backfill(shop_id: int) -> Optional[int]:
+    """
+    Enqueue the rollup backfill of a newly connected shop (rollup_backfill_days back).
+
+    Args:
+        shop_id: Shop to roll up
+
+    Returns:
+        Job ID, or None if the shop's backfill is already pending
+    """
+    return await submit_job(
+        "backfill_rollups",
+        {"shop_id": shop_id},
+        priority=PRIORITY_LOW,
+        dedupe_key=f"backfill_rollups:{shop_id}",
+    )
+
+
+@job_handler("maintain_posting_partitions")
+async def _maintain_posting_partitions(payload: Dict[str, Any]) -> None:
+    """Create upcoming postings partitions and detach expired ones, then schedule the next day's run."""
+    await maintain_posting_partitions()
+    tomorrow = datetime.utcnow().date() + timedelta(days=1)
+    await schedule_partition_maintenance(datetime.combine(tomorrow, time.min))
+
+
+@job_handler("ingest_postings")
+async def _ingest_postings(payload: Dict[str, Any]) -> None:
+    """
+    Ingest a shop's postings of a range; resumes from its checkpoint on retry.
+
+    Payload: shop_id, date_from and date_to (ISO format).
+    """
+    # Imported here: ozon_api and ingestion pull in the whole report stack
+    from services.ingestion import ingest_postings
+    from services.ozon_api import OzonAPIService
+
+    async with async_session() as session:
+        shop = await session.get(Shop, payload["shop_id"])
+    if shop is None:
+        logger.info(f"Shop {payload['shop_id']} was removed, skipping ingestion")
+        return
+
+    async with OzonAPIService(shop.client_id, shop.api_key) as service:
+        await ingest_postings(
+            service,
+            datetime.fromisoformat(payload["date_from"]),
+            datetime.fromisoformat(payload["date_to"]),
+        )
+
+
+@job_handler("backfill_rollups")
+async def _backfill_rollups(payload: Dict[str, Any]) -> None:
+    """
+    Roll up a shop's history, so reports do not backfill it interactively.
+
+    Payload: shop_id.
+    """
+    # Imported here: ozon_api and rollups pull in the whole report stack
+    from services.ozon_api import OzonAPIService
+    from services.rollups import refresh_rollups
+
+    async with async_session() as session:
+        shop = await session.get(Shop, payload["shop_id"])
+    if shop is None:
+        logger.info(f"Shop {payload['shop_id']} was removed, skipping rollup backfill")
+        return
+
+    today = datetime.utcnow().date()
+    async with OzonAPIService(shop.client_id, shop.api_key) as service:
+        async with async_session() as session:
+            await refresh_rollups(
+                session, service, shop.client_id, today,
+                restate_from=today - timedelta(days=settings.rollup_backfill_days),
+            )
@@ -0,0 +1,217 @@
+"""
+Incremental JSON parsing for Ozon Logistics Bot.
+Parses a response body chunk by chunk and returns items of one nested array
+(e.g. result.postings) as soon as each item is complete, so a large page is
+never held as a whole dict tree and parsing overlaps with the download.
+"""
+
+import json
+from typing import Any, Dict, List, Sequence
+
+# Parser states
+_OBJECT_START = 0
+_KEY = 1
+_COLON = 2
+_VALUE = 3
+_COMMA = 4
+_ARRAY_ITEM = 5
+_ARRAY_COMMA = 6
+_DONE = 7
+
+_WHITESPACE = " \t\n\r"
+
+# Characters that may follow a complete value inside an object or array
+_DELIMITERS = _WHITESPACE + ",]}"
+
+_decoder = json.JSONDecoder()
+
+
+class JSONArrayStream:
+    """
+    Push parser yielding items of the array at a key path of a JSON object.
+
+    Values next to the array in its parent object (e.g. has_next) are
+    collected in fields. Other values are decoded whole and discarded.
+    """
+
+    def __init__(self, path: Sequence[str]):
+        """
+        Initialize parser.
+
+        Args:
+            path: Keys leading to the array, e.g. ("result", "postings")
+        """
+        if not path:
+            raise ValueError("path must not be empty")
+        self.path = tuple(path)
+        self.fields: Dict[str, Any] = {}
+        self.items_parsed = 0
+
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._state = _OBJECT_START
+        self._key = None
+
+    @property
+    def done(self) -> bool:
+        """Whether the whole top-level object has been parsed."""
+        return self._state == _DONE
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Parse next chunk of the body.
+
+        Args:
+            text: Decoded text chunk
+
+        Returns:
+            Array items completed by this chunk
+
+        Raises:
+            ValueError: If the body is not valid JSON of the expected shape
+        """
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        items: List[Any] = []
+        self._parse(items, final=False)
+        return items
+
+    def close(self) -> List[Any]:
+        """
+        Finish parsing after the last chunk.
+
+        Returns:
+            Array items completed by the end of the body
+
+        Raises:
+            ValueError: If the body is truncated or malformed
+        """
+        items: List[Any] = []
+        self._parse(items, final=True)
+        if self._state != _DONE:
+            raise ValueError("JSON body ended unexpectedly")
+        return items
+
+    def _skip_whitespace(self) -> bool:
+        """Move to the next significant character; False if the buffer is exhausted."""
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buffer)
+
+    def _decode_value(self, final: bool):
+        """
+        Decode a complete JSON value at the current position.
+
+        Returns:
+            (True, value) or (False, None) if more data is needed
+        """
+        try:
+            value, end = _decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError(f"Invalid JSON at offset {self._pos}")
+            return False, None
+        # A scalar is complete only once a delimiter follows it: "12." or "1e"
+        # decode as a shorter number when the rest is still in the next chunk
+        if (
+            not final
+            and not isinstance(value, (dict, list, str))
+            and (end == len(self._buffer) or self._buffer[end] not in _DELIMITERS)
+        ):
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _expect(self, char: str) -> None:
+        """Consume an expected structural character."""
+        if self._buffer[self._pos] != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos}, got {self._buffer[self._pos]!r}")
+        self._pos += 1
+
+    def _parse(self, items: List[Any], final: bool) -> None:
+        """Advance the state machine as far as the buffer allows."""
+        last = len(self.path) - 1
+
+        while self._state != _DONE and self._skip_whitespace():
+            state = self._state
+            char = self._buffer[self._pos]
+
+            if state == _OBJECT_START:
+                self._expect("{")
+                self._state = _KEY
+
+            elif state == _KEY:
+                if char == "}":
+                    self._pos += 1
+                    self._close_object()
+                    continue
+                complete, key = self._decode_value(final)
+                if not complete:
+                    return
+                if not isinstance(key, str):
+                    raise ValueError(f"Expected object key at offset {self._pos}")
+                self._key = key
+                self._state = _COLON
+
+            elif state == _COLON:
+                self._expect(":")
+                self._state = _VALUE
+
+            elif state == _VALUE:
+                on_path = self._key == self.path[self._depth]
+                if on_path and self._depth < last and char == "{":
+                    self._pos += 1
+                    self._depth += 1
+                    self._state = _KEY
+                elif on_path and self._depth == last and char == "[":
+                    self._pos += 1
+                    self._state = _ARRAY_ITEM
+                else:
+                    complete, value = self._decode_value(final)
+                    if not complete:
+                        return
+                    if self._depth == last:
+                        self.fields[self._key] = value
+                    self._state = _COMMA
+
+            elif state == _COMMA:
+                self._pos += 1
+                if char == ",":
+                    self._state = _KEY
+                elif char == "}":
+                    self._close_object()
+                else:
+                    raise ValueError(f"Expected ',' or '}}' at offset {self._pos - 1}")
+
+            elif state == _ARRAY_ITEM:
+                if char == "]":
+                    self._pos += 1
+                    self._state = _COMMA
+                    continue
+                complete, item = self._decode_value(final)
+                if not complete:
+                    return
+                items.append(item)
+                self.items_parsed += 1
+                self._state = _ARRAY_COMMA
+
+            elif state == _ARRAY_COMMA:
+                self._pos += 1
+                if char == ",":
+                    self._state = _ARRAY_ITEM
+                elif char == "]":
+                    self._state = _COMMA
+                else:
+                    raise ValueError(f"Expected ',' or ']' at offset {self._pos - 1}")
+
+    def _close_object(self) -> None:
+        """Return to the enclosing object after '}'."""
+        if self._depth == 0:
+            self._state = _DONE
+        else:
+            self._depth -= 1
+            self._state = _COMMA
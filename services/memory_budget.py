@@ -0,0 +1,361 @@
+"""
+Memory budget for report jobs of Ozon Logistics Bot.
+Each report job reserves a fixed share of a global budget before it starts,
+so large jobs wait instead of running the container out of memory. Inside a
+job, data that would push it over its share is spilled to temp files (batch
+snapshots, sorted runs merged back lazily).
+"""
+
+import asyncio
+import fcntl
+import heapq
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import IO, Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+# Rough in-memory size of one materialized report row (tuple of ~10 values)
+ROW_BYTES_ESTIMATE = 512
+
+# Rows pickled per record in spill files
+SPILL_CHUNK_ROWS = 1000
+
+# Lock file held by the process owning a spill (or other per-process) directory
+SPILL_LOCK_FILE = ".lock"
+
+budget_reserved = gauge("memory_budget_reserved_bytes", "Memory reserved by running report jobs")
+budget_waiting = gauge("memory_budget_waiting_jobs", "Report jobs waiting for memory budget")
+spilled_bytes = counter("memory_spilled_bytes_total", "Bytes of report data spilled to disk", ("kind",))
+
+
+class JobBudget:
+    """Memory accounting of a single report job."""
+
+    def __init__(self, limit: int, spill_root: str):
+        """
+        Initialize job budget.
+
+        Args:
+            limit: Bytes the job may keep in memory
+            spill_root: Directory for the job's spill files
+        """
+        self.limit = limit
+        self.used = 0
+        self._spill_root = spill_root
+        self._spill_dir: Optional[str] = None
+
+    def charge(self, nbytes: int) -> bool:
+        """
+        Account memory held by the job.
+
+        Returns:
+            bool: True if the job is still within its limit
+        """
+        self.used += nbytes
+        return self.used <= self.limit
+
+    def discharge(self, nbytes: int) -> None:
+        """Account memory released by the job."""
+        self.used = max(self.used - nbytes, 0)
+
+    def over_budget(self) -> bool:
+        """Check whether the job holds more than its limit."""
+        return self.used > self.limit
+
+    def available(self) -> int:
+        """Bytes left before the job goes over its limit."""
+        return max(self.limit - self.used, 0)
+
+    def spill_path(self, suffix: str) -> str:
+        """Create new spill file of this job and return its path."""
+        if self._spill_dir is None:
+            os.makedirs(self._spill_root, exist_ok=True)
+            self._spill_dir = tempfile.mkdtemp(dir=self._spill_root)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self._spill_dir)
+        os.close(fd)
+        return path
+
+    def cleanup(self) -> None:
+        """Delete the job's spill files."""
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+
+
+# Budget of the report job running in the current task
+_current_job: ContextVar[Optional[JobBudget]] = ContextVar("memory_budget_job", default=None)
+
+
+def current_job() -> Optional[JobBudget]:
+    """Get budget of the running report job (None outside report jobs)."""
+    return _current_job.get()
+
+
+def claim_process_dir(root: str) -> Tuple[str, IO]:
+    """
+    Create this process's directory under root and remove those of dead processes.
+
+    Every process keeps an exclusive lock on a file in its directory while it
+    runs. A directory whose lock can be taken belongs to a process that is
+    gone, so other processes sharing root never lose files of running jobs.
+    New directories are locked before they are renamed into view. Used for
+    spill files and for partial report store writes.
+
+    Args:
+        root: Directory shared by all processes
+
+    Returns:
+        (directory of this process, lock file to keep open for the process lifetime)
+    """
+    os.makedirs(root, exist_ok=True)
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        try:
+            with open(os.path.join(path, SPILL_LOCK_FILE), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                # Files of jobs killed with their process
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            continue  # Locked: the owner is alive
+
+    pending = tempfile.mkdtemp(prefix=".new-", dir=root)
+    lock = open(os.path.join(pending, SPILL_LOCK_FILE), "a")
+    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    path = os.path.join(root, f"{os.getpid()}-{os.path.basename(pending)[len('.new-'):]}")
+    os.rename(pending, path)
+    return path, lock
+
+
+class MemoryBudget:
+    """Global memory budget shared by report jobs."""
+
+    def __init__(self, total_bytes: int, job_bytes: int, spill_dir: str):
+        """
+        Initialize budget.
+
+        Args:
+            total_bytes: Memory all running jobs may reserve together
+            job_bytes: Memory reserved by each job
+            spill_dir: Directory for spill files, shared with other processes
+        """
+        self.total_bytes = total_bytes
+        self.job_bytes = min(job_bytes, total_bytes)
+        self.spill_dir, self._spill_lock = claim_process_dir(spill_dir)
+        self.reserved = 0
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def reserve(self, nbytes: int) -> None:
+        """Wait until nbytes fit into the budget and reserve them."""
+        async with self._condition:
+            self.waiting += 1
+            budget_waiting.set(self.waiting)
+            try:
+                await self._condition.wait_for(lambda: self.reserved + nbytes <= self.total_bytes)
+            finally:
+                self.waiting -= 1
+                budget_waiting.set(self.waiting)
+            self.reserved += nbytes
+            budget_reserved.set(self.reserved)
+
+    async def release(self, nbytes: int) -> None:
+        """Return nbytes to the budget and wake waiting jobs."""
+        async with self._condition:
+            self.reserved -= nbytes
+            budget_reserved.set(self.reserved)
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def job(self) -> AsyncIterator[JobBudget]:
+        """
+        Run a report job within its share of the budget.
+
+        Waits for the share, makes the job's budget available via
+        current_job() and deletes its spill files afterwards.
+
+        Yields:
+            JobBudget of the job
+        """
+        await self.reserve(self.job_bytes)
+        budget = JobBudget(self.job_bytes, self.spill_dir)
+        token = _current_job.set(budget)
+        try:
+            yield budget
+        finally:
+            _current_job.reset(token)
+            budget.cleanup()
+            await self.release(self.job_bytes)
+
+
+class SpilledObject:
+    """Picklable object (e.g. a PostingBatch) moved to a temp file."""
+
+    __slots__ = ("path", "nbytes")
+
+    def __init__(self, path: str, nbytes: int):
+        self.path = path
+        self.nbytes = nbytes
+
+    def load(self) -> Any:
+        """Read object back into memory."""
+        with open(self.path, "rb") as file:
+            return pickle.load(file)
+
+
+def spill(obj: Any, job: JobBudget, kind: str = "batch") -> SpilledObject:
+    """
+    Write object to a spill file of the job.
+
+    Args:
+        obj: Picklable object, the caller drops its reference afterwards
+        job: Job budget owning the file
+        kind: Label for the spilled bytes metric
+
+    Returns:
+        SpilledObject handle
+    """
+    path = job.spill_path(".pkl")
+    with open(path, "wb") as file:
+        pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+    size = os.path.getsize(path)
+    spilled_bytes.inc(kind, amount=size)
+    return SpilledObject(path, size)
+
+
+# Key holding spilled values in dicts passed through spill_fields
+SPILLED_KEY = "_spilled"
+
+
+def spill_fields(data: Dict[str, Any], keys: Iterable[str], job: JobBudget) -> Dict[str, Any]:
+    """
+    Move large values of a dict to a spill file.
+
+    Args:
+        data: Dict such as report data
+        keys: Keys whose values are spilled
+        job: Job budget owning the file
+
+    Returns:
+        Copy of data without the spilled values, see restore_fields
+    """
+    result = dict(data)
+    result[SPILLED_KEY] = spill({key: result.pop(key) for key in keys if key in result}, job, "report")
+    return result
+
+
+def restore_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Get dict with spilled values loaded back (data itself if nothing was spilled).
+
+    Args:
+        data: Dict returned by spill_fields or a plain dict
+
+    Returns:
+        Complete dict
+    """
+    spilled = data.get(SPILLED_KEY)
+    if spilled is None:
+        return data
+    result = {key: value for key, value in data.items() if key != SPILLED_KEY}
+    result.update(spilled.load())
+    return result
+
+
+def _write_run(rows: List[Any], job: JobBudget) -> str:
+    """Write sorted run to a spill file in chunks."""
+    path = job.spill_path(".run")
+    with open(path, "wb") as file:
+        for start in range(0, len(rows), SPILL_CHUNK_ROWS):
+            pickle.dump(rows[start:start + SPILL_CHUNK_ROWS], file, protocol=pickle.HIGHEST_PROTOCOL)
+    spilled_bytes.inc("sort", amount=os.path.getsize(path))
+    return path
+
+
+def _read_run(path: str) -> Iterator[Any]:
+    """Stream rows of a sorted run back from disk."""
+    with open(path, "rb") as file:
+        while True:
+            try:
+                chunk = pickle.load(file)
+            except EOFError:
+                return
+            yield from chunk
+
+
+def sort_rows(
+    rows: Iterable[Any],
+    key: Callable[[Any], Any],
+    job: Optional[JobBudget] = None,
+    reverse: bool = False
+) -> Iterator[Any]:
+    """
+    Sort rows in memory if they fit the job's budget, otherwise externally.
+
+    External sort writes sorted runs sized to the job's free budget and
+    merges them lazily with heapq.merge, so memory holds one run at a time
+    while writing and one chunk per run while merging.
+
+    Args:
+        rows: Rows to sort
+        key: Sort key
+        job: Job budget (current_job() if None; sorted in memory outside jobs)
+        reverse: Sort descending
+
+    Yields:
+        Rows in sorted order
+    """
+    job = job or current_job()
+    if job is None:
+        yield from sorted(rows, key=key, reverse=reverse)
+        return
+
+    run_rows = max(job.available() // ROW_BYTES_ESTIMATE, SPILL_CHUNK_ROWS)
+    runs: List[str] = []
+    buffer: List[Any] = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) >= run_rows:
+            buffer.sort(key=key, reverse=reverse)
+            runs.append(_write_run(buffer, job))
+            buffer = []
+    buffer.sort(key=key, reverse=reverse)
+
+    if not runs:
+        yield from buffer
+        return
+
+    logger.info(f"Sorting {len(runs) * run_rows + len(buffer)} rows externally in {len(runs) + 1} runs")
+    yield from heapq.merge(*(_read_run(path) for path in runs), iter(buffer), key=key, reverse=reverse)
+    for path in runs:
+        os.unlink(path)
+
+
+_budget: Optional[MemoryBudget] = None
+
+
+def get_memory_budget() -> MemoryBudget:
+    """
+    Get shared memory budget, creating it on first call.
+
+    Returns:
+        MemoryBudget instance
+    """
+    global _budget
+    if _budget is None:
+        _budget = MemoryBudget(
+            settings.report_memory_budget_bytes,
+            settings.report_job_memory_bytes,
+            settings.report_spill_dir,
+        )
+    return _budget
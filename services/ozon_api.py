@@ -3,11 +3,77 @@ Ozon Seller API service for Ozon Logistics Bot.
 Handles all interactions with Ozon API (stub implementation for MVP).
 """
 
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, Hashable, Iterable, List, Optional, Tuple, Any
+import asyncio
+import importlib.util
+import logging
 import httpx
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 from core.config import settings
+from core.db import async_session
+from core.tracing import traced
+from services.records import PostingBatch, ProductBatch
+from services.catalog import get_catalog
+from services.fetch_planner import FetchPlanner
+from services.json_stream import JSONArrayStream
+from services.memory_budget import current_job, spill_fields
+from services.resilience import CircuitOpenError, get_breaker, get_stale_cache, is_upstream_failure
+from services.rollups import build_period_summary, summarize_postings
+from services.sketches import build_sketches, percentiles
+from services.tariffs import get_tariff_index
+
+logger = logging.getLogger(__name__)
+
+# Request concurrency limiters shared by all service instances of the same shop
+_shop_limiters: Dict[str, asyncio.Semaphore] = {}
+
+# Background revalidations in flight, keyed by stale cache key
+_revalidations: Dict[Hashable, asyncio.Task] = {}
+
+# httpx decodes br only when a brotli package is installed
+ACCEPT_ENCODING = (
+    "gzip, br"
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi")
+    else "gzip"
+)
+
+# Posting lists downloaded in this order: (delivery type, path, path of the postings array)
+POSTING_LISTS = (
+    ("FBS", "/v3/posting/fbs/list", ("result", "postings")),
+    ("FBO", "/v2/posting/fbo/list", ("result",)),
+)
+
+# Ozon financial services counted as logistics cost of a posting
+LOGISTICS_SERVICES = (
+    "marketplace_service_item_fulfillment",
+    "marketplace_service_item_pickup",
+    "marketplace_service_item_dropoff_pvz",
+    "marketplace_service_item_dropoff_sc",
+    "marketplace_service_item_dropoff_ff",
+    "marketplace_service_item_direct_flow_trans",
+    "marketplace_service_item_return_flow_trans",
+    "marketplace_service_item_deliv_to_customer",
+    "marketplace_service_item_return_not_deliv_to_customer",
+    "marketplace_service_item_return_part_goods_customer",
+    "marketplace_service_item_return_after_deliv_to_customer",
+)
+
+
+def get_shop_limiter(client_id: str) -> asyncio.Semaphore:
+    """
+    Get concurrency limiter for Ozon shop.
+
+    Args:
+        client_id: Ozon Client ID
+
+    Returns:
+        Semaphore bounding concurrent requests for this shop
+    """
+    limiter = _shop_limiters.get(client_id)
+    if limiter is None:
+        limiter = _shop_limiters[client_id] = asyncio.Semaphore(settings.ozon_max_concurrent_requests)
+    return limiter
 
 
 class OzonAPIService:
@@ -31,10 +97,15 @@ class OzonAPIService:
             headers={
                 "Client-Id": self.client_id,
                 "Api-Key": self.api_key,
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Accept-Encoding": ACCEPT_ENCODING
             },
-            timeout=30.0
+            timeout=httpx.Timeout(30.0, connect=settings.ozon_connect_timeout)
         )
+        self.limiter = get_shop_limiter(client_id)
+
+        # Fetch time of the oldest stale result served by this instance
+        self.stale_as_of: Optional[datetime] = None
 
     async def __aenter__(self):
         """Async context manager entry."""
@@ -44,6 +115,169 @@ class OzonAPIService:
         """Async context manager exit."""
         await self.client.aclose()
 
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Make API request within the shop's concurrency limit.
+
+        Args:
+            method: HTTP method
+            path: API path
+            **kwargs: Arguments for httpx request
+
+        Returns:
+            httpx.Response
+        """
+        async with self.limiter:
+            response = await self.client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def _stream_array(
+        self,
+        method: str,
+        path: str,
+        parser: JSONArrayStream,
+        **kwargs
+    ) -> AsyncIterator[Any]:
+        """
+        Make API request and yield items of a response array while the body downloads.
+
+        The body is decompressed and parsed chunk by chunk; values next to the
+        array (e.g. has_next) are in parser.fields once iteration ends. Like
+        _request, it is used by fetch methods, which run through _call for the
+        circuit breaker and stale fallback.
+
+        Args:
+            method: HTTP method
+            path: API path
+            parser: Parser for the array path, e.g. JSONArrayStream(("result", "postings"))
+            **kwargs: Arguments for httpx request
+
+        Yields:
+            Decoded array items
+        """
+        async with self.limiter:
+            async with self.client.stream(method, path, **kwargs) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_text():
+                    for item in parser.feed(chunk):
+                        yield item
+        for item in parser.close():
+            yield item
+
+    async def _call(
+        self,
+        endpoint: str,
+        cache_args: Hashable,
+        fetch_method: str,
+        *args: Any,
+        allow_stale: bool = True,
+        cache: bool = True
+    ) -> Any:
+        """
+        Call endpoint through its circuit breaker, falling back to last good data.
+
+        While the breaker is open (or the call fails upstream) the last good
+        result for the same endpoint and arguments is returned, stale_as_of is
+        set, and a background revalidation is scheduled.
+
+        Args:
+            endpoint: Endpoint name (breaker key, together with the shop)
+            cache_args: Normalized arguments for the stale cache key
+            fetch_method: Name of the method performing the actual fetch
+            *args: Arguments for fetch method
+            allow_stale: Whether stale data may be returned
+            cache: Whether to keep the result as last good data (off for paged calls)
+
+        Returns:
+            Fetched or stale result
+
+        Raises:
+            CircuitOpenError: If breaker is open and no stale data is available
+        """
+        breaker = get_breaker(self.client_id, endpoint)
+        stale_cache = get_stale_cache() if cache else None
+        cache_key = (self.client_id, endpoint, cache_args)
+        allow_stale = allow_stale and cache
+
+        if breaker.allow():
+            probe = breaker.probing
+            try:
+                result = await getattr(self, fetch_method)(*args)
+            except Exception as e:
+                if not is_upstream_failure(e):
+                    raise
+                breaker.record_failure()
+                stale = stale_cache.get(cache_key) if allow_stale else None
+                if stale is None:
+                    raise
+                logger.warning(f"Ozon {endpoint} failed ({e}), serving stale data")
+            else:
+                breaker.record_success()
+                if stale_cache is not None:
+                    stale_cache.put(cache_key, result)
+                return result
+            finally:
+                if probe:
+                    # Cancelled or failed on our side: let the next call probe
+                    breaker.release_probe()
+        else:
+            stale = stale_cache.get(cache_key) if allow_stale else None
+            if stale is None:
+                raise CircuitOpenError(endpoint, breaker.retry_in())
+
+        fetched_at, result = stale
+        fetched_at = datetime.utcfromtimestamp(fetched_at)
+        if self.stale_as_of is None or fetched_at < self.stale_as_of:
+            self.stale_as_of = fetched_at
+        self._schedule_revalidation(endpoint, cache_key, fetch_method, args)
+        return result
+
+    def _schedule_revalidation(
+        self,
+        endpoint: str,
+        cache_key: Hashable,
+        fetch_method: str,
+        args: tuple
+    ) -> None:
+        """Refresh stale cache entry in background once the breaker lets a probe through."""
+        if cache_key in _revalidations:
+            return
+
+        client_id, api_key = self.client_id, self.api_key
+
+        async def _revalidate() -> None:
+            breaker = get_breaker(client_id, endpoint)
+            try:
+                while True:
+                    await asyncio.sleep(max(breaker.retry_in(), 1.0))
+                    if not breaker.allow():
+                        continue
+                    probe = breaker.probing
+                    try:
+                        # Own client: the requesting service may be closed by now
+                        async with OzonAPIService(client_id, api_key) as service:
+                            result = await getattr(service, fetch_method)(*args)
+                    except Exception as e:
+                        if is_upstream_failure(e):
+                            breaker.record_failure()
+                            continue
+                        raise
+                    else:
+                        breaker.record_success()
+                    finally:
+                        if probe:
+                            breaker.release_probe()
+                    get_stale_cache().put(cache_key, result)
+                    return
+            except Exception as e:
+                logger.warning(f"Revalidation of {endpoint} for {client_id} failed: {e}")
+            finally:
+                _revalidations.pop(cache_key, None)
+
+        _revalidations[cache_key] = asyncio.get_running_loop().create_task(_revalidate())
+
+    @traced("ozon.validate_credentials")
     async def validate_credentials(self) -> bool:
         """
         Validate API credentials by making a test request.
@@ -55,6 +289,7 @@ class OzonAPIService:
         # TODO: Implement actual credential validation
         return True
 
+    @traced("ozon.get_analytics_data")
     async def get_analytics_data(self, date_from: datetime, date_to: datetime) -> Dict[str, Any]:
         """
         Get analytics data for specified period.
@@ -66,6 +301,12 @@ class OzonAPIService:
         Returns:
             Dict containing analytics data
         """
+        return await self._call(
+            "analytics", _window_key(date_from, date_to), "_fetch_analytics_data", date_from, date_to
+        )
+
+    async def _fetch_analytics_data(self, date_from: datetime, date_to: datetime) -> Dict[str, Any]:
+        """Fetch analytics data from Ozon."""
         # STUB: Return mock data
         # TODO: Implement actual Ozon Analytics API call
         return {
@@ -77,107 +318,525 @@ class OzonAPIService:
             "return_rate": 0.05
         }
 
-    async def get_fbo_fbs_data(self, date_from: datetime, date_to: datetime) -> List[Dict[str, Any]]:
+    @traced("ozon.get_fbo_fbs_data")
+    async def get_fbo_fbs_data(
+        self,
+        date_from: datetime,
+        date_to: datetime,
+        allow_stale: bool = True
+    ) -> PostingBatch:
         """
         Get FBO/FBS logistics data.
 
         Args:
             date_from: Start date
             date_to: End date
+            allow_stale: Whether last good data for the same window may be
+                returned while Ozon is degraded (disable for exact-range consumers)
+
+        Returns:
+            PostingBatch of logistics records
+        """
+        return await self._call(
+            "postings", _window_key(date_from, date_to), "_fetch_fbo_fbs_data", date_from, date_to,
+            allow_stale=allow_stale,
+        )
+
+    async def _fetch_fbo_fbs_data(self, date_from: datetime, date_to: datetime) -> PostingBatch:
+        """Fetch FBO/FBS postings from Ozon, all pages of both lists into one batch."""
+        postings = PostingBatch()
+        cursor = None
+        while True:
+            page, cursor = await self._fetch_postings_page(date_from, date_to, cursor)
+            postings.extend(page)
+            if cursor is None:
+                return postings
+
+    @traced("ozon.get_postings_page")
+    async def get_postings_page(
+        self,
+        date_from: datetime,
+        date_to: datetime,
+        cursor: Optional[str] = None
+    ) -> Tuple[PostingBatch, Optional[str]]:
+        """
+        Get one page of FBO/FBS postings (used by checkpointed ingestion).
+
+        Args:
+            date_from: Start date
+            date_to: End date
+            cursor: Cursor returned with the previous page (None for the first page)
 
         Returns:
-            List of logistics records
-        """
-        # STUB: Return mock logistics data
-        # TODO: Implement actual logistics API calls
-        return [
-            {
-                "order_id": "12345678",
-                "delivery_type": "FBS",
-                "status": "delivered",
-                "cost": 150.00,
-                "delivery_date": (date_from + timedelta(days=2)).isoformat(),
-                "warehouse": "Москва"
+            (PostingBatch of the page, cursor of the next page or None after the last page)
+        """
+        return await self._call(
+            "postings", None, "_fetch_postings_page", date_from, date_to, cursor, cache=False
+        )
+
+    async def _fetch_postings_page(
+        self,
+        date_from: datetime,
+        date_to: datetime,
+        cursor: Optional[str]
+    ) -> Tuple[PostingBatch, Optional[str]]:
+        """Fetch one page of postings from Ozon; the cursor is '<delivery type>:<offset>'."""
+        delivery_type, offset = (cursor or f"{POSTING_LISTS[0][0]}:0").split(":")
+        schemes = [scheme for scheme, _, _ in POSTING_LISTS]
+        postings, has_next = await self._stream_postings_page(
+            delivery_type, date_from, date_to, int(offset)
+        )
+        if has_next:
+            return postings, f"{delivery_type}:{int(offset) + settings.ozon_ingest_page_size}"
+        index = schemes.index(delivery_type) + 1
+        return postings, f"{schemes[index]}:0" if index < len(schemes) else None
+
+    async def _stream_postings_page(
+        self,
+        delivery_type: str,
+        date_from: datetime,
+        date_to: datetime,
+        offset: int
+    ) -> Tuple[PostingBatch, bool]:
+        """
+        Fetch one page of FBS or FBO postings, appending each posting as soon as it is parsed.
+
+        Args:
+            delivery_type: "FBS" or "FBO" (see POSTING_LISTS)
+            date_from: Start date
+            date_to: End date
+            offset: Page offset
+
+        Returns:
+            (PostingBatch of the page, whether more pages follow)
+        """
+        limit = settings.ozon_ingest_page_size
+        _, path, array_path = next(item for item in POSTING_LISTS if item[0] == delivery_type)
+        parser = JSONArrayStream(array_path)
+        postings = PostingBatch()
+        items = self._stream_array(
+            "POST", path, parser,
+            json={
+                "dir": "ASC",
+                "filter": {"since": _format_ozon_time(date_from), "to": _format_ozon_time(date_to)},
+                "limit": limit,
+                "offset": offset,
+                "with": {"analytics_data": True, "financial_data": True},
             },
-            {
-                "order_id": "12345679",
-                "delivery_type": "FBO",
-                "status": "in_transit",
-                "cost": 200.00,
-                "delivery_date": None,
-                "warehouse": "Санкт-Петербург"
-            }
-        ]
+        )
+        async for item in items:
+            _append_ozon_posting(postings, item, delivery_type)
+        # The FBO list has no has_next flag: a full page may be followed by more
+        return postings, parser.fields.get("has_next", parser.items_parsed == limit)
 
-    async def get_product_data(self) -> List[Dict[str, Any]]:
+    @traced("ozon.get_product_data")
+    async def get_product_data(self) -> ProductBatch:
         """
         Get product catalog data.
 
         Returns:
-            List of products
+            ProductBatch of products
         """
+        return await self._call("products", None, "_fetch_product_data")
+
+    async def _fetch_product_data(self) -> ProductBatch:
+        """Fetch product catalog from Ozon."""
         # STUB: Return mock product data
         # TODO: Implement actual product API calls
-        return [
-            {
-                "sku": "SKU001",
-                "name": "Тестовый товар 1",
-                "price": 1000.00,
-                "stocks": 50,
-                "category": "Электроника"
-            },
-            {
-                "sku": "SKU002",
-                "name": "Тестовый товар 2",
-                "price": 500.00,
-                "stocks": 25,
-                "category": "Книги"
-            }
-        ]
+        products = ProductBatch()
+        products.append("SKU001", "Тестовый товар 1", 1000.00, 50, "Электроника", 1.2)
+        products.append("SKU002", "Тестовый товар 2", 500.00, 25, "Книги", 0.5)
+        return products
 
-    async def calculate_logistics_report(self, days: int = 7) -> Dict[str, Any]:
+    @traced("ozon.get_product_changes")
+    async def get_product_changes(self, since: datetime) -> Tuple[ProductBatch, List[str]]:
+        """
+        Get catalog changes since the previous sync (used by services.catalog).
+
+        Args:
+            since: Time of the previous successful sync
+
+        Returns:
+            (ProductBatch of new and updated products, SKUs removed or archived)
+        """
+        return await self._call("products", None, "_fetch_product_changes", since, cache=False)
+
+    async def _fetch_product_changes(self, since: datetime) -> Tuple[ProductBatch, List[str]]:
+        """
+        Fetch catalog changes from Ozon.
+
+        Product lists carry no change time, so every listed product's info is
+        read (a page of ids per request) and only products updated after
+        since are kept: visible ones as changed, archived ones as removed.
+        """
+        changed = ProductBatch()
+        removed: List[str] = []
+        for visibility in ("ALL", "ARCHIVED"):
+            async for item in self._iter_product_info(visibility):
+                updated_at = _parse_ozon_time(item.get("updated_at"))
+                if updated_at is not None and updated_at <= since:
+                    continue
+                if visibility == "ARCHIVED":
+                    removed.extend(_ozon_product_skus(item))
+                else:
+                    _append_ozon_product(changed, item)
+        return changed, removed
+
+    async def _iter_product_info(self, visibility: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield /v3/product/info/list items of all products with a visibility, page by page.
+
+        Args:
+            visibility: /v3/product/list visibility filter, e.g. "ALL" or "ARCHIVED"
+
+        Yields:
+            Product info items
+        """
+        limit = settings.ozon_ingest_page_size
+        last_id = ""
+        while True:
+            parser = JSONArrayStream(("result", "items"))
+            product_ids = [
+                item["product_id"]
+                async for item in self._stream_array(
+                    "POST", "/v3/product/list", parser,
+                    json={"filter": {"visibility": visibility}, "last_id": last_id, "limit": limit},
+                )
+            ]
+            if product_ids:
+                async for item in self._stream_array(
+                    "POST", "/v3/product/info/list", JSONArrayStream(("items",)),
+                    json={"product_id": product_ids},
+                ):
+                    yield item
+            last_id = parser.fields.get("last_id") or ""
+            if len(product_ids) < limit or not last_id:
+                return
+
+    @traced("ozon.calculate_logistics_report")
+    async def calculate_logistics_report(
+        self,
+        days: int = 7,
+        summary: Optional[Dict[str, Any]] = None,
+        compare_previous: bool = False,
+        use_rollups: bool = False
+    ) -> Dict[str, Any]:
         """
         Calculate comprehensive logistics report.
 
         Args:
             days: Number of days for report
+            summary: Precomputed summary (see services.rollups.build_period_summary);
+                when given, analytics are not fetched and recomputed
+            compare_previous: Add comparison with the preceding period of the same length
+            use_rollups: Build the summary from the seller's daily rollups
+                (refreshing them first) when summary is not given
 
         Returns:
             Complete logistics report data
         """
         date_to = datetime.utcnow()
         date_from = date_to - timedelta(days=days)
+        previous_from = date_from - timedelta(days=days)
+        self.stale_as_of = None
 
-        # Get all required data
-        analytics = await self.get_analytics_data(date_from, date_to)
-        logistics = await self.get_fbo_fbs_data(date_from, date_to)
-        products = await self.get_product_data()
+        # Both periods are downloaded as one range, minus postings fetched
+        # for this shop moments ago (e.g. a 7-day report before a 28-day one);
+        # reports backed by the database also read final ingested postings
+        planner = FetchPlanner(self, use_store=use_rollups)
+        planner.add(date_from, date_to)
+        if compare_previous:
+            planner.add(previous_from, date_from)
+        await planner.run()
 
-        # STUB: Basic calculations
-        # TODO: Implement complex logistics calculations
-        total_logistics_cost = sum(item["cost"] for item in logistics)
-        total_revenue = analytics["total_revenue"]
-        profit_margin = ((total_revenue - total_logistics_cost) / total_revenue) * 100
+        if summary is None and use_rollups:
+            # Today's live postings are taken from the report's planner
+            async with async_session() as session:
+                summary = await build_period_summary(session, self, self.client_id, days, planner=planner)
 
-        return {
-            "period": {
-                "from": date_from.isoformat(),
-                "to": date_to.isoformat(),
-                "days": days
-            },
-            "summary": {
+        # Get all required data; the catalog comes from the local cache
+        logistics = planner.view(date_from, date_to)
+        catalog = await get_catalog(self)
+        products = catalog.products
+
+        if summary is None:
+            analytics = await self.get_analytics_data(date_from, date_to)
+
+            # STUB: Basic calculations
+            # TODO: Implement complex logistics calculations
+            total_logistics_cost = logistics.total_cost()
+            total_revenue = analytics["total_revenue"]
+            profit_margin = ((total_revenue - total_logistics_cost) / total_revenue) * 100
+
+            summary = {
                 "total_orders": analytics["total_orders"],
                 "total_revenue": total_revenue,
                 "total_logistics_cost": total_logistics_cost,
                 "profit_margin": round(profit_margin, 2),
+                "delivered_orders": logistics.delivered_count(),
                 "average_delivery_time": analytics["average_delivery_time"],
-                "return_rate": analytics["return_rate"]
+                "return_rate": analytics["return_rate"],
+                "percentiles": percentiles(build_sketches(logistics))
+            }
+
+        # Expected cost by Ozon tariffs vs what was charged, per posting;
+        # volume weights come from the catalog
+        posting_products = catalog.join(logistics)
+        catalog.fill_volume_weights(logistics)
+        tariff_check = get_tariff_index().price_batch(logistics)
+
+        comparison = None
+        if compare_previous:
+            comparison = compare_periods(
+                summarize_postings(logistics),
+                summarize_postings(planner.view(previous_from, date_from)),
+            )
+            comparison["previous_period"] = {
+                "from": previous_from.isoformat(),
+                "to": date_from.isoformat(),
+                "days": days
+            }
+
+        report = {
+            "period": {
+                "from": date_from.isoformat(),
+                "to": date_to.isoformat(),
+                "days": days
             },
+            "summary": summary,
             "logistics_data": logistics,
             "products": products,
-            "generated_at": datetime.utcnow().isoformat()
+            # Catalog row per posting (services.catalog.MISSING if unknown SKU)
+            "posting_products": posting_products,
+            "tariff_check": tariff_check,
+            "tariff_summary": tariff_check.summary(),
+            "comparison": comparison,
+            "generated_at": datetime.utcnow().isoformat(),
+            # Set when Ozon was degraded and last good data was used
+            "is_stale": self.stale_as_of is not None,
+            "data_as_of": (self.stale_as_of or date_to).isoformat()
         }
 
+        job = current_job()
+        if job is not None:
+            job.charge(report_nbytes(report))
+        return report
+
+
+def _format_ozon_time(value: datetime) -> str:
+    """Format naive UTC datetime for Ozon API filters."""
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _window_key(date_from: datetime, date_to: datetime) -> Tuple[str, str]:
+    """Stale cache key of a fetch window: its bounds as sent to Ozon, not just its length."""
+    return _format_ozon_time(date_from), _format_ozon_time(date_to)
+
+
+def _parse_ozon_time(value: Optional[str]) -> Optional[datetime]:
+    """Parse Ozon API timestamp into naive UTC datetime (None if empty)."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _append_ozon_posting(postings: PostingBatch, item: Dict[str, Any], delivery_type: str) -> None:
+    """Append posting from an Ozon /v3/posting/fbs/list or /v2/posting/fbo/list item."""
+    products = item.get("products") or []
+    financial_products = (item.get("financial_data") or {}).get("products") or []
+    cost = -sum(
+        (product.get("item_services") or {}).get(service) or 0.0
+        for product in financial_products
+        for service in LOGISTICS_SERVICES
+    )
+    revenue = sum(float(product.get("price") or 0) * product.get("quantity", 1) for product in products)
+    postings.append(
+        item["posting_number"],
+        delivery_type,
+        item.get("status"),
+        round(cost, 2),
+        _parse_ozon_time(item.get("delivering_date")),
+        (item.get("delivery_method") or {}).get("warehouse")
+        or (item.get("analytics_data") or {}).get("warehouse_name"),
+        created_at=_parse_ozon_time(item.get("in_process_at")),
+        revenue=round(revenue, 2),
+        # Not part of the posting list: filled from the catalog before pricing
+        volume_weight=None,
+        sku=str(products[0]["sku"]) if products else None,
+    )
+
+
+def _ozon_product_skus(item: Dict[str, Any]) -> List[str]:
+    """Get Ozon SKUs of a /v3/product/info/list item (one per FBO/FBS source)."""
+    skus = {str(source["sku"]) for source in item.get("sources") or () if source.get("sku")}
+    if item.get("sku"):
+        skus.add(str(item["sku"]))
+    return sorted(skus)
+
+
+def _append_ozon_product(products: ProductBatch, item: Dict[str, Any]) -> None:
+    """Append product from a /v3/product/info/list item, once per SKU postings may refer to."""
+    stocks = sum(stock.get("present") or 0 for stock in (item.get("stocks") or {}).get("stocks") or ())
+    volume_weight = item.get("volume_weight")
+    for sku in _ozon_product_skus(item):
+        products.append(
+            sku,
+            item.get("name") or item.get("offer_id") or sku,
+            float(item.get("price") or 0),
+            stocks,
+            # Category names need a separate tree request; the id keeps products groupable
+            str(item.get("description_category_id") or ""),
+            float(volume_weight) if volume_weight else None,
+        )
+
+
+# Per-posting report values moved to disk when a job is over its memory budget
+SPILLABLE_REPORT_KEYS = ("logistics_data", "posting_products", "tariff_check")
+
+
+def report_nbytes(report: Dict[str, Any]) -> int:
+    """
+    Approximate memory held by per-posting data of a report.
+
+    The catalog is a shared snapshot and is not counted.
+
+    Args:
+        report: Data from calculate_logistics_report
+
+    Returns:
+        int: Bytes
+    """
+    tariff_check = report["tariff_check"]
+    posting_products = report["posting_products"]
+    return (
+        report["logistics_data"].nbytes
+        + posting_products.itemsize * len(posting_products)
+        + tariff_check.expected.itemsize * len(tariff_check) * 2
+    )
+
+
+# Summary values compared between periods
+COMPARED_METRICS = (
+    "total_orders", "total_revenue", "total_logistics_cost", "average_delivery_time", "return_rate",
+)
+
+
+def compare_periods(current: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compare summaries of two periods.
+
+    Args:
+        current: Summary of the report period
+        previous: Summary of the preceding period
+
+    Returns:
+        Dict with both summaries and relative change in percent per metric
+        (None when the previous value is zero)
+    """
+    changes = {
+        key: round((current[key] - previous[key]) / previous[key] * 100, 2) if previous[key] else None
+        for key in COMPARED_METRICS
+    }
+    return {"current": current, "previous": previous, "changes": changes}
+
+
+def merge_summaries(summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge report summaries of several shops into one.
+
+    Args:
+        summaries: Summaries from calculate_logistics_report
+
+    Returns:
+        Combined summary (delivery time weighted by delivered orders, return rate by orders)
+    """
+    total_orders = sum(s["total_orders"] for s in summaries)
+    delivered_orders = sum(s["delivered_orders"] for s in summaries)
+    total_revenue = sum(s["total_revenue"] for s in summaries)
+    total_logistics_cost = sum(s["total_logistics_cost"] for s in summaries)
+
+    def weighted(key: str, weight: str) -> float:
+        total = sum(s[weight] for s in summaries)
+        if not total:
+            return 0.0
+        return sum(s[key] * s[weight] for s in summaries) / total
+
+    profit_margin = (
+        (total_revenue - total_logistics_cost) / total_revenue * 100 if total_revenue else 0.0
+    )
+    return {
+        "total_orders": total_orders,
+        "total_revenue": round(total_revenue, 2),
+        "total_logistics_cost": round(total_logistics_cost, 2),
+        "profit_margin": round(profit_margin, 2),
+        "delivered_orders": delivered_orders,
+        "average_delivery_time": round(weighted("average_delivery_time", "delivered_orders"), 2),
+        "return_rate": round(weighted("return_rate", "total_orders"), 4),
+    }
+
+
+@traced("ozon.calculate_consolidated_report")
+async def calculate_consolidated_report(
+    shops: Iterable[Any],
+    days: int = 7,
+    use_rollups: bool = False
+) -> Dict[str, Any]:
+    """
+    Calculate logistics reports for several shops in parallel and merge them.
+
+    Each shop uses its own OzonAPIService (and request limiter); the number
+    of shops fetched at once is bounded by consolidated_max_parallel_shops.
+
+    Args:
+        shops: Shop models (objects with name, client_id and api_key)
+        days: Number of days for report
+        use_rollups: Build shop summaries from daily rollups (see calculate_logistics_report)
+
+    Returns:
+        Consolidated report data with per-shop reports and combined summary
+    """
+    shops = list(shops)
+    semaphore = asyncio.Semaphore(settings.consolidated_max_parallel_shops)
+
+    job = current_job()
+
+    async def _shop_report(shop) -> Dict[str, Any]:
+        async with semaphore:
+            async with OzonAPIService(shop.client_id, shop.api_key) as service:
+                report = await service.calculate_logistics_report(days, use_rollups=use_rollups)
+        if job is not None and job.over_budget():
+            # Postings of this shop wait on disk until its sheet is written
+            job.discharge(report_nbytes(report))
+            report = spill_fields(report, SPILLABLE_REPORT_KEYS, job)
+        return report
+
+    results = await asyncio.gather(*(_shop_report(shop) for shop in shops), return_exceptions=True)
+
+    shop_reports = []
+    failed_shops = []
+    for shop, result in zip(shops, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Report for shop {shop.client_id} failed: {result}")
+            failed_shops.append({"name": shop.name, "client_id": shop.client_id, "error": str(result)})
+        else:
+            shop_reports.append({"name": shop.name, "client_id": shop.client_id, "report": result})
+
+    date_to = datetime.utcnow()
+    return {
+        "period": {
+            "from": (date_to - timedelta(days=days)).isoformat(),
+            "to": date_to.isoformat(),
+            "days": days
+        },
+        "summary": merge_summaries([item["report"]["summary"] for item in shop_reports]),
+        "shops": shop_reports,
+        "failed_shops": failed_shops,
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
 
 # Factory function for service creation
 async def create_ozon_service(client_id: str, api_key: str) -> OzonAPIService:
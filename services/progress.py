@@ -0,0 +1,112 @@
+"""
+Report progress messages for Ozon Logistics Bot.
+Coalesces progress updates per message and edits it at most once per
+interval, skipping unchanged text, so fast pipeline stages do not run into
+Telegram's per-chat edit limits.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """Rate-limited, coalescing editor of a single progress message."""
+
+    def __init__(self, bot: Bot, chat_id: int, message_id: int, min_interval: Optional[float] = None):
+        """
+        Initialize reporter.
+
+        Args:
+            bot: Bot instance
+            chat_id: Chat of the message to edit
+            message_id: Message to edit (only IDs are kept, so jobs can report progress)
+            min_interval: Minimum seconds between edits (settings value if None)
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = settings.progress_edit_interval if min_interval is None else min_interval
+
+        self._pending: Optional[str] = None
+        self._pending_markup: Optional[InlineKeyboardMarkup] = None
+        self._sent: Optional[str] = None
+        self._next_edit_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """
+        Queue new progress text. Never waits on Telegram.
+
+        Only the latest text is kept; intermediate updates are dropped.
+
+        Args:
+            text: Message text (HTML)
+            reply_markup: Optional keyboard
+        """
+        self._pending = text
+        self._pending_markup = reply_markup
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def finish(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        """
+        Show final text, waiting until it has been delivered or has failed.
+
+        Never raises on edit errors; they are logged.
+
+        Args:
+            text: Final message text (HTML)
+            reply_markup: Optional keyboard
+        """
+        self.update(text, reply_markup)
+        if self._task is not None:
+            await self._task
+
+    async def _flush(self) -> None:
+        """Send pending text respecting the edit interval and retry_after."""
+        while self._pending is not None:
+            delay = self._next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            text, markup = self._pending, self._pending_markup
+            self._pending = None
+            if text == self._sent and markup is None:
+                continue
+
+            try:
+                await self.bot.edit_message_text(
+                    text,
+                    chat_id=self.chat_id,
+                    message_id=self.message_id,
+                    reply_markup=markup,
+                    parse_mode="HTML",
+                )
+                self._sent = text
+                self._next_edit_at = time.monotonic() + self.min_interval
+            except TelegramRetryAfter as e:
+                # Keep the newest text and retry after the flood wait
+                if self._pending is None:
+                    self._pending, self._pending_markup = text, markup
+                self._next_edit_at = time.monotonic() + e.retry_after
+            except TelegramBadRequest as e:
+                if "message is not modified" in str(e):
+                    self._sent = text
+                else:
+                    logger.warning(f"Failed to edit progress message: {e}")
+                    return
+            except Exception as e:
+                # Network or other API errors: the edit runs in a background
+                # task and must never fail the report that queued it
+                logger.warning(f"Failed to edit progress message: {e}")
+                self._next_edit_at = time.monotonic() + self.min_interval
@@ -0,0 +1,482 @@
+"""
+Compact record types for Ozon postings and products.
+Data is stored as struct-of-arrays batches: numeric fields in typed arrays and
+repeated categorical strings (warehouse, status, delivery type, category)
+dictionary-encoded into small integer codes.
+"""
+
+import math
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+DateLike = Union[datetime, str, None]
+
+
+def _to_timestamp(value: DateLike) -> float:
+    """Convert naive UTC datetime or ISO string to epoch seconds (NaN for None)."""
+    if value is None:
+        return math.nan
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _from_timestamp(value: float) -> Optional[datetime]:
+    """Convert epoch seconds back to naive UTC datetime."""
+    if math.isnan(value):
+        return None
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+
+class CategoryDictionary:
+    """Dictionary encoding of repeated string values into integer codes."""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        # Code 0 is reserved for missing values
+        self.values: List[Optional[str]] = [None]
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, value: Optional[str]) -> int:
+        """Get code for value, adding it to the dictionary if new."""
+        if value is None:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        """Get value for code."""
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values) - 1
+
+
+class Posting:
+    """Single posting materialized from a PostingBatch."""
+
+    __slots__ = ("order_id", "delivery_type", "status", "cost", "delivery_date", "warehouse")
+
+    def __init__(
+        self,
+        order_id: str,
+        delivery_type: Optional[str],
+        status: Optional[str],
+        cost: float,
+        delivery_date: Optional[datetime],
+        warehouse: Optional[str]
+    ):
+        self.order_id = order_id
+        self.delivery_type = delivery_type
+        self.status = status
+        self.cost = cost
+        self.delivery_date = delivery_date
+        self.warehouse = warehouse
+
+    def __repr__(self):
+        return f"<Posting(order_id={self.order_id}, status={self.status}, cost={self.cost})>"
+
+
+class PostingBatch:
+    """Struct-of-arrays batch of postings."""
+
+    __slots__ = (
+        "order_ids", "costs", "delivery_dates", "created_dates", "revenues", "volume_weights",
+        "delivery_type_codes", "status_codes", "warehouse_codes", "sku_codes",
+        "delivery_types", "statuses", "warehouses", "skus",
+    )
+
+    def __init__(
+        self,
+        delivery_types: Optional[CategoryDictionary] = None,
+        statuses: Optional[CategoryDictionary] = None,
+        warehouses: Optional[CategoryDictionary] = None,
+        skus: Optional[CategoryDictionary] = None
+    ):
+        """
+        Initialize empty batch.
+
+        Args:
+            delivery_types: Shared dictionary for delivery types
+            statuses: Shared dictionary for statuses
+            warehouses: Shared dictionary for warehouses
+            skus: Shared dictionary for SKUs
+        """
+        self.order_ids: List[str] = []
+        self.costs = array("d")
+        self.delivery_dates = array("d")  # epoch seconds, NaN if not delivered
+        self.created_dates = array("d")  # epoch seconds, NaN if unknown
+        self.revenues = array("d")
+        self.volume_weights = array("d")  # liters, NaN if unknown
+        self.delivery_type_codes = array("H")
+        self.status_codes = array("H")
+        self.warehouse_codes = array("H")
+        self.sku_codes = array("L")  # SKUs are too many for 16-bit codes
+        self.delivery_types = delivery_types if delivery_types is not None else CategoryDictionary()
+        self.statuses = statuses if statuses is not None else CategoryDictionary()
+        self.warehouses = warehouses if warehouses is not None else CategoryDictionary()
+        self.skus = skus if skus is not None else CategoryDictionary()
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Dict[str, Any]]) -> "PostingBatch":
+        """
+        Build batch from Ozon-style posting dicts.
+
+        Args:
+            items: Dicts with order_id, delivery_type, status, cost, delivery_date, warehouse
+                and optional created_at, revenue, volume_weight, sku
+
+        Returns:
+            PostingBatch instance
+        """
+        batch = cls()
+        for item in items:
+            batch.append(
+                item["order_id"],
+                item.get("delivery_type"),
+                item.get("status"),
+                item.get("cost") or 0.0,
+                item.get("delivery_date"),
+                item.get("warehouse"),
+                item.get("created_at"),
+                item.get("revenue") or 0.0,
+                item.get("volume_weight"),
+                item.get("sku"),
+            )
+        return batch
+
+    def append(
+        self,
+        order_id: str,
+        delivery_type: Optional[str],
+        status: Optional[str],
+        cost: float,
+        delivery_date: DateLike,
+        warehouse: Optional[str],
+        created_at: DateLike = None,
+        revenue: float = 0.0,
+        volume_weight: Optional[float] = None,
+        sku: Optional[str] = None
+    ) -> None:
+        """Append single posting (volume_weight None if unknown)."""
+        self.order_ids.append(order_id)
+        self.costs.append(cost)
+        self.delivery_dates.append(_to_timestamp(delivery_date))
+        self.created_dates.append(_to_timestamp(created_at))
+        self.revenues.append(revenue)
+        self.volume_weights.append(math.nan if volume_weight is None else volume_weight)
+        self.delivery_type_codes.append(self.delivery_types.encode(delivery_type))
+        self.status_codes.append(self.statuses.encode(status))
+        self.warehouse_codes.append(self.warehouses.encode(warehouse))
+        self.sku_codes.append(self.skus.encode(sku))
+
+    def extend(self, other: "PostingBatch") -> None:
+        """Append all postings of another batch, re-encoding its categorical codes."""
+        if other.delivery_types is self.delivery_types:
+            delivery_type_codes = other.delivery_type_codes
+        else:
+            remap = [self.delivery_types.encode(value) for value in other.delivery_types.values]
+            delivery_type_codes = array("H", (remap[code] for code in other.delivery_type_codes))
+        if other.statuses is self.statuses:
+            status_codes = other.status_codes
+        else:
+            remap = [self.statuses.encode(value) for value in other.statuses.values]
+            status_codes = array("H", (remap[code] for code in other.status_codes))
+        if other.warehouses is self.warehouses:
+            warehouse_codes = other.warehouse_codes
+        else:
+            remap = [self.warehouses.encode(value) for value in other.warehouses.values]
+            warehouse_codes = array("H", (remap[code] for code in other.warehouse_codes))
+        if other.skus is self.skus:
+            sku_codes = other.sku_codes
+        else:
+            remap = [self.skus.encode(value) for value in other.skus.values]
+            sku_codes = array("L", (remap[code] for code in other.sku_codes))
+
+        self.order_ids.extend(other.order_ids)
+        self.costs.extend(other.costs)
+        self.delivery_dates.extend(other.delivery_dates)
+        self.created_dates.extend(other.created_dates)
+        self.revenues.extend(other.revenues)
+        self.volume_weights.extend(other.volume_weights)
+        self.delivery_type_codes.extend(delivery_type_codes)
+        self.status_codes.extend(status_codes)
+        self.warehouse_codes.extend(warehouse_codes)
+        self.sku_codes.extend(sku_codes)
+
+    def created_between(self, date_from: DateLike, date_to: DateLike) -> "PostingBatch":
+        """
+        Select postings created in [date_from, date_to).
+
+        The result shares this batch's dictionaries, so no strings are re-encoded.
+        """
+        start = _to_timestamp(date_from)
+        end = _to_timestamp(date_to)
+        view = PostingBatch(self.delivery_types, self.statuses, self.warehouses, self.skus)
+        columns = (
+            (self.order_ids, view.order_ids), (self.costs, view.costs),
+            (self.delivery_dates, view.delivery_dates), (self.created_dates, view.created_dates),
+            (self.revenues, view.revenues), (self.volume_weights, view.volume_weights),
+            (self.delivery_type_codes, view.delivery_type_codes), (self.status_codes, view.status_codes),
+            (self.warehouse_codes, view.warehouse_codes), (self.sku_codes, view.sku_codes),
+        )
+        selected = [index for index, created in enumerate(self.created_dates) if start <= created < end]
+        for source, target in columns:
+            target.extend(source[index] for index in selected)
+        return view
+
+    def __len__(self):
+        return len(self.order_ids)
+
+    def __getitem__(self, index: int) -> Posting:
+        return Posting(*self.row(index))
+
+    def __iter__(self) -> Iterator[Posting]:
+        for index in range(len(self)):
+            yield Posting(*self.row(index))
+
+    def row(self, index: int) -> Tuple:
+        """
+        Get posting fields as tuple.
+
+        Returns:
+            (order_id, delivery_type, status, cost, delivery_date, warehouse)
+        """
+        return (
+            self.order_ids[index],
+            self.delivery_types.values[self.delivery_type_codes[index]],
+            self.statuses.values[self.status_codes[index]],
+            self.costs[index],
+            _from_timestamp(self.delivery_dates[index]),
+            self.warehouses.values[self.warehouse_codes[index]],
+        )
+
+    def rows(self) -> Iterator[Tuple]:
+        """Iterate postings as tuples without creating Posting objects."""
+        delivery_types = self.delivery_types.values
+        statuses = self.statuses.values
+        warehouses = self.warehouses.values
+        for order_id, dt_code, st_code, cost, delivered, wh_code in zip(
+            self.order_ids, self.delivery_type_codes, self.status_codes,
+            self.costs, self.delivery_dates, self.warehouse_codes,
+        ):
+            yield (
+                order_id,
+                delivery_types[dt_code],
+                statuses[st_code],
+                cost,
+                _from_timestamp(delivered),
+                warehouses[wh_code],
+            )
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate postings as dicts accepted by from_dicts.
+
+        Dates are naive UTC datetimes and volume weights floats (None if missing).
+        """
+        delivery_types = self.delivery_types.values
+        statuses = self.statuses.values
+        warehouses = self.warehouses.values
+        skus = self.skus.values
+        for (
+            order_id, cost, delivered, created, revenue, volume_weight,
+            dt_code, st_code, wh_code, sku_code,
+        ) in zip(
+            self.order_ids, self.costs, self.delivery_dates, self.created_dates, self.revenues,
+            self.volume_weights, self.delivery_type_codes, self.status_codes,
+            self.warehouse_codes, self.sku_codes,
+        ):
+            yield {
+                "order_id": order_id,
+                "delivery_type": delivery_types[dt_code],
+                "status": statuses[st_code],
+                "cost": cost,
+                "delivery_date": _from_timestamp(delivered),
+                "warehouse": warehouses[wh_code],
+                "created_at": _from_timestamp(created),
+                "revenue": revenue,
+                "volume_weight": None if math.isnan(volume_weight) else volume_weight,
+                "sku": skus[sku_code],
+            }
+
+    def total_cost(self) -> float:
+        """Sum of logistics costs."""
+        return math.fsum(self.costs)
+
+    def delivered_count(self) -> int:
+        """Number of postings with a delivery date."""
+        return sum(1 for delivered in self.delivery_dates if not math.isnan(delivered))
+
+    def cost_by_warehouse(self) -> Dict[Optional[str], float]:
+        """Sum of logistics costs grouped by warehouse."""
+        totals = [0.0] * len(self.warehouses.values)
+        for code, cost in zip(self.warehouse_codes, self.costs):
+            totals[code] += cost
+        return {self.warehouses.values[code]: total for code, total in enumerate(totals) if total}
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by column data."""
+        arrays = (
+            self.costs, self.delivery_dates, self.created_dates, self.revenues, self.volume_weights,
+            self.delivery_type_codes, self.status_codes, self.warehouse_codes, self.sku_codes,
+        )
+        return (
+            sum(a.itemsize * len(a) for a in arrays)
+            + sum(49 + len(order_id) for order_id in self.order_ids)
+            + 8 * len(self.order_ids)
+        )
+
+
+class ProductBatch:
+    """Struct-of-arrays batch of catalog products."""
+
+    __slots__ = ("skus", "names", "prices", "stocks", "volume_weights", "category_codes", "categories")
+
+    def __init__(self, categories: Optional[CategoryDictionary] = None):
+        """
+        Initialize empty batch.
+
+        Args:
+            categories: Shared dictionary for categories
+        """
+        self.skus: List[str] = []
+        self.names: List[str] = []
+        self.prices = array("d")
+        self.stocks = array("l")
+        self.volume_weights = array("d")  # liters, NaN if unknown
+        self.category_codes = array("H")
+        self.categories = categories if categories is not None else CategoryDictionary()
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Dict[str, Any]]) -> "ProductBatch":
+        """
+        Build batch from Ozon-style product dicts.
+
+        Args:
+            items: Dicts with sku, name, price, stocks, category and optional volume_weight
+
+        Returns:
+            ProductBatch instance
+        """
+        batch = cls()
+        for item in items:
+            batch.append(
+                item["sku"],
+                item.get("name", ""),
+                item.get("price") or 0.0,
+                item.get("stocks") or 0,
+                item.get("category"),
+                item.get("volume_weight"),
+            )
+        return batch
+
+    def append(
+        self,
+        sku: str,
+        name: str,
+        price: float,
+        stocks: int,
+        category: Optional[str],
+        volume_weight: Optional[float] = None
+    ) -> None:
+        """Append single product (volume_weight None if unknown)."""
+        self.skus.append(sku)
+        self.names.append(name)
+        self.prices.append(price)
+        self.stocks.append(stocks)
+        self.volume_weights.append(math.nan if volume_weight is None else volume_weight)
+        self.category_codes.append(self.categories.encode(category))
+
+    def copy(self) -> "ProductBatch":
+        """Copy columns; the category dictionary is append-only and stays shared."""
+        batch = ProductBatch(self.categories)
+        batch.skus.extend(self.skus)
+        batch.names.extend(self.names)
+        batch.prices.extend(self.prices)
+        batch.stocks.extend(self.stocks)
+        batch.volume_weights.extend(self.volume_weights)
+        batch.category_codes.extend(self.category_codes)
+        return batch
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by column data."""
+        return (
+            sum(
+                a.itemsize * len(a)
+                for a in (self.prices, self.stocks, self.volume_weights, self.category_codes)
+            )
+            + sum(49 + len(sku) for sku in self.skus)
+            # Names are mostly Cyrillic: 2 bytes per character
+            + sum(74 + 2 * len(name) for name in self.names)
+            + 16 * len(self.skus)
+        )
+
+    def replace(
+        self,
+        index: int,
+        sku: str,
+        name: str,
+        price: float,
+        stocks: int,
+        category: Optional[str],
+        volume_weight: Optional[float] = None
+    ) -> None:
+        """Overwrite product at index in place."""
+        self.skus[index] = sku
+        self.names[index] = name
+        self.prices[index] = price
+        self.stocks[index] = stocks
+        self.volume_weights[index] = math.nan if volume_weight is None else volume_weight
+        self.category_codes[index] = self.categories.encode(category)
+
+    def swap_remove(self, index: int) -> Optional[str]:
+        """
+        Remove product at index by moving the last product into its place.
+
+        Returns:
+            SKU of the product now at index (None if the last product was removed)
+        """
+        last = len(self.skus) - 1
+        if index != last:
+            self.skus[index] = self.skus[last]
+            self.names[index] = self.names[last]
+            self.prices[index] = self.prices[last]
+            self.stocks[index] = self.stocks[last]
+            self.volume_weights[index] = self.volume_weights[last]
+            self.category_codes[index] = self.category_codes[last]
+        columns = (
+            self.skus, self.names, self.prices, self.stocks, self.volume_weights, self.category_codes,
+        )
+        for column in columns:
+            column.pop()
+        return self.skus[index] if index != last else None
+
+    def __len__(self):
+        return len(self.skus)
+
+    def rows(self) -> Iterator[Tuple]:
+        """
+        Iterate products as tuples.
+
+        Yields:
+            (sku, name, price, stocks, category, volume_weight or None if unknown)
+        """
+        categories = self.categories.values
+        for sku, name, price, stocks, code, volume_weight in zip(
+            self.skus, self.names, self.prices, self.stocks, self.category_codes, self.volume_weights
+        ):
+            yield (
+                sku, name, price, stocks, categories[code],
+                None if math.isnan(volume_weight) else volume_weight,
+            )
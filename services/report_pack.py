@@ -0,0 +1,153 @@
+"""
+Report pack builders for Ozon Logistics Bot.
+Logistics, sales and inventory reports of a full pack are built from the
+same report data: postings are scanned once and every row is fed to all
+builders at the same time, products likewise.
+"""
+
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+from services.records import PostingBatch, ProductBatch
+
+SECONDS_PER_DAY = 86400
+EPOCH_DATE = date(1970, 1, 1)
+
+# Posting statuses not counted as sales
+CANCELLED_STATUSES = frozenset({"cancelled"})
+
+
+def _cancelled_codes(postings: PostingBatch) -> frozenset:
+    """Status codes of postings not counted as sales."""
+    return frozenset(
+        code for code, status in enumerate(postings.statuses.values) if status in CANCELLED_STATUSES
+    )
+
+
+class LogisticsBuilder:
+    """Logistics cost and orders per (warehouse, delivery type)."""
+
+    def __init__(self, postings: PostingBatch):
+        self._warehouses = postings.warehouses.values
+        self._delivery_types = postings.delivery_types.values
+        self._groups: Dict[Tuple[int, int], List[float]] = {}
+
+    def add_posting(self, cost: float, wh_code: int, dt_code: int) -> None:
+        """Account single posting."""
+        group = self._groups.get((wh_code, dt_code))
+        if group is None:
+            group = self._groups[(wh_code, dt_code)] = [0, 0.0]
+        group[0] += 1
+        group[1] += cost
+
+    def logistics_data(self) -> List[Dict[str, Any]]:
+        """Rows with warehouse, delivery_type, orders, logistics_cost and average_cost."""
+        return [
+            {
+                "warehouse": self._warehouses[wh_code],
+                "delivery_type": self._delivery_types[dt_code],
+                "orders": orders,
+                "logistics_cost": round(cost, 2),
+                "average_cost": round(cost / orders, 2),
+            }
+            for (wh_code, dt_code), (orders, cost) in sorted(
+                self._groups.items(), key=lambda item: -item[1][1]
+            )
+        ]
+
+
+class SalesBuilder:
+    """Sales count and revenue per day."""
+
+    def __init__(self, postings: PostingBatch):
+        self._cancelled = _cancelled_codes(postings)
+        self._days: Dict[int, List[float]] = {}
+
+    def add_posting(self, created: float, revenue: float, st_code: int) -> None:
+        """Account single posting."""
+        if math.isnan(created) or st_code in self._cancelled:
+            return
+        day = int(created // SECONDS_PER_DAY)
+        totals = self._days.get(day)
+        if totals is None:
+            totals = self._days[day] = [0, 0.0]
+        totals[0] += 1
+        totals[1] += revenue
+
+    def sales_data(self) -> List[Dict[str, Any]]:
+        """Rows accepted by ExcelReportGenerator.generate_sales_report."""
+        return [
+            {
+                "date": (EPOCH_DATE + timedelta(days=day)).isoformat(),
+                "sales": sales,
+                "revenue": round(revenue, 2),
+            }
+            for day, (sales, revenue) in sorted(self._days.items())
+        ]
+
+
+class InventoryBuilder:
+    """Stocks per SKU with units sold in the period and days of cover."""
+
+    def __init__(self, postings: PostingBatch, period_days: int):
+        self._cancelled = _cancelled_codes(postings)
+        self._skus = postings.skus.values
+        self._sold = [0] * len(self._skus)
+        self._period_days = period_days
+        self._rows: List[Dict[str, Any]] = []
+
+    def add_posting(self, sku_code: int, st_code: int) -> None:
+        """Account single posting."""
+        if st_code not in self._cancelled:
+            self._sold[sku_code] += 1
+
+    def add_product(self, sku: str, name: str, stocks: int) -> None:
+        """Account single catalog product."""
+        self._rows.append({"sku": sku, "name": name, "stocks": stocks})
+
+    def inventory_data(self) -> List[Dict[str, Any]]:
+        """Rows accepted by ExcelReportGenerator.generate_inventory_report."""
+        sold_by_sku = {sku: sold for sku, sold in zip(self._skus, self._sold) if sku is not None}
+        for row in self._rows:
+            sold = sold_by_sku.get(row["sku"], 0)
+            row["sold"] = sold
+            row["days_of_cover"] = (
+                round(row["stocks"] / (sold / self._period_days), 1) if sold else None
+            )
+        return self._rows
+
+
+def build_report_pack(report_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build data of all pack reports in one scan of postings and products.
+
+    Args:
+        report_data: Report data from OzonAPIService.calculate_logistics_report
+
+    Returns:
+        Dict with logistics_data, sales_data and inventory_data rows
+    """
+    postings: PostingBatch = report_data["logistics_data"]
+    products: ProductBatch = report_data["products"]
+
+    logistics = LogisticsBuilder(postings)
+    sales = SalesBuilder(postings)
+    inventory = InventoryBuilder(postings, max(report_data["period"]["days"], 1))
+
+    for created, cost, revenue, wh_code, dt_code, st_code, sku_code in zip(
+        postings.created_dates, postings.costs, postings.revenues, postings.warehouse_codes,
+        postings.delivery_type_codes, postings.status_codes, postings.sku_codes,
+    ):
+        logistics.add_posting(cost, wh_code, dt_code)
+        sales.add_posting(created, revenue, st_code)
+        inventory.add_posting(sku_code, st_code)
+
+    for sku, name, _, stocks, _, _ in products.rows():
+        inventory.add_product(sku, name, stocks)
+
+    return {
+        "logistics_data": logistics.logistics_data(),
+        "sales_data": sales.sales_data(),
+        "inventory_data": inventory.inventory_data(),
+    }
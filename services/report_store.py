@@ -0,0 +1,290 @@
+"""
+On-disk report artifact store for Ozon Logistics Bot.
+Keeps generated reports content-addressed and gzip-compressed on local disk
+with size-based LRU eviction, so reports never have to be held in memory
+as a whole and can be re-served after a restart.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import AsyncIterable, BinaryIO, Iterable, Optional, Union
+
+from aiogram.types import InputFile
+from aiogram.types.input_file import DEFAULT_CHUNK_SIZE
+
+from core.config import settings
+from services.memory_budget import claim_process_dir
+
+logger = logging.getLogger(__name__)
+
+COMPRESSED_SUFFIX = ".gz"
+RAW_SUFFIX = ".bin"
+
+
+class ReportArtifact:
+    """Stored report content identified by its SHA-256 digest."""
+
+    __slots__ = ("digest", "path", "disk_size", "compressed")
+
+    def __init__(self, digest: str, path: str, disk_size: int, compressed: bool):
+        self.digest = digest
+        self.path = path
+        self.disk_size = disk_size
+        self.compressed = compressed
+
+    def __repr__(self):
+        return f"<ReportArtifact(digest={self.digest[:12]}, disk_size={self.disk_size})>"
+
+
+class ArtifactWriter:
+    """
+    Incremental writer hashing and compressing chunks into a temp file.
+    The artifact is moved into place on finish() (safe in a worker thread)
+    and registered in the store index on commit().
+    """
+
+    def __init__(self, store: "ReportArtifactStore", compress: bool):
+        self._store = store
+        self._compress = compress
+        self._hash = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self._raw = os.fdopen(fd, "wb")
+        self._file: BinaryIO = (
+            gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=store.compress_level, mtime=0)
+            if compress else self._raw
+        )
+
+    def write(self, chunk: bytes) -> None:
+        """Write chunk of report content."""
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self) -> ReportArtifact:
+        """Finish writing and move the file into place without touching the store index."""
+        if self._file is not self._raw:
+            self._file.close()
+        self._raw.close()
+        digest = self._hash.hexdigest()
+        path = self._store._artifact_path(digest, self._compress)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self._tmp_path, path)
+        return ReportArtifact(digest, path, os.path.getsize(path), self._compress)
+
+    def commit(self) -> ReportArtifact:
+        """Finish writing and register artifact in the store (event loop thread only)."""
+        return self._store._register(self.finish())
+
+    def abort(self) -> None:
+        """Discard partially written artifact."""
+        try:
+            self._file.close()
+            self._raw.close()
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.unlink(self._tmp_path)
+
+
+class ReportArtifactStore:
+    """Content-addressed report store with size-based LRU eviction."""
+
+    def __init__(self, root: str, max_bytes: int, compress_level: int = 6):
+        """
+        Initialize store and index artifacts left from previous runs.
+
+        Args:
+            root: Store directory
+            max_bytes: Maximum total on-disk size
+            compress_level: gzip compression level
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        # Partial writes go to this process's own directory: other processes
+        # sharing root keep theirs, and those of dead processes are removed
+        self.tmp_dir, self._tmp_lock = claim_process_dir(os.path.join(root, "tmp"))
+
+        # digest -> artifact, least recently used first
+        self._index: "OrderedDict[str, ReportArtifact]" = OrderedDict()
+        self._total_bytes = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        """Rebuild LRU index from files on disk (mtime = last access)."""
+        found = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name == "tmp":
+                continue
+            for item in os.scandir(entry.path):
+                name = item.name
+                if name.endswith(COMPRESSED_SUFFIX):
+                    compressed = True
+                elif name.endswith(RAW_SUFFIX):
+                    compressed = False
+                else:
+                    continue
+                stat = item.stat()
+                digest = name.rsplit(".", 1)[0]
+                found.append((stat.st_mtime, ReportArtifact(digest, item.path, stat.st_size, compressed)))
+
+        for _, artifact in sorted(found, key=lambda pair: pair[0]):
+            self._index[artifact.digest] = artifact
+            self._total_bytes += artifact.disk_size
+
+    def _artifact_path(self, digest: str, compressed: bool) -> str:
+        """Get on-disk path for digest."""
+        suffix = COMPRESSED_SUFFIX if compressed else RAW_SUFFIX
+        return os.path.join(self.root, digest[:2], digest + suffix)
+
+    def _register(self, artifact: ReportArtifact) -> ReportArtifact:
+        """Add finished artifact to the index (event loop thread only)."""
+        existing = self.get(artifact.digest)
+        if existing is not None:
+            if existing.path != artifact.path:
+                # Same content stored with the other compression
+                os.unlink(artifact.path)
+            return existing
+
+        self._index[artifact.digest] = artifact
+        self._total_bytes += artifact.disk_size
+        self._evict()
+        return artifact
+
+    def _evict(self) -> None:
+        """Remove least recently used artifacts until under max_bytes."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            digest, artifact = self._index.popitem(last=False)
+            self._total_bytes -= artifact.disk_size
+            try:
+                os.unlink(artifact.path)
+            except FileNotFoundError:
+                pass
+            logger.debug(f"Evicted report artifact {digest}")
+
+    def open_writer(self, compress: bool = True) -> ArtifactWriter:
+        """
+        Start writing a new artifact.
+
+        Args:
+            compress: Store gzip-compressed (disable for already compressed content)
+
+        Returns:
+            ArtifactWriter instance
+        """
+        return ArtifactWriter(self, compress)
+
+    async def write_stream(
+        self,
+        chunks: Union[Iterable[bytes], AsyncIterable[bytes]],
+        compress: bool = True
+    ) -> ReportArtifact:
+        """
+        Write report content chunk by chunk.
+
+        Args:
+            chunks: Sync or async iterable of content chunks
+            compress: Store gzip-compressed
+
+        Returns:
+            Stored artifact
+        """
+        writer = self.open_writer(compress)
+        try:
+            if hasattr(chunks, "__aiter__"):
+                async for chunk in chunks:
+                    await asyncio.to_thread(writer.write, chunk)
+                artifact = await asyncio.to_thread(writer.finish)
+            else:
+                # Producing sync chunks (row formatting, CSV, zlib) is CPU work as
+                # well, so the whole generate-and-write loop runs in the thread
+                artifact = await asyncio.to_thread(_write_all, writer, chunks)
+        except BaseException:
+            writer.abort()
+            raise
+        return self._register(artifact)
+
+    def get(self, digest: str) -> Optional[ReportArtifact]:
+        """
+        Get artifact by digest and mark it as recently used.
+
+        Args:
+            digest: SHA-256 of content
+
+        Returns:
+            Artifact or None if missing
+        """
+        artifact = self._index.get(digest)
+        if artifact is None:
+            return None
+        self._index.move_to_end(digest)
+        try:
+            os.utime(artifact.path)
+        except FileNotFoundError:
+            del self._index[digest]
+            self._total_bytes -= artifact.disk_size
+            return None
+        return artifact
+
+    def open(self, artifact: ReportArtifact) -> BinaryIO:
+        """Open artifact for reading uncompressed content."""
+        if artifact.compressed:
+            return gzip.open(artifact.path, "rb")
+        return open(artifact.path, "rb")
+
+
+def _write_all(writer: ArtifactWriter, chunks: Iterable[bytes]) -> ReportArtifact:
+    """Generate and write all chunks, then finish the artifact (runs in a worker thread)."""
+    for chunk in chunks:
+        writer.write(chunk)
+    return writer.finish()
+
+
+class ArtifactInputFile(InputFile):
+    """aiogram input file streaming content from the artifact store."""
+
+    def __init__(
+        self,
+        store: ReportArtifactStore,
+        artifact: ReportArtifact,
+        filename: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.store = store
+        self.artifact = artifact
+
+    async def read(self, bot):
+        """Yield uncompressed content chunk by chunk."""
+        stream = self.store.open(self.artifact)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(stream.read, self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            stream.close()
+
+
+_store: Optional[ReportArtifactStore] = None
+
+
+def get_report_store() -> ReportArtifactStore:
+    """
+    Get shared report store, creating it on first call.
+
+    Returns:
+        ReportArtifactStore instance
+    """
+    global _store
+    if _store is None:
+        _store = ReportArtifactStore(
+            settings.report_store_dir,
+            settings.report_store_max_bytes,
+            settings.report_store_compress_level,
+        )
+    return _store
@@ -0,0 +1,252 @@
+"""
+Resilience helpers for external APIs in Ozon Logistics Bot.
+Per-shop, per-endpoint circuit breakers that fail fast while an API is
+degraded, and a last-good-data cache used to serve stale results while a
+breaker is open.
+"""
+
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+from core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's breaker is open."""
+
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"Circuit for {endpoint} is open, retry in {retry_in:.0f}s")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Rolling-window error-rate circuit breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float,
+        min_calls: int,
+        window_seconds: float,
+        open_seconds: float
+    ):
+        """
+        Initialize breaker.
+
+        Args:
+            name: Endpoint name
+            failure_rate_threshold: Failure share in window that opens the breaker
+            min_calls: Minimum calls in window before the rate is evaluated
+            window_seconds: Rolling window length
+            open_seconds: Time to stay open before a half-open probe
+        """
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self._calls: deque = deque()  # (timestamp, ok)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _trim(self, now: float) -> None:
+        """Drop calls that left the rolling window."""
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            _, ok = self._calls.popleft()
+            if not ok:
+                self._failures -= 1
+
+    def retry_in(self) -> float:
+        """Seconds until the breaker allows a probe (0 if it allows calls now)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Returns:
+            bool: True if closed, or if this call is the half-open probe
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.retry_in() == 0.0:
+            self.state = HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    @property
+    def probing(self) -> bool:
+        """Whether a half-open probe is running (the call just allowed is the probe)."""
+        return self.state == HALF_OPEN and self._probe_in_flight
+
+    def release_probe(self) -> None:
+        """
+        End half-open probe without a verdict (cancelled, or failed for a reason
+        other than the API), so the next call may probe again.
+
+        No-op once the probe recorded its outcome.
+        """
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        """Record successful call."""
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self._probe_in_flight = False
+            self._calls.clear()
+            self._failures = 0
+        now = time.monotonic()
+        self._calls.append((now, True))
+        self._trim(now)
+
+    def record_failure(self) -> None:
+        """Record failed call, opening the breaker if the error rate is too high."""
+        now = time.monotonic()
+        if self.state == HALF_OPEN:
+            self._open(now)
+            return
+
+        self._calls.append((now, False))
+        self._failures += 1
+        self._trim(now)
+        if (
+            len(self._calls) >= self.min_calls
+            and self._failures / len(self._calls) >= self.failure_rate_threshold
+        ):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        """Switch to open state."""
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+
+
+# Breakers kept for recently used (shop, endpoint) pairs
+MAX_BREAKERS = 4096
+
+_breakers: "OrderedDict[Tuple[str, str], CircuitBreaker]" = OrderedDict()
+
+
+def get_breaker(client_id: str, endpoint: str) -> CircuitBreaker:
+    """
+    Get circuit breaker for Ozon API endpoint of a shop.
+
+    Breakers are per shop, so one shop hitting its rate limit or sending
+    requests Ozon rejects does not cut off the endpoint for all other shops.
+
+    Args:
+        client_id: Ozon Client ID
+        endpoint: Endpoint name
+
+    Returns:
+        CircuitBreaker instance
+    """
+    key = (client_id, endpoint)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        breaker = _breakers[key] = CircuitBreaker(
+            endpoint,
+            settings.ozon_breaker_failure_rate,
+            settings.ozon_breaker_min_calls,
+            settings.ozon_breaker_window_seconds,
+            settings.ozon_breaker_open_seconds,
+        )
+        while len(_breakers) > MAX_BREAKERS:
+            _breakers.popitem(last=False)
+    else:
+        _breakers.move_to_end(key)
+    return breaker
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Check whether an error means the API is degraded (and should trip the breaker).
+
+    Client errors such as invalid credentials do not count.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, (httpx.TransportError, TimeoutError))
+
+
+def _nbytes(value: Any) -> int:
+    """Approximate memory held by a cached value (batches report their own size)."""
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return nbytes
+    # Small flat values such as analytics dicts
+    return sys.getsizeof(value)
+
+
+class StaleCache:
+    """LRU cache of last good results with their fetch time, bounded by size in bytes."""
+
+    def __init__(self, max_bytes: int, max_age_seconds: float):
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store last good value; values larger than the whole cache are not kept."""
+        self._remove(key)
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (time.time(), value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        """Drop entry if present."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """
+        Get last good value.
+
+        Returns:
+            (fetched_at epoch seconds, value) or None if missing or too old
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.max_age_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+
+_stale_cache: Optional[StaleCache] = None
+
+
+def get_stale_cache() -> StaleCache:
+    """Get shared last-good-data cache."""
+    global _stale_cache
+    if _stale_cache is None:
+        _stale_cache = StaleCache(settings.ozon_stale_cache_bytes, settings.ozon_stale_max_age_hours * 3600)
+    return _stale_cache
@@ -0,0 +1,386 @@
+"""
+Daily rollups service for Ozon Logistics Bot.
+Maintains per-seller daily aggregates of postings (orders, revenue, logistics
+cost by warehouse and delivery type, delivery times, returns), so a summary
+for any N-day period is a sum over at most N days of rows instead of a
+recomputation from raw postings. Daily quantile sketches (services.sketches)
+are refreshed alongside for period percentiles.
+"""
+
+import math
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.db import ROLLUP_LOCK_KEY, SellerDailyRollup, SellerRollupState
+from services.fetch_planner import FetchPlanner
+from services.records import PostingBatch
+from services.sketches import (
+    build_daily_sketches, load_sketches, merge_sketches, percentiles, store_daily_sketches,
+)
+
+SECONDS_PER_DAY = 86400
+EPOCH_DATE = date(1970, 1, 1)
+
+# Posting statuses counted as returns
+RETURN_STATUSES = frozenset({"returned", "returned_to_seller"})
+
+RollupKey = Tuple[date, str, str]
+
+
+class DailyAggregate:
+    """Additive aggregate for one (day, warehouse, delivery type) group."""
+
+    __slots__ = ("orders", "revenue", "logistics_cost", "delivered_orders", "delivery_time_sum", "returns")
+
+    def __init__(
+        self,
+        orders: int = 0,
+        revenue: float = 0.0,
+        logistics_cost: float = 0.0,
+        delivered_orders: int = 0,
+        delivery_time_sum: float = 0.0,
+        returns: int = 0
+    ):
+        self.orders = orders
+        self.revenue = revenue
+        self.logistics_cost = logistics_cost
+        self.delivered_orders = delivered_orders
+        self.delivery_time_sum = delivery_time_sum
+        self.returns = returns
+
+    def add(self, other: "DailyAggregate") -> None:
+        """Add another aggregate into this one."""
+        self.orders += other.orders
+        self.revenue += other.revenue
+        self.logistics_cost += other.logistics_cost
+        self.delivered_orders += other.delivered_orders
+        self.delivery_time_sum += other.delivery_time_sum
+        self.returns += other.returns
+
+
+def aggregate_daily(postings: PostingBatch) -> Dict[RollupKey, DailyAggregate]:
+    """
+    Aggregate postings by creation day, warehouse and delivery type in one pass.
+
+    Args:
+        postings: Posting batch
+
+    Returns:
+        Dict (day, warehouse, delivery_type) -> DailyAggregate
+    """
+    return_codes = {
+        code for code, status in enumerate(postings.statuses.values)
+        if status in RETURN_STATUSES
+    }
+
+    groups: Dict[Tuple[int, int, int], DailyAggregate] = {}
+    for created, delivered, cost, revenue, wh_code, dt_code, st_code in zip(
+        postings.created_dates, postings.delivery_dates, postings.costs, postings.revenues,
+        postings.warehouse_codes, postings.delivery_type_codes, postings.status_codes,
+    ):
+        if math.isnan(created):
+            continue
+
+        key = (int(created // SECONDS_PER_DAY), wh_code, dt_code)
+        aggregate = groups.get(key)
+        if aggregate is None:
+            aggregate = groups[key] = DailyAggregate()
+
+        aggregate.orders += 1
+        aggregate.revenue += revenue
+        aggregate.logistics_cost += cost
+        if not math.isnan(delivered):
+            aggregate.delivered_orders += 1
+            aggregate.delivery_time_sum += (delivered - created) / SECONDS_PER_DAY
+        if st_code in return_codes:
+            aggregate.returns += 1
+
+    warehouses = postings.warehouses.values
+    delivery_types = postings.delivery_types.values
+    return {
+        (EPOCH_DATE + timedelta(days=day), warehouses[wh_code] or "", delivery_types[dt_code] or ""): aggregate
+        for (day, wh_code, dt_code), aggregate in groups.items()
+    }
+
+
+def summarize(groups: Iterable[Tuple[str, str, DailyAggregate]]) -> Dict[str, Any]:
+    """
+    Build report summary from aggregates.
+
+    Args:
+        groups: (warehouse, delivery_type, aggregate) tuples
+
+    Returns:
+        Summary dict compatible with calculate_logistics_report
+    """
+    total = DailyAggregate()
+    cost_by_warehouse: Dict[str, float] = {}
+    cost_by_delivery_type: Dict[str, float] = {}
+
+    for warehouse, delivery_type, aggregate in groups:
+        total.add(aggregate)
+        cost_by_warehouse[warehouse] = cost_by_warehouse.get(warehouse, 0.0) + aggregate.logistics_cost
+        cost_by_delivery_type[delivery_type] = (
+            cost_by_delivery_type.get(delivery_type, 0.0) + aggregate.logistics_cost
+        )
+
+    profit_margin = (
+        (total.revenue - total.logistics_cost) / total.revenue * 100 if total.revenue else 0.0
+    )
+    average_delivery_time = (
+        total.delivery_time_sum / total.delivered_orders if total.delivered_orders else 0.0
+    )
+
+    return {
+        "total_orders": total.orders,
+        "total_revenue": round(total.revenue, 2),
+        "total_logistics_cost": round(total.logistics_cost, 2),
+        "profit_margin": round(profit_margin, 2),
+        "delivered_orders": total.delivered_orders,
+        "average_delivery_time": round(average_delivery_time, 2),
+        "return_rate": round(total.returns / total.orders, 4) if total.orders else 0.0,
+        "logistics_cost_by_warehouse": cost_by_warehouse,
+        "logistics_cost_by_delivery_type": cost_by_delivery_type,
+    }
+
+
+def summarize_postings(postings: PostingBatch) -> Dict[str, Any]:
+    """
+    Build report summary directly from postings.
+
+    Args:
+        postings: Posting batch
+
+    Returns:
+        Summary dict (see summarize)
+    """
+    return summarize(
+        (warehouse, delivery_type, aggregate)
+        for (_, warehouse, delivery_type), aggregate in aggregate_daily(postings).items()
+    )
+
+
+async def refresh_rollups(
+    session: AsyncSession,
+    service,
+    client_id: str,
+    today: Optional[date] = None,
+    backfill_days: Optional[int] = None,
+    restate_from: Optional[date] = None
+) -> int:
+    """
+    Roll up closed days that arrived since the last refresh.
+
+    Days are aggregated by creation date, but postings keep changing after
+    that (deliveries, returns), so whenever a new day closes the trailing
+    rollup_restatement_days are rebuilt as well. Each rebuilt day is
+    replaced as a whole, so a repeated refresh never double counts.
+    Writes of concurrent refreshes of a seller are serialized by an
+    advisory lock, and the watermark is upserted, so neither fails.
+
+    Args:
+        session: Database session
+        service: OzonAPIService for the seller
+        client_id: Ozon Client ID
+        today: Current UTC date (days before it are closed)
+        backfill_days: Days rolled up when the seller has no rollups yet
+            (rollup_backfill_days if None)
+        restate_from: Rebuild days from this one on even if already rolled
+            up (background backfill, see services.job_queue)
+
+    Returns:
+        int: Number of days rolled up
+    """
+    today = today or datetime.utcnow().date()
+
+    state = await session.get(SellerRollupState, client_id)
+    if state is None:
+        start = today - timedelta(days=backfill_days or settings.rollup_backfill_days)
+    elif state.rolled_up_to + timedelta(days=1) >= today:
+        start = None
+    else:
+        # Late deliveries and returns change days rolled up before
+        start = min(
+            state.rolled_up_to + timedelta(days=1),
+            today - timedelta(days=settings.rollup_restatement_days),
+        )
+    if restate_from is not None:
+        start = restate_from if start is None else min(start, restate_from)
+    if start is None:
+        return 0
+
+    # Through the planner, so the report built next reuses these postings;
+    # days already final in the ingested postings table are not downloaded
+    planner = FetchPlanner(service, use_store=True)
+    planner.add(datetime.combine(start, time.min), datetime.combine(today, time.min))
+    await planner.run(allow_stale=False)
+    postings = planner.view(datetime.combine(start, time.min), datetime.combine(today, time.min))
+    groups = aggregate_daily(postings)
+
+    # Concurrent refreshes share the downloads (see FetchPlanner) and write
+    # one after another; the lock is held until commit
+    await session.execute(
+        text("SELECT pg_advisory_xact_lock(:key, hashtext(:client_id))"),
+        {"key": ROLLUP_LOCK_KEY, "client_id": client_id},
+    )
+    await session.execute(
+        delete(SellerDailyRollup).where(
+            SellerDailyRollup.client_id == client_id,
+            SellerDailyRollup.day >= start,
+            SellerDailyRollup.day < today,
+        )
+    )
+    session.add_all([
+        SellerDailyRollup(
+            client_id=client_id,
+            day=day,
+            warehouse=warehouse,
+            delivery_type=delivery_type,
+            orders=aggregate.orders,
+            revenue=aggregate.revenue,
+            logistics_cost=aggregate.logistics_cost,
+            delivered_orders=aggregate.delivered_orders,
+            delivery_time_sum=aggregate.delivery_time_sum,
+            returns=aggregate.returns,
+        )
+        for (day, warehouse, delivery_type), aggregate in groups.items()
+        if start <= day < today
+    ])
+    await store_daily_sketches(session, client_id, build_daily_sketches(postings), start, today)
+
+    statement = insert(SellerRollupState).values(client_id=client_id, rolled_up_to=today - timedelta(days=1))
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[SellerRollupState.client_id],
+            set_={"rolled_up_to": statement.excluded.rolled_up_to},
+        )
+    )
+    await session.commit()
+
+    return (today - start).days
+
+
+async def load_rollups(
+    session: AsyncSession,
+    client_id: str,
+    date_from: date,
+    date_to: date
+) -> List[Tuple[str, str, DailyAggregate]]:
+    """
+    Sum stored rollups over a closed date range.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        date_from: First day (inclusive)
+        date_to: Last day (inclusive)
+
+    Returns:
+        List of (warehouse, delivery_type, aggregate)
+    """
+    result = await session.execute(
+        select(
+            SellerDailyRollup.warehouse,
+            SellerDailyRollup.delivery_type,
+            func.sum(SellerDailyRollup.orders),
+            func.sum(SellerDailyRollup.revenue),
+            func.sum(SellerDailyRollup.logistics_cost),
+            func.sum(SellerDailyRollup.delivered_orders),
+            func.sum(SellerDailyRollup.delivery_time_sum),
+            func.sum(SellerDailyRollup.returns),
+        )
+        .where(
+            SellerDailyRollup.client_id == client_id,
+            SellerDailyRollup.day >= date_from,
+            SellerDailyRollup.day <= date_to,
+        )
+        .group_by(SellerDailyRollup.warehouse, SellerDailyRollup.delivery_type)
+    )
+    return [
+        (warehouse, delivery_type, DailyAggregate(*(value or 0 for value in values)))
+        for warehouse, delivery_type, *values in result.all()
+    ]
+
+
+async def get_period_summary(
+    session: AsyncSession,
+    client_id: str,
+    date_from: date,
+    date_to: date
+) -> Dict[str, Any]:
+    """
+    Get summary for a custom range of closed days.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        date_from: First day (inclusive)
+        date_to: Last day (inclusive)
+
+    Returns:
+        Summary dict
+    """
+    return summarize(await load_rollups(session, client_id, date_from, date_to))
+
+
+async def build_period_summary(
+    session: AsyncSession,
+    service,
+    client_id: str,
+    days: int,
+    today: Optional[date] = None,
+    planner: Optional[FetchPlanner] = None
+) -> Dict[str, Any]:
+    """
+    Get summary for the last N days: stored rollups plus today's live data.
+
+    The summary also carries p50/p90/p99 of delivery time and cost per
+    warehouse and SKU, merged from daily sketches. A seller without
+    rollups gets only the period rolled up here; the full backfill is left
+    to the job scheduled when the shop is connected.
+
+    Args:
+        session: Database session
+        service: OzonAPIService for the seller
+        client_id: Ozon Client ID
+        days: Period length including today
+        today: Current UTC date
+        planner: Planner that already fetched today's postings (e.g. the
+            report's); a new one fetches them otherwise
+
+    Returns:
+        Summary dict
+    """
+    today = today or datetime.utcnow().date()
+    await refresh_rollups(session, service, client_id, today, backfill_days=days)
+
+    date_from = today - timedelta(days=days - 1)
+    groups = await load_rollups(session, client_id, date_from, today - timedelta(days=1))
+    sketches = await load_sketches(session, client_id, date_from, today - timedelta(days=1))
+
+    live_from, live_to = datetime.combine(today, time.min), datetime.utcnow()
+    if planner is None:
+        planner = FetchPlanner(service)
+        planner.add(live_from, live_to)
+        await planner.run(allow_stale=False)
+    live = planner.view(live_from, live_to)
+    groups.extend(
+        (warehouse, delivery_type, aggregate)
+        for (day, warehouse, delivery_type), aggregate in aggregate_daily(live).items()
+        if day == today
+    )
+    live_sketches = [
+        ((metric, dimension, key), sketch)
+        for (day, metric, dimension, key), sketch in build_daily_sketches(live).items()
+        if day == today
+    ]
+    merge_sketches(live_sketches, into=sketches)
+
+    summary = summarize(groups)
+    summary["percentiles"] = percentiles(sketches)
+    return summary
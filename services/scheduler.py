@@ -0,0 +1,229 @@
+"""
+Report job scheduler for Ozon Logistics Bot.
+Weighted fair queuing of report jobs across users: each job is tagged with a
+virtual finish time proportional to its estimated cost (period length x
+historical row count), so small reports are not stuck behind bursts of large
+ones. Concurrent jobs are capped globally and per user.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from core.config import settings
+from services.memory_budget import get_memory_budget
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Smoothing factor for per-user rows-per-day history
+ROWS_HISTORY_ALPHA = 0.3
+
+
+class _QueuedJob:
+    """Queue entry waiting for a report slot."""
+
+    __slots__ = ("finish_tag", "seq", "start_tag", "user_id", "future", "cancelled")
+
+    def __init__(self, finish_tag: float, seq: int, start_tag: float, user_id: int, future: asyncio.Future):
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.start_tag = start_tag
+        self.user_id = user_id
+        self.future = future
+        self.cancelled = False
+
+    def __lt__(self, other: "_QueuedJob") -> bool:
+        return (self.finish_tag, self.seq) < (other.finish_tag, other.seq)
+
+
+class ReportScheduler:
+    """Weighted fair scheduler for report jobs."""
+
+    def __init__(self, max_concurrent_jobs: int, max_jobs_per_user: int):
+        """
+        Initialize scheduler.
+
+        Args:
+            max_concurrent_jobs: Global limit of running jobs
+            max_jobs_per_user: Limit of running jobs per user
+        """
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_jobs_per_user = max_jobs_per_user
+
+        self._queue: List[_QueuedJob] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._user_finish: Dict[int, float] = {}
+        self._running = 0
+        self._running_per_user: Dict[int, int] = defaultdict(int)
+        self._rows_per_day: Dict[int, float] = {}
+
+    @property
+    def queued(self) -> int:
+        """Number of jobs waiting for a slot."""
+        return sum(1 for job in self._queue if not job.cancelled)
+
+    @property
+    def running(self) -> int:
+        """Number of running jobs."""
+        return self._running
+
+    def estimate_cost(self, user_id: int, days: int) -> float:
+        """
+        Estimate job cost from period length and user's historical row count.
+
+        Args:
+            user_id: Telegram user ID
+            days: Report period in days
+
+        Returns:
+            float: Relative job cost
+        """
+        rows_per_day = self._rows_per_day.get(user_id, settings.report_default_rows_per_day)
+        return max(1.0, days * rows_per_day)
+
+    def record_rows(self, user_id: int, days: int, rows: int) -> None:
+        """
+        Update user's rows-per-day history after a finished job.
+
+        Args:
+            user_id: Telegram user ID
+            days: Report period in days
+            rows: Number of rows the report contained
+        """
+        observed = rows / max(days, 1)
+        previous = self._rows_per_day.get(user_id)
+        if previous is None:
+            self._rows_per_day[user_id] = observed
+        else:
+            self._rows_per_day[user_id] = previous + ROWS_HISTORY_ALPHA * (observed - previous)
+
+    async def run(self, user_id: int, cost: float, job: Callable[[], Awaitable[T]]) -> T:
+        """
+        Wait for a fair-share slot and run job.
+
+        Args:
+            user_id: Telegram user ID
+            cost: Estimated job cost
+            job: Coroutine factory producing the report
+
+        Returns:
+            Job result
+        """
+        await self._acquire(user_id, cost)
+        try:
+            return await job()
+        finally:
+            self._release(user_id)
+
+    async def _acquire(self, user_id: int, cost: float) -> None:
+        """Enqueue job and wait until it is dispatched."""
+        start_tag = max(self._virtual_time, self._user_finish.get(user_id, 0.0))
+        finish_tag = start_tag + cost
+        self._user_finish[user_id] = finish_tag
+
+        future = asyncio.get_running_loop().create_future()
+        entry = _QueuedJob(finish_tag, next(self._seq), start_tag, user_id, future)
+        heapq.heappush(self._queue, entry)
+        self._dispatch()
+
+        try:
+            await entry.future
+        except asyncio.CancelledError:
+            if entry.future.done() and not entry.future.cancelled():
+                # Slot was granted right before cancellation
+                self._release(user_id)
+            else:
+                entry.cancelled = True
+            raise
+
+    def _release(self, user_id: int) -> None:
+        """Free slot and dispatch next jobs."""
+        self._running -= 1
+        self._running_per_user[user_id] -= 1
+        if not self._running_per_user[user_id]:
+            del self._running_per_user[user_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start queued jobs with the smallest finish tags while slots are free."""
+        deferred = []
+        while self._queue and self._running < self.max_concurrent_jobs:
+            entry = heapq.heappop(self._queue)
+            if entry.cancelled:
+                continue
+            if self._running_per_user.get(entry.user_id, 0) >= self.max_jobs_per_user:
+                deferred.append(entry)
+                continue
+
+            self._running += 1
+            self._running_per_user[entry.user_id] += 1
+            self._virtual_time = max(self._virtual_time, entry.start_tag)
+            entry.future.set_result(None)
+
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+
+        if not self._queue and not self._running:
+            # Idle: reset virtual clock so tags do not grow forever
+            self._virtual_time = 0.0
+            self._user_finish.clear()
+
+
+_scheduler: Optional[ReportScheduler] = None
+
+
+def get_report_scheduler() -> ReportScheduler:
+    """
+    Get shared report scheduler, creating it on first call.
+
+    Returns:
+        ReportScheduler instance
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReportScheduler(settings.report_max_concurrent_jobs, settings.report_max_jobs_per_user)
+    return _scheduler
+
+
+async def run_report_job(
+    user_id: int,
+    days: int,
+    job: Callable[[], Awaitable[Dict[str, Any]]],
+    deliver: Callable[[Dict[str, Any]], Awaitable[T]]
+) -> T:
+    """
+    Run report pipeline (calculate_logistics_report, file generation and sending)
+    under fair scheduling and within its share of the memory budget.
+
+    The slot and the budget are held until deliver returns, so files built
+    from the report data are generated within the job's share as well.
+
+    Args:
+        user_id: Telegram user ID
+        days: Report period in days
+        job: Coroutine factory returning report data
+        deliver: Coroutine function generating and sending files from report data
+
+    Returns:
+        Result of deliver
+    """
+    scheduler = get_report_scheduler()
+    cost = scheduler.estimate_cost(user_id, days)
+    logger.debug(f"Report job for {user_id}: {days} days, cost {cost:.0f}, {scheduler.queued} queued")
+
+    async def _budgeted_job() -> T:
+        # New jobs wait here for memory instead of running the process out of it
+        async with get_memory_budget().job():
+            report_data = await job()
+            logistics_data = report_data.get("logistics_data")
+            if logistics_data is not None:
+                scheduler.record_rows(user_id, days, len(logistics_data))
+            return await deliver(report_data)
+
+    return await scheduler.run(user_id, cost, _budgeted_job)
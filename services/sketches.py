@@ -0,0 +1,369 @@
+"""
+Quantile sketches for Ozon Logistics Bot.
+KLL sketches give p50/p90/p99 of delivery times and logistics costs in
+bounded memory. They are built per seller per day while postings stream in,
+stored next to the daily rollups and merged across days for any period.
+"""
+
+import math
+import random
+import struct
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.db import SellerDailySketch
+from services.records import PostingBatch
+
+SECONDS_PER_DAY = 86400
+EPOCH_DATE = date(1970, 1, 1)
+
+# Metrics and dimensions sketched for every posting
+METRIC_DELIVERY_TIME = "delivery_time"
+METRIC_COST = "cost"
+DIMENSION_WAREHOUSE = "warehouse"
+DIMENSION_SKU = "sku"
+
+REPORTED_QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+# Sketch accuracy: rank error is about 1.65 / k
+DEFAULT_K = 200
+_CAPACITY_DECAY = 2 / 3
+
+_HEADER = struct.Struct("<HQddH")
+_LEVEL = struct.Struct("<I")
+
+SketchKey = Tuple[str, str, str]  # (metric, dimension, key)
+DailySketchKey = Tuple[date, str, str, str]  # (day, metric, dimension, key)
+
+
+class KLLSketch:
+    """
+    Mergeable KLL quantile sketch.
+
+    Values are kept in compactor levels; an item on level h stands for 2**h
+    original values. A full level is sorted and every other item is promoted,
+    so memory stays around 3k items regardless of the stream length.
+    """
+
+    __slots__ = ("k", "count", "min", "max", "levels", "_size", "_max_size")
+
+    def __init__(self, k: int = DEFAULT_K):
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.levels: List[List[float]] = []
+        self._size = 0
+        self._max_size = 0
+        self._grow()
+
+    def _capacity(self, level: int) -> int:
+        """Maximum items of a level before it is compacted."""
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.k * _CAPACITY_DECAY ** depth)) + 1
+
+    def _grow(self) -> None:
+        """Add a level on top."""
+        self.levels.append([])
+        self._max_size = sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def _compress(self) -> None:
+        """Compact full levels until the sketch fits its size budget."""
+        for level in range(len(self.levels)):
+            items = self.levels[level]
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 >= len(self.levels):
+                self._grow()
+
+            items.sort()
+            last = items.pop() if len(items) % 2 else None
+            self.levels[level + 1].extend(items[random.getrandbits(1)::2])
+            self.levels[level] = [last] if last is not None else []
+
+            self._size = sum(len(items) for items in self.levels)
+            if self._size < self._max_size:
+                break
+
+    def update(self, value: float) -> None:
+        """Add single value."""
+        self.levels[0].append(value)
+        self.count += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Merge another sketch into this one."""
+        if not other.count:
+            return
+        while len(self.levels) < len(other.levels):
+            self._grow()
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(items) for items in self.levels)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate value at quantile.
+
+        Args:
+            q: Quantile in [0, 1]
+
+        Returns:
+            Estimated value or None for an empty sketch
+        """
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.levels)
+            for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return self.max
+
+    def to_bytes(self) -> bytes:
+        """Serialize sketch for storage."""
+        parts = [_HEADER.pack(self.k, self.count, self.min, self.max, len(self.levels))]
+        for items in self.levels:
+            parts.append(_LEVEL.pack(len(items)))
+            parts.append(struct.pack(f"<{len(items)}d", *items))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KLLSketch":
+        """Deserialize sketch produced by to_bytes."""
+        k, count, low, high, level_count = _HEADER.unpack_from(data)
+        sketch = cls(k)
+        sketch.count = count
+        sketch.min = low
+        sketch.max = high
+
+        offset = _HEADER.size
+        levels = []
+        for _ in range(level_count):
+            (size,) = _LEVEL.unpack_from(data, offset)
+            offset += _LEVEL.size
+            levels.append(list(struct.unpack_from(f"<{size}d", data, offset)))
+            offset += 8 * size
+
+        sketch.levels = []
+        for _ in range(level_count):
+            sketch._grow()
+        sketch.levels = levels
+        sketch._size = sum(len(items) for items in levels)
+        return sketch
+
+
+def _iter_observations(postings: PostingBatch) -> Iterator[Tuple[float, str, str, str, float]]:
+    """
+    Yield sketched values of postings.
+
+    Yields:
+        (created epoch seconds, metric, dimension, key, value)
+    """
+    warehouses = postings.warehouses.values
+    skus = postings.skus.values
+    for created, delivered, cost, wh_code, sku_code in zip(
+        postings.created_dates, postings.delivery_dates, postings.costs,
+        postings.warehouse_codes, postings.sku_codes,
+    ):
+        warehouse = warehouses[wh_code] or ""
+        sku = skus[sku_code] or ""
+        yield created, METRIC_COST, DIMENSION_WAREHOUSE, warehouse, cost
+        yield created, METRIC_COST, DIMENSION_SKU, sku, cost
+        if not math.isnan(created) and not math.isnan(delivered):
+            delivery_time = (delivered - created) / SECONDS_PER_DAY
+            yield created, METRIC_DELIVERY_TIME, DIMENSION_WAREHOUSE, warehouse, delivery_time
+            yield created, METRIC_DELIVERY_TIME, DIMENSION_SKU, sku, delivery_time
+
+
+def build_sketches(postings: PostingBatch) -> Dict[SketchKey, KLLSketch]:
+    """
+    Sketch postings of a batch regardless of day.
+
+    Args:
+        postings: Posting batch
+
+    Returns:
+        Dict (metric, dimension, key) -> KLLSketch
+    """
+    sketches: Dict[SketchKey, KLLSketch] = {}
+    for _, metric, dimension, key, value in _iter_observations(postings):
+        sketch = sketches.get((metric, dimension, key))
+        if sketch is None:
+            sketch = sketches[(metric, dimension, key)] = KLLSketch()
+        sketch.update(value)
+    return sketches
+
+
+def build_daily_sketches(postings: PostingBatch) -> Dict[DailySketchKey, KLLSketch]:
+    """
+    Sketch postings per creation day in one pass.
+
+    Args:
+        postings: Posting batch
+
+    Returns:
+        Dict (day, metric, dimension, key) -> KLLSketch
+    """
+    sketches: Dict[Tuple[int, str, str, str], KLLSketch] = {}
+    for created, metric, dimension, key, value in _iter_observations(postings):
+        if math.isnan(created):
+            continue
+        group = (int(created // SECONDS_PER_DAY), metric, dimension, key)
+        sketch = sketches.get(group)
+        if sketch is None:
+            sketch = sketches[group] = KLLSketch()
+        sketch.update(value)
+
+    return {
+        (EPOCH_DATE + timedelta(days=day), metric, dimension, key): sketch
+        for (day, metric, dimension, key), sketch in sketches.items()
+    }
+
+
+def merge_sketches(
+    sketches: Iterable[Tuple[SketchKey, KLLSketch]],
+    into: Optional[Dict[SketchKey, KLLSketch]] = None
+) -> Dict[SketchKey, KLLSketch]:
+    """
+    Merge sketches with the same (metric, dimension, key).
+
+    Args:
+        sketches: (key, sketch) pairs
+        into: Existing merged sketches to add to
+
+    Returns:
+        Dict (metric, dimension, key) -> merged KLLSketch
+    """
+    merged = into if into is not None else {}
+    for key, sketch in sketches:
+        target = merged.get(key)
+        if target is None:
+            merged[key] = sketch
+        else:
+            target.merge(sketch)
+    return merged
+
+
+def percentiles(sketches: Dict[SketchKey, KLLSketch]) -> Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]:
+    """
+    Build percentile table for a report.
+
+    Args:
+        sketches: Merged sketches
+
+    Returns:
+        metric -> dimension -> key -> {"count", "p50", "p90", "p99"}
+    """
+    table: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
+    for (metric, dimension, key), sketch in sorted(sketches.items()):
+        row: Dict[str, Any] = {"count": sketch.count}
+        for name, q in REPORTED_QUANTILES:
+            value = sketch.quantile(q)
+            row[name] = round(value, 2) if value is not None else None
+        table.setdefault(metric, {}).setdefault(dimension, {})[key] = row
+    return table
+
+
+async def store_daily_sketches(
+    session: AsyncSession,
+    client_id: str,
+    sketches: Dict[DailySketchKey, KLLSketch],
+    date_from: date,
+    date_to: date
+) -> None:
+    """
+    Replace stored sketches of days in [date_from, date_to). Does not commit.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        sketches: Daily sketches from build_daily_sketches
+        date_from: First day (inclusive)
+        date_to: Last day (exclusive)
+    """
+    await session.execute(
+        delete(SellerDailySketch).where(
+            SellerDailySketch.client_id == client_id,
+            SellerDailySketch.day >= date_from,
+            SellerDailySketch.day < date_to,
+        )
+    )
+    now = datetime.utcnow()
+    session.add_all([
+        SellerDailySketch(
+            client_id=client_id,
+            day=day,
+            metric=metric,
+            dimension=dimension,
+            key=key,
+            count=sketch.count,
+            sketch=sketch.to_bytes(),
+            updated_at=now,
+        )
+        for (day, metric, dimension, key), sketch in sketches.items()
+        if date_from <= day < date_to
+    ])
+
+
+async def load_sketches(
+    session: AsyncSession,
+    client_id: str,
+    date_from: date,
+    date_to: date
+) -> Dict[SketchKey, KLLSketch]:
+    """
+    Load and merge stored sketches over a closed date range.
+
+    Args:
+        session: Database session
+        client_id: Ozon Client ID
+        date_from: First day (inclusive)
+        date_to: Last day (inclusive)
+
+    Returns:
+        Dict (metric, dimension, key) -> merged KLLSketch
+    """
+    result = await session.execute(
+        select(
+            SellerDailySketch.metric,
+            SellerDailySketch.dimension,
+            SellerDailySketch.key,
+            SellerDailySketch.sketch,
+        ).where(
+            SellerDailySketch.client_id == client_id,
+            SellerDailySketch.day >= date_from,
+            SellerDailySketch.day <= date_to,
+        )
+    )
+    return merge_sketches(
+        ((metric, dimension, key), KLLSketch.from_bytes(data))
+        for metric, dimension, key, data in result.all()
+    )
@@ -0,0 +1,241 @@
+"""
+Logistics tariff engine for Ozon Logistics Bot.
+Ozon tariff tables (warehouse cluster, volume-weight bracket, FBO/FBS scheme,
+last-mile and return fees) are compiled once into sorted bracket arrays per
+(cluster, scheme), and whole posting batches are priced against them by
+distinct group to get the expected logistics cost and its delta from what
+Ozon charged.
+"""
+
+import json
+import logging
+import math
+import operator
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.records import PostingBatch
+from services.rollups import RETURN_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Charged costs above expected by more than this are reported as overcharges (RUB)
+OVERCHARGE_TOLERANCE = 0.01
+
+# STUB: Approximate tariffs for development
+# TODO: Keep in sync with the current Ozon tariff sheet (or set OZON_TARIFFS_PATH)
+DEFAULT_TARIFFS: Dict[str, Any] = {
+    "clusters": {
+        "Москва": "Центральный",
+        "Санкт-Петербург": "Северо-Западный",
+        "Казань": "Приволжский",
+        "Екатеринбург": "Уральский",
+    },
+    "default_cluster": "Центральный",
+    # cluster -> scheme -> brackets of [max volume weight in liters, price]
+    "logistics": {
+        "Центральный": {
+            "FBO": {"brackets": [[0.4, 43], [1, 53], [2, 63], [5, 83]], "per_liter_over": 9},
+            "FBS": {"brackets": [[0.4, 58], [1, 68], [2, 78], [5, 98]], "per_liter_over": 10},
+        },
+        "Северо-Западный": {
+            "FBO": {"brackets": [[0.4, 48], [1, 58], [2, 68], [5, 88]], "per_liter_over": 10},
+            "FBS": {"brackets": [[0.4, 63], [1, 73], [2, 83], [5, 103]], "per_liter_over": 11},
+        },
+        "Приволжский": {
+            "FBO": {"brackets": [[0.4, 48], [1, 58], [2, 68], [5, 88]], "per_liter_over": 10},
+            "FBS": {"brackets": [[0.4, 63], [1, 73], [2, 83], [5, 103]], "per_liter_over": 11},
+        },
+        "Уральский": {
+            "FBO": {"brackets": [[0.4, 53], [1, 63], [2, 73], [5, 93]], "per_liter_over": 11},
+            "FBS": {"brackets": [[0.4, 68], [1, 78], [2, 88], [5, 108]], "per_liter_over": 12},
+        },
+    },
+    "last_mile": {"FBO": 25, "FBS": 25},
+    "return_fee": {"FBO": 50, "FBS": 50},
+}
+
+
+class BracketTable:
+    """Volume-weight brackets for one (cluster, scheme) pair."""
+
+    __slots__ = ("bounds", "prices", "per_liter_over")
+
+    def __init__(self, brackets: List[Tuple[float, float]], per_liter_over: float):
+        brackets = sorted(brackets)
+        self.bounds = array("d", (bound for bound, _ in brackets))
+        self.prices = array("d", (price for _, price in brackets))
+        self.per_liter_over = per_liter_over
+
+    def price(self, volume_weight: float) -> float:
+        """Get logistics price for volume weight in liters."""
+        index = bisect_left(self.bounds, volume_weight)
+        if index < len(self.bounds):
+            return self.prices[index]
+        # Each started liter above the largest bracket is billed extra
+        return self.prices[-1] + math.ceil(volume_weight - self.bounds[-1]) * self.per_liter_over
+
+
+class TariffCheck:
+    """Expected logistics cost per posting and its delta from the charged cost."""
+
+    __slots__ = ("expected", "deltas")
+
+    def __init__(self):
+        # NaN where no tariff applies to the posting or its volume weight is unknown
+        self.expected = array("d")
+        self.deltas = array("d")
+
+    def __len__(self):
+        return len(self.expected)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totals over priced postings.
+
+        Returns:
+            Dict with expected cost, charged minus expected, overcharged and unpriced counts
+        """
+        expected_total = 0.0
+        delta_total = 0.0
+        overcharged = 0
+        unpriced = 0
+        for expected, delta in zip(self.expected, self.deltas):
+            if math.isnan(expected):
+                unpriced += 1
+                continue
+            expected_total += expected
+            delta_total += delta
+            if delta > OVERCHARGE_TOLERANCE:
+                overcharged += 1
+
+        return {
+            "expected_logistics_cost": round(expected_total, 2),
+            "logistics_cost_delta": round(delta_total, 2),
+            "overcharged_postings": overcharged,
+            "unpriced_postings": unpriced,
+        }
+
+
+class TariffIndex:
+    """Compiled tariff tables."""
+
+    def __init__(
+        self,
+        clusters: Dict[str, str],
+        default_cluster: Optional[str],
+        tables: Dict[Tuple[str, str], BracketTable],
+        last_mile: Dict[str, float],
+        return_fee: Dict[str, float]
+    ):
+        self.clusters = clusters
+        self.default_cluster = default_cluster
+        self.tables = tables
+        self.last_mile = last_mile
+        self.return_fee = return_fee
+
+    @classmethod
+    def compile(cls, tariffs: Dict[str, Any]) -> "TariffIndex":
+        """
+        Compile tariff definition (see DEFAULT_TARIFFS for the format).
+
+        Args:
+            tariffs: Tariff definition
+
+        Returns:
+            TariffIndex instance
+        """
+        tables = {
+            (cluster, scheme): BracketTable(
+                [(float(bound), float(price)) for bound, price in table["brackets"]],
+                float(table.get("per_liter_over", 0)),
+            )
+            for cluster, schemes in tariffs["logistics"].items()
+            for scheme, table in schemes.items()
+        }
+        return cls(
+            clusters=dict(tariffs.get("clusters", {})),
+            default_cluster=tariffs.get("default_cluster"),
+            tables=tables,
+            last_mile={k: float(v) for k, v in tariffs.get("last_mile", {}).items()},
+            return_fee={k: float(v) for k, v in tariffs.get("return_fee", {}).items()},
+        )
+
+    def table_for(self, warehouse: Optional[str], scheme: Optional[str]) -> Optional[BracketTable]:
+        """Get bracket table for warehouse and delivery scheme."""
+        cluster = self.clusters.get(warehouse, self.default_cluster)
+        return self.tables.get((cluster, scheme))
+
+    def price_batch(self, postings: PostingBatch) -> TariffCheck:
+        """
+        Price all postings of a batch.
+
+        Postings are grouped by (warehouse, delivery type, status, volume
+        weight) codes. Each distinct group is priced once, and prices are
+        spread back to the rows with C-level map/zip passes over the array
+        columns, so there is no Python code per posting. Volume weights come
+        from products, so groups number about SKUs x warehouses, not postings.
+        Postings with unknown volume weight are left unpriced.
+
+        Args:
+            postings: Posting batch
+
+        Returns:
+            TariffCheck aligned with the batch rows
+        """
+        warehouses = postings.warehouses.values
+        delivery_types = postings.delivery_types.values
+        statuses = postings.statuses.values
+
+        # Float bits as integers: hashable group keys, NaN included
+        volume_bits = array("q")
+        volume_bits.frombytes(postings.volume_weights.tobytes())
+        volumes = dict(zip(volume_bits, postings.volume_weights))
+
+        def keys():
+            return zip(
+                postings.warehouse_codes, postings.delivery_type_codes, postings.status_codes, volume_bits
+            )
+
+        prices: Dict[Tuple[int, int, int, int], float] = {}
+        for key in set(keys()):
+            wh_code, dt_code, st_code, bits = key
+            scheme = delivery_types[dt_code]
+            table = self.table_for(warehouses[wh_code], scheme)
+            volume = volumes[bits]
+            if table is None or math.isnan(volume):
+                prices[key] = math.nan
+                continue
+            expected = table.price(volume) + self.last_mile.get(scheme, 0.0)
+            if statuses[st_code] in RETURN_STATUSES:
+                expected += self.return_fee.get(scheme, 0.0)
+            prices[key] = expected
+
+        check = TariffCheck()
+        check.expected = array("d", map(prices.__getitem__, keys()))
+        # NaN expected gives NaN delta
+        check.deltas = array("d", map(operator.sub, postings.costs, check.expected))
+        return check
+
+
+_tariff_index: Optional[TariffIndex] = None
+
+
+def get_tariff_index() -> TariffIndex:
+    """
+    Get compiled tariffs, loading OZON_TARIFFS_PATH on first use if set.
+
+    Returns:
+        TariffIndex instance
+    """
+    global _tariff_index
+    if _tariff_index is None:
+        tariffs = DEFAULT_TARIFFS
+        if settings.ozon_tariffs_path:
+            with open(settings.ozon_tariffs_path, encoding="utf-8") as f:
+                tariffs = json.load(f)
+            logger.info(f"Loaded Ozon tariffs from {settings.ozon_tariffs_path}")
+        _tariff_index = TariffIndex.compile(tariffs)
+    return _tariff_index
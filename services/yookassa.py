@@ -8,6 +8,7 @@ import httpx
 from decimal import Decimal
 
 from core.config import settings
+from core.tracing import traced
 
 
 class YooKassaService:
@@ -35,6 +36,7 @@ class YooKassaService:
         """Async context manager exit."""
         await self.client.aclose()
 
+    @traced("yookassa.create_payment")
     async def create_payment(
         self,
         amount: Decimal,
@@ -75,6 +77,7 @@ class YooKassaService:
             }
         }
 
+    @traced("yookassa.get_payment_status")
     async def get_payment_status(self, payment_id: str) -> Dict[str, Any]:
         """
         Get payment status by payment ID.
@@ -99,6 +102,7 @@ class YooKassaService:
             "captured_at": "2024-01-01T12:05:00Z"
         }
 
+    @traced("yookassa.create_subscription_payment")
     async def create_subscription_payment(
         self,
         user_id: int,
@@ -135,6 +139,7 @@ class YooKassaService:
 
         return payment
 
+    @traced("yookassa.process_webhook")
     async def process_webhook(self, webhook_data: Dict[str, Any]) -> bool:
         """
         Process YooKassa webhook notification.
@@ -157,6 +162,7 @@ class YooKassaService:
 
         return False
 
+    @traced("yookassa.refund_payment")
     async def refund_payment(
         self,
         payment_id: str,
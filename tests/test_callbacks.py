@@ -0,0 +1,80 @@
+"""Tests for callback_data routing through the compiled index."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from core.admission import HEAVY, INTERACTIVE
+from handlers.callbacks import CallbackIndex, PayCallback, PeriodCallback
+
+
+def _callback(data: str):
+    answered = []
+
+    async def answer(*args, **kwargs):
+        answered.append(True)
+
+    return SimpleNamespace(data=data, answer=answer, answered=answered)
+
+
+def _index():
+    index = CallbackIndex()
+    seen = []
+
+    @index.exact("menu_report")
+    async def _menu(callback):
+        seen.append(("menu", callback.data))
+
+    @index.typed(PeriodCallback, priority=HEAVY)
+    async def _period(callback, callback_data: PeriodCallback, bot):
+        seen.append(("period", callback_data.days, bot))
+
+    return index, seen
+
+
+def test_exact_and_typed_routes_resolve():
+    index, _ = _index()
+    route, payload = index.resolve("menu_report")
+    assert payload is None and route.handler.__name__ == "_menu"
+
+    route, payload = index.resolve(PeriodCallback(days=28).pack())
+    assert route.handler.__name__ == "_period" and payload.days == 28
+
+    assert index.resolve("unknown") is None
+    # Prefix registered elsewhere, or payload that does not unpack
+    assert index.resolve(PayCallback(months=1).pack()) is None
+    assert index.resolve("rp:many") is None
+    assert index.resolve("rp:7:extra") is None
+
+
+def test_priority_comes_from_the_route():
+    index, _ = _index()
+    assert index.priority("rp:7") == HEAVY
+    assert index.priority("menu_report") == INTERACTIVE
+    assert index.priority("unknown") == INTERACTIVE
+
+
+def test_dispatch_passes_only_accepted_arguments():
+    index, seen = _index()
+    extra = {"bot": "bot", "state": "state", "event_from_user": "user"}
+
+    async def run():
+        await index._dispatch(_callback("menu_report"), **extra)
+        await index._dispatch(_callback("rp:7"), **extra)
+        unknown = _callback("gone:1")
+        await index._dispatch(unknown, **extra)
+        return unknown
+
+    unknown = asyncio.run(run())
+    assert seen == [("menu", "menu_report"), ("period", 7, "bot")]
+    # Stale buttons are answered so the client stops its spinner
+    assert unknown.answered == [True]
+
+
+def test_duplicate_registration_is_rejected():
+    index, _ = _index()
+    with pytest.raises(ValueError):
+        index.exact("menu_report")(lambda callback: None)
+    with pytest.raises(ValueError):
+        index.typed(PeriodCallback)(lambda callback: None)
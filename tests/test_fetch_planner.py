@@ -0,0 +1,96 @@
+"""Tests for postings window arithmetic and the fetch planner."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from services.fetch_planner import FetchPlanner, merge_windows, subtract_windows
+from services.records import PostingBatch
+
+START = datetime(2024, 5, 1)
+
+
+def _day(n: int) -> datetime:
+    return START + timedelta(days=n)
+
+
+def test_merge_windows_joins_overlapping_and_adjacent():
+    assert merge_windows([(_day(5), _day(7)), (_day(0), _day(2)), (_day(2), _day(3)), (_day(6), _day(9))]) == [
+        (_day(0), _day(3)),
+        (_day(5), _day(9)),
+    ]
+    # Windows inside another one disappear
+    assert merge_windows([(_day(0), _day(10)), (_day(2), _day(4))]) == [(_day(0), _day(10))]
+    assert merge_windows([]) == []
+
+
+def test_subtract_windows_leaves_gaps():
+    windows = [(_day(0), _day(10)), (_day(12), _day(14))]
+    covered = [(_day(2), _day(4)), (_day(3), _day(5)), (_day(9), _day(13))]
+    assert subtract_windows(windows, covered) == [
+        (_day(0), _day(2)),
+        (_day(5), _day(9)),
+        (_day(13), _day(14)),
+    ]
+
+
+def test_subtract_windows_edges():
+    window = [(_day(0), _day(7))]
+    assert subtract_windows(window, []) == window
+    assert subtract_windows(window, [(_day(-1), _day(8))]) == []
+    # Touching ranges do not cut the window
+    assert subtract_windows(window, [(_day(-3), _day(0)), (_day(7), _day(9))]) == window
+
+
+class _FakeService:
+    """Ozon service serving one posting per day of a range and counting downloads."""
+
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        self.stale_as_of = None
+        self.calls = []
+
+    async def get_fbo_fbs_data(self, date_from, date_to, allow_stale=True):
+        self.calls.append((date_from, date_to))
+        await asyncio.sleep(0)
+        postings = PostingBatch()
+        day = date_from
+        while day < date_to:
+            postings.append(f"{day:%Y%m%d}", "FBS", "delivered", 100.0, None, "Москва", created_at=day)
+            day += timedelta(days=1)
+        return postings
+
+
+def test_planner_downloads_union_once_and_serves_views():
+    async def run():
+        service = _FakeService("planner-union")
+        planner = FetchPlanner(service, ttl=60)
+        planner.add(_day(7), _day(14))
+        planner.add(_day(0), _day(7))
+        downloaded = await planner.run()
+        return service.calls, downloaded, planner
+
+    calls, downloaded, planner = asyncio.run(run())
+    assert downloaded == 1 and calls == [(_day(0), _day(14))]
+    assert len(planner.view(_day(0), _day(7))) == 7
+    assert list(planner.view(_day(7), _day(9)).order_ids) == ["20240508", "20240509"]
+
+
+def test_planner_reuses_fresh_and_in_flight_ranges():
+    async def run():
+        service = _FakeService("planner-reuse")
+        first = FetchPlanner(service, ttl=60)
+        first.add(_day(0), _day(7))
+        second = FetchPlanner(service, ttl=60)
+        second.add(_day(0), _day(7))
+        # Both start before either download finishes
+        await asyncio.gather(first.run(), second.run())
+
+        third = FetchPlanner(service, ttl=60)
+        third.add(_day(0), _day(28))
+        await third.run()
+        return service.calls, second, third
+
+    calls, second, third = asyncio.run(run())
+    assert calls == [(_day(0), _day(7)), (_day(7), _day(28))]
+    assert len(second.view(_day(0), _day(7))) == 7
+    assert len(third.view(_day(0), _day(28))) == 28
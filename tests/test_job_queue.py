@@ -0,0 +1,152 @@
+"""Tests for job worker claim, lease and retry paths."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import job_queue
+from services.job_queue import JobWorker
+
+
+class _FakeQueue:
+    """In-memory stand-in for the jobs table functions of core.db."""
+
+    def __init__(self, jobs=(), lease_kept: bool = True):
+        self.pending = list(jobs)
+        self.lease_kept = lease_kept
+        self.claim_limits = []
+        self.completed = []
+        self.failed = []
+        self.extended = 0
+
+    async def claim_jobs(self, worker_id, limit, visibility_timeout):
+        self.claim_limits.append(limit)
+        claimed, self.pending = self.pending[:limit], self.pending[limit:]
+        for job in claimed:
+            job.attempts += 1
+        return claimed
+
+    async def complete_job(self, job):
+        self.completed.append(job.id)
+        return True
+
+    async def fail_job(self, job, error, retry_in):
+        self.failed.append((job.id, error, retry_in))
+
+    async def extend_job_lease(self, job, visibility_timeout):
+        self.extended += 1
+        return self.lease_kept
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = _FakeQueue()
+    for name in ("claim_jobs", "complete_job", "fail_job", "extend_job_lease"):
+        monkeypatch.setattr(job_queue, name, getattr(queue, name))
+    monkeypatch.setattr(job_queue, "retry_delay", lambda attempts: 5.0 * attempts)
+    return queue
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Register test handlers for the duration of a test."""
+    registered = {}
+    monkeypatch.setattr(job_queue, "_handlers", registered)
+    return registered
+
+
+def _job(job_id: int, kind: str, attempts: int = 0, max_attempts: int = 3, **payload):
+    return SimpleNamespace(
+        id=job_id, kind=kind, payload=payload, attempts=attempts, max_attempts=max_attempts
+    )
+
+
+def _worker(concurrency: int = 2, visibility_timeout: float = 30.0) -> JobWorker:
+    return JobWorker("test-worker", concurrency, poll_interval=0.01, visibility_timeout=visibility_timeout)
+
+
+def test_claimed_jobs_run_within_concurrency(queue, handlers):
+    running = []
+    peak = []
+
+    @job_queue.job_handler("echo")
+    async def _echo(payload):
+        running.append(payload["n"])
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(payload["n"])
+
+    assert handlers["echo"] is _echo
+    queue.pending = [_job(n, "echo", n=n) for n in range(5)]
+
+    async def run():
+        worker = _worker(concurrency=2)
+        worker.start()
+        while len(queue.completed) < 5:
+            await asyncio.sleep(0.005)
+        await worker.stop()
+
+    asyncio.run(run())
+    assert sorted(queue.completed) == [0, 1, 2, 3, 4]
+    assert max(peak) <= 2
+    assert all(limit <= 2 for limit in queue.claim_limits)
+    assert not queue.failed
+
+
+def test_failed_attempt_is_retried_with_backoff(queue, handlers):
+    @job_queue.job_handler("flaky")
+    async def _flaky(payload):
+        raise RuntimeError("upstream timeout")
+
+    async def run():
+        worker = _worker()
+        await worker._run(_job(1, "flaky", attempts=1))
+        await worker._run(_job(2, "flaky", attempts=3))
+
+    asyncio.run(run())
+    # Retried after the backoff, then failed for good on the last attempt
+    assert queue.failed == [(1, "upstream timeout", 5.0), (2, "upstream timeout", None)]
+    assert not queue.completed
+
+
+def test_expired_last_attempt_and_unknown_kind_fail_without_running(queue, handlers):
+    calls = []
+
+    @job_queue.job_handler("counted")
+    async def _counted(payload):
+        calls.append(payload)
+
+    async def run():
+        worker = _worker()
+        await worker._run(_job(1, "counted", attempts=4, max_attempts=3))
+        await worker._run(_job(2, "missing", attempts=1))
+
+    asyncio.run(run())
+    assert not calls
+    assert [job_id for job_id, _, retry_in in queue.failed if retry_in is None] == [1, 2]
+
+
+def test_heartbeat_keeps_lease_of_long_job(queue, handlers):
+    @job_queue.job_handler("slow")
+    async def _slow(payload):
+        await asyncio.sleep(0.1)
+
+    asyncio.run(_worker(visibility_timeout=0.03)._run(_job(1, "slow", attempts=1)))
+    assert queue.extended >= 2
+    assert queue.completed == [1] and not queue.failed
+
+
+def test_lost_lease_cancels_job_without_recording(queue, handlers):
+    finished = []
+
+    @job_queue.job_handler("slow")
+    async def _slow(payload):
+        await asyncio.sleep(1)
+        finished.append(payload)
+
+    queue.lease_kept = False
+    asyncio.run(_worker(visibility_timeout=0.03)._run(_job(1, "slow", attempts=1)))
+    # The job belongs to whoever claimed it next
+    assert not finished
+    assert not queue.completed and not queue.failed
@@ -0,0 +1,66 @@
+"""Tests for the incremental JSON array parser."""
+
+import json
+
+import pytest
+
+from services.json_stream import JSONArrayStream
+
+BODY = json.dumps({
+    "result": {
+        "postings": [
+            {"posting_number": "1-1", "cost": 12.5, "products": [{"sku": 1}]},
+            {"posting_number": "1-2", "cost": 1e3, "note": "a, b ] }"},
+            42,
+        ],
+        "has_next": True,
+        "last_id": "abc",
+    },
+    "meta": {"ignored": [1, 2, 3]},
+})
+
+
+def _parse(body: str, chunk_size: int):
+    parser = JSONArrayStream(("result", "postings"))
+    items = []
+    for start in range(0, len(body), chunk_size):
+        items.extend(parser.feed(body[start:start + chunk_size]))
+    items.extend(parser.close())
+    return parser, items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, len(BODY)])
+def test_items_and_fields_match_whole_body_parse(chunk_size):
+    parser, items = _parse(BODY, chunk_size)
+    assert items == json.loads(BODY)["result"]["postings"]
+    assert parser.items_parsed == 3
+    assert parser.fields == {"has_next": True, "last_id": "abc"}
+    assert parser.done
+
+
+def test_items_are_returned_as_soon_as_complete():
+    parser = JSONArrayStream(("items",))
+    assert parser.feed('{"items": [{"a": 1}, {"b"') == [{"a": 1}]
+    assert parser.feed(': 2}, 12') == [{"b": 2}]
+    # The number may continue in the next chunk
+    assert parser.feed('3') == []
+    assert parser.feed(']}') == [123]
+    assert parser.close() == []
+
+
+def test_truncated_body_is_rejected():
+    parser = JSONArrayStream(("items",))
+    parser.feed('{"items": [{"a": 1}')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_malformed_body_is_rejected():
+    parser = JSONArrayStream(("items",))
+    with pytest.raises(ValueError):
+        parser.feed('{"items": [1 2]}')
+
+
+def test_empty_path_is_rejected():
+    with pytest.raises(ValueError):
+        JSONArrayStream(())
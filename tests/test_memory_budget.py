@@ -0,0 +1,86 @@
+"""Tests for report jobs running within the memory budget."""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services import memory_budget
+from services.memory_budget import SPILLED_KEY, MemoryBudget, get_memory_budget, restore_fields
+from services.ozon_api import OzonAPIService, calculate_consolidated_report, report_nbytes
+from services.records import PostingBatch
+
+
+@pytest.fixture(autouse=True)
+def offline_postings(monkeypatch):
+    """Serve two postings per range instead of calling Ozon."""
+
+    async def _fetch(self, date_from: datetime, date_to: datetime) -> PostingBatch:
+        postings = PostingBatch()
+        postings.append(
+            f"{self.client_id}-1", "FBS", "delivered", 150.00, date_from + timedelta(days=2), "Москва",
+            created_at=date_from, revenue=1000.00, volume_weight=2.5, sku="SKU001",
+        )
+        postings.append(
+            f"{self.client_id}-2", "FBO", "in_transit", 200.00, None, "Санкт-Петербург",
+            created_at=date_from + timedelta(days=1), revenue=500.00, sku="SKU002",
+        )
+        return postings
+
+    monkeypatch.setattr(OzonAPIService, "_fetch_fbo_fbs_data", _fetch)
+
+
+def _install_budget(monkeypatch, tmp_path, job_bytes: int) -> MemoryBudget:
+    """Replace the shared budget with one spilling under tmp_path."""
+    budget = MemoryBudget(4 * job_bytes, job_bytes, str(tmp_path / "spill"))
+    monkeypatch.setattr(memory_budget, "_budget", budget)
+    return budget
+
+
+def test_report_is_charged_to_job(monkeypatch, tmp_path):
+    budget = _install_budget(monkeypatch, tmp_path, 64 * 1024 * 1024)
+
+    async def run():
+        async with get_memory_budget().job() as job:
+            async with OzonAPIService("budget-client", "budget-api-key") as service:
+                report = await service.calculate_logistics_report(7)
+            return job.used, report
+
+    used, report = asyncio.run(run())
+    assert used == report_nbytes(report) > 0
+    assert budget.reserved == 0
+
+
+def test_consolidated_report_spills_over_budget(monkeypatch, tmp_path):
+    _install_budget(monkeypatch, tmp_path, 1)
+    shops = [
+        SimpleNamespace(name=f"Shop {n}", client_id=f"spill-client-{n}", api_key="spill-api-key")
+        for n in range(2)
+    ]
+
+    async def run():
+        async with get_memory_budget().job():
+            report = await calculate_consolidated_report(shops, 7)
+            restored = [restore_fields(item["report"]) for item in report["shops"]]
+            paths = [item["report"][SPILLED_KEY].path for item in report["shops"]]
+            assert all(os.path.exists(path) for path in paths)
+            return restored, paths
+
+    restored, paths = asyncio.run(run())
+    assert [len(report["logistics_data"]) for report in restored] == [2, 2]
+    assert not any(os.path.exists(path) for path in paths)
+
+
+def test_spill_dirs_of_live_processes_are_kept(tmp_path):
+    root = str(tmp_path / "spill")
+    first = MemoryBudget(1024, 1024, root)
+    second = MemoryBudget(1024, 1024, root)
+    assert os.path.isdir(first.spill_dir) and os.path.isdir(second.spill_dir)
+
+    # Process of the first budget exits
+    first._spill_lock.close()
+    MemoryBudget(1024, 1024, root)
+    assert not os.path.exists(first.spill_dir)
+    assert os.path.isdir(second.spill_dir)
@@ -0,0 +1,103 @@
+"""Tests for circuit breaker state transitions."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services import resilience
+from services.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Manual monotonic clock of the breaker module."""
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(resilience, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "postings", failure_rate_threshold=0.5, min_calls=4, window_seconds=60.0, open_seconds=30.0
+    )
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_until_min_calls(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_opens_at_failure_rate_and_rejects_calls(clock):
+    breaker = _breaker()
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    assert not breaker.allow()
+    assert breaker.retry_in() == pytest.approx(20.0)
+
+
+def test_failures_leave_the_rolling_window(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 61
+    # Old failures no longer count, so this one does not open the breaker
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_allows_single_probe_and_closes_on_success(clock):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN and breaker.probing
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED and not breaker.probing
+    # Window was reset: failures before the outage do not count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_for_a_full_period(clock):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_in() == pytest.approx(30.0)
+    assert not breaker.allow()
+
+
+def test_released_probe_lets_the_next_call_probe(clock):
+    breaker = _breaker()
+    _open(breaker)
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and breaker.probing
@@ -0,0 +1,131 @@
+"""Tests for weighted fair scheduling of report jobs."""
+
+import asyncio
+
+from services.scheduler import ROWS_HISTORY_ALPHA, ReportScheduler
+
+
+async def _settle():
+    """Let started tasks reach their first await."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _job(started, name, gate=None):
+    async def job():
+        started.append(name)
+        if gate is not None:
+            await gate.wait()
+        return name
+
+    return job
+
+
+def test_jobs_start_in_finish_tag_order():
+    async def run():
+        scheduler = ReportScheduler(max_concurrent_jobs=1, max_jobs_per_user=2)
+        started = []
+        gate = asyncio.Event()
+        blocker = asyncio.create_task(scheduler.run(0, 1.0, _job(started, "blocker", gate)))
+        await _settle()
+
+        # A queued two large reports before B asked for a small one
+        tasks = [
+            asyncio.create_task(scheduler.run(1, 100.0, _job(started, "a1"))),
+            asyncio.create_task(scheduler.run(1, 100.0, _job(started, "a2"))),
+            asyncio.create_task(scheduler.run(2, 10.0, _job(started, "b"))),
+        ]
+        await _settle()
+        assert scheduler.queued == 3 and scheduler.running == 1
+
+        gate.set()
+        results = await asyncio.gather(blocker, *tasks)
+        return started, results, scheduler
+
+    started, results, scheduler = asyncio.run(run())
+    assert started == ["blocker", "b", "a1", "a2"]
+    assert results == ["blocker", "a1", "a2", "b"]
+    assert scheduler.queued == 0 and scheduler.running == 0
+
+
+def test_per_user_cap_leaves_slots_to_others():
+    async def run():
+        scheduler = ReportScheduler(max_concurrent_jobs=3, max_jobs_per_user=1)
+        started = []
+        gates = {name: asyncio.Event() for name in ("a1", "a2", "b")}
+        tasks = {
+            name: asyncio.create_task(scheduler.run(user_id, 1.0, _job(started, name, gates[name])))
+            for name, user_id in (("a1", 1), ("a2", 1), ("b", 2))
+        }
+        await _settle()
+        # A's second report waits for the first although a slot is free
+        snapshot = (list(started), scheduler.running, scheduler.queued)
+
+        gates["a1"].set()
+        await tasks["a1"]
+        await _settle()
+        after_first = list(started)
+
+        gates["a2"].set()
+        gates["b"].set()
+        await asyncio.gather(*tasks.values())
+        return snapshot, after_first
+
+    snapshot, after_first = asyncio.run(run())
+    assert snapshot == (["a1", "b"], 2, 1)
+    assert after_first == ["a1", "b", "a2"]
+
+
+def test_cancelled_queued_job_does_not_take_a_slot():
+    async def run():
+        scheduler = ReportScheduler(max_concurrent_jobs=1, max_jobs_per_user=1)
+        started = []
+        gate = asyncio.Event()
+        blocker = asyncio.create_task(scheduler.run(1, 1.0, _job(started, "blocker", gate)))
+        waiting = asyncio.create_task(scheduler.run(2, 1.0, _job(started, "cancelled")))
+        queued = asyncio.create_task(scheduler.run(3, 5.0, _job(started, "next")))
+        await _settle()
+
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert scheduler.queued == 1
+
+        gate.set()
+        await asyncio.gather(blocker, queued)
+        return started, scheduler
+
+    started, scheduler = asyncio.run(run())
+    assert started == ["blocker", "next"]
+    assert scheduler.running == 0
+
+
+def test_failed_job_releases_its_slot():
+    async def run():
+        scheduler = ReportScheduler(max_concurrent_jobs=1, max_jobs_per_user=1)
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            scheduler.run(1, 1.0, fail),
+            scheduler.run(1, 1.0, _job([], "after")),
+            return_exceptions=True,
+        )
+        return results, scheduler
+
+    results, scheduler = asyncio.run(run())
+    assert isinstance(results[0], RuntimeError) and results[1] == "after"
+    assert scheduler.running == 0
+
+
+def test_cost_estimate_follows_row_history():
+    scheduler = ReportScheduler(max_concurrent_jobs=1, max_jobs_per_user=1)
+    scheduler.record_rows(1, 10, 1000)
+    assert scheduler.estimate_cost(1, 7) == 700.0
+
+    scheduler.record_rows(1, 10, 2000)
+    rows_per_day = 100 + ROWS_HISTORY_ALPHA * (200 - 100)
+    assert scheduler.estimate_cost(1, 7) == 7 * rows_per_day
+    # Never below one unit, even for users with empty reports
+    scheduler.record_rows(2, 7, 0)
+    assert scheduler.estimate_cost(2, 7) == 1.0
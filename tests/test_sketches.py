@@ -0,0 +1,97 @@
+"""Tests for KLL quantile sketches."""
+
+import random
+
+import pytest
+
+from services.sketches import KLLSketch
+
+# Rank error allowed on top of the sketch's ~1.65 / k
+RANK_TOLERANCE = 0.02
+
+
+@pytest.fixture(autouse=True)
+def seeded_random():
+    """Make compactions (which pick odd or even items at random) repeatable."""
+    random.seed(1234)
+
+
+def _sketch(values, k: int = 200) -> KLLSketch:
+    sketch = KLLSketch(k)
+    for value in values:
+        sketch.update(value)
+    return sketch
+
+
+def _rank(values, value) -> float:
+    """Fraction of values not greater than value."""
+    return sum(1 for item in values if item <= value) / len(values)
+
+
+def test_small_stream_quantiles_are_exact():
+    values = [float(n) for n in range(1, 101)]
+    random.shuffle(values)
+    sketch = _sketch(values)
+    assert sketch.quantile(0.5) == 50.0
+    assert sketch.quantile(0.9) == 90.0
+    assert sketch.quantile(0) == 1.0
+    assert sketch.quantile(1) == 100.0
+
+
+def test_large_stream_quantiles_within_rank_error_and_bounded_memory():
+    values = [random.random() for _ in range(100_000)]
+    sketch = _sketch(values)
+    assert sketch.count == len(values)
+    assert sketch.min == min(values) and sketch.max == max(values)
+    assert sum(len(items) for items in sketch.levels) < 4 * sketch.k
+    for q in (0.5, 0.9, 0.99):
+        assert _rank(values, sketch.quantile(q)) == pytest.approx(q, abs=RANK_TOLERANCE)
+
+
+def test_merged_sketch_matches_union_of_streams():
+    first = [random.gauss(10, 2) for _ in range(30_000)]
+    second = [random.gauss(20, 2) for _ in range(10_000)]
+    merged = _sketch(first)
+    merged.merge(_sketch(second))
+
+    union = first + second
+    assert merged.count == len(union)
+    assert merged.min == min(union) and merged.max == max(union)
+    for q in (0.5, 0.9, 0.99):
+        assert _rank(union, merged.quantile(q)) == pytest.approx(q, abs=RANK_TOLERANCE)
+
+
+def test_merge_of_many_daily_sketches_stays_bounded():
+    days = [[random.expovariate(1.0) for _ in range(2_000)] for _ in range(28)]
+    period = KLLSketch()
+    for day in days:
+        period.merge(_sketch(day))
+
+    union = [value for day in days for value in day]
+    assert period.count == len(union)
+    assert sum(len(items) for items in period.levels) < 4 * period.k
+    assert _rank(union, period.quantile(0.9)) == pytest.approx(0.9, abs=RANK_TOLERANCE)
+
+
+def test_empty_sketches():
+    sketch = KLLSketch()
+    assert sketch.quantile(0.5) is None
+    sketch.merge(KLLSketch())
+    assert sketch.count == 0
+
+    filled = _sketch([3.0, 1.0, 2.0])
+    filled.merge(KLLSketch())
+    assert filled.count == 3 and filled.quantile(0.5) == 2.0
+
+
+def test_serialization_round_trip_keeps_quantiles():
+    sketch = _sketch(random.random() for _ in range(50_000))
+    restored = KLLSketch.from_bytes(sketch.to_bytes())
+    assert (restored.k, restored.count, restored.min, restored.max) == (
+        sketch.k, sketch.count, sketch.min, sketch.max
+    )
+    assert [restored.quantile(q) for q in (0.5, 0.9, 0.99)] == [sketch.quantile(q) for q in (0.5, 0.9, 0.99)]
+
+    # A restored sketch keeps accepting values
+    restored.update(2.0)
+    assert restored.max == 2.0 and restored.count == sketch.count + 1